@@ -6,6 +6,10 @@ require("dotenv").config();
 
 admin.initializeApp();
 
+// Gemini API host; override (e.g. scripts/examples/fake_gemini_server.py) for offline benchmarks
+const GEMINI_API_BASE_URL =
+  process.env.GEMINI_API_BASE_URL || "https://generativelanguage.googleapis.com";
+
 /**
  * Cloud Function: generateQuestions
  * Securely calls the Gemini API with server-side API key
@@ -80,7 +84,7 @@ exports.generateQuestions = functions
       console.log("[DEBUG] API key found, length:", apiKey.length);
 
       // 5. Call Gemini API
-      const url = `https://generativelanguage.googleapis.com/v1beta/models/${model}:generateContent?key=${apiKey}`;
+      const url = `${GEMINI_API_BASE_URL}/v1beta/models/${model}:generateContent?key=${apiKey}`;
       console.log(
         "[DEBUG] Calling Gemini API (SKIPPED FOR DEBUGGING) with model:",
         model
@@ -260,7 +264,7 @@ exports.generateCritique = functions
         Options: ${JSON.stringify(options)}
         Correct: ${correct}`;
 
-      const url = `https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent?key=${apiKey}`;
+      const url = `${GEMINI_API_BASE_URL}/v1beta/models/gemini-2.0-flash-exp:generateContent?key=${apiKey}`;
 
       const response = await fetch(url, {
         method: "POST",
@@ -0,0 +1,475 @@
+"""
+fake_gemini_server.py
+
+Local stand-in for the Gemini REST API, for offline benchmarking.
+
+Serves the two endpoints we use:
+  POST /v1beta/models/{model}:generateContent
+  POST /v1beta/models/{model}:streamGenerateContent   (?alt=sse or JSON array)
+
+Responses are templated markdown question tables (or canned texts from a
+file) with realistic usageMetadata, and the server can inject latency,
+500 errors and 429s so concurrency, caching and retry behaviour can be
+measured reproducibly without an API key or quota.
+
+Point the clients at it with:
+  - Python client: GEMINI_BASE_URL=http://127.0.0.1:8765
+  - Cloud Functions (emulator): GEMINI_API_BASE_URL=http://127.0.0.1:8765
+
+Inspection endpoints:
+  GET /_requests   recorded requests (JSON array)
+  GET /_stats      counters by outcome
+  POST /_reset     clear recorded requests and counters
+
+Usage:
+    python fake_gemini_server.py --latency lognormal:0.8,0.4 --rate-429 0.05
+    python fake_gemini_server.py --latency fixed:0.2 --tail-prob 0.02 --tail-latency 10
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import datetime as dt
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+# =========================
+# CONFIG
+# =========================
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_QUESTION_COUNT = 6
+CHARS_PER_TOKEN = 4  # same approximation as estimateTokens() in tokenCounter.js
+
+PATH_RE = re.compile(r"^/v1(?:beta)?/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)$")
+COUNT_RE = re.compile(r"\b(\d{1,3})\s+(?:[a-z\-/]+\s+){0,3}questions?\b", re.IGNORECASE)
+
+TABLE_HEADER = (
+    "| ID | Discipline | Type | Difficulty | Question | Answer | OptionA | OptionB | "
+    "OptionC | OptionD | CorrectLetter | SourceURL | SourceExcerpt | Tags | QualityScore |\n"
+    "|---|---|---|---|---|---|---|---|---|---|---|---|---|---|---|\n"
+)
+TOPICS = [
+    ("Nanite", "nanite-virtualized-geometry-in-unreal-engine"),
+    ("Lumen", "lumen-global-illumination-and-reflections-in-unreal-engine"),
+    ("World Partition", "world-partition-in-unreal-engine"),
+    ("Niagara", "niagara-visual-effects-in-unreal-engine"),
+    ("Virtual Shadow Maps", "virtual-shadow-maps-in-unreal-engine"),
+    ("Control Rig", "control-rig-in-animation-blueprints-in-unreal-engine"),
+    ("Behavior Trees", "behavior-trees-in-unreal-engine"),
+    ("Chaos Physics", "chaos-physics-in-unreal-engine"),
+]
+DOCS_BASE = "https://dev.epicgames.com/documentation/en-us/unreal-engine/"
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class LatencyModel:
+    """
+    Samples response latency in seconds.
+
+    Spec formats:
+      fixed:S            always S seconds
+      uniform:LO,HI      uniform between LO and HI
+      lognormal:MED,SIG  log-normal with median MED and shape SIG
+    plus an optional heavy tail: with probability tail_prob the sample is
+    replaced by tail_latency (to reproduce occasional very slow responses).
+    """
+
+    def __init__(self, spec: str, tail_prob: float = 0.0, tail_latency: float = 0.0):
+        kind, _, args = spec.partition(":")
+        values = [float(v) for v in args.split(",") if v.strip()] if args else []
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(values) != expected[kind]:
+            raise ValueError(f"invalid latency spec: {spec!r}")
+        self.kind = kind
+        self.values = values
+        self.tail_prob = tail_prob
+        self.tail_latency = tail_latency
+
+    def sample(self, rng: random.Random) -> float:
+        if self.tail_prob and rng.random() < self.tail_prob:
+            return self.tail_latency
+        if self.kind == "fixed":
+            return self.values[0]
+        if self.kind == "uniform":
+            return rng.uniform(self.values[0], self.values[1])
+        median, sigma = self.values
+        return rng.lognormvariate(math.log(max(median, 1e-6)), sigma)
+
+
+class FakeGeminiState:
+    """
+    Shared, thread-safe state for the handler: config, RNG and request log.
+    """
+
+    def __init__(
+        self,
+        latency: LatencyModel,
+        error_rate: float = 0.0,
+        rate_429: float = 0.0,
+        chunk_chars: int = 200,
+        chunk_interval: float = 0.05,
+        canned: Optional[List[str]] = None,
+        record_path: Optional[Path] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.chunk_chars = max(chunk_chars, 1)
+        self.chunk_interval = chunk_interval
+        self.canned = canned or []
+        self.record_path = record_path
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._canned_index = 0
+        self.requests: List[Dict] = []
+        self.stats: Dict[str, int] = {}
+
+    # ----- randomness (random.Random is not thread-safe for our purposes) -----
+    def roll(self) -> Dict:
+        with self._lock:
+            r = self._rng.random()
+            outcome = "ok"
+            if r < self.rate_429:
+                outcome = "429"
+            elif r < self.rate_429 + self.error_rate:
+                outcome = "500"
+            return {
+                "outcome": outcome,
+                "latency": self.latency.sample(self._rng),
+                "seed": self._rng.randrange(1 << 30),
+            }
+
+    def next_canned(self) -> Optional[str]:
+        if not self.canned:
+            return None
+        with self._lock:
+            text = self.canned[self._canned_index % len(self.canned)]
+            self._canned_index += 1
+            return text
+
+    # ----- recording -----
+    def record(self, entry: Dict) -> None:
+        with self._lock:
+            self.requests.append(entry)
+            self.stats[entry["outcome"]] = self.stats.get(entry["outcome"], 0) + 1
+            if self.record_path:
+                with self.record_path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = []
+            self.stats = {}
+
+
+def build_question_table(count: int, rng: random.Random) -> str:
+    """
+    Render `count` plausible questions in the markdown table format the
+    generation prompt asks for (and parseQuestions understands).
+    """
+    rows = []
+    for i in range(1, count + 1):
+        topic, slug = TOPICS[rng.randrange(len(TOPICS))]
+        nonce = rng.randrange(10_000)
+        if rng.random() < 0.25:
+            rows.append(
+                f"| {i} | Technical Art | True/False | Easy | {topic} is a core Unreal Engine 5 "
+                f"feature (variant {nonce}). | TRUE | | | | | A | {DOCS_BASE}{slug} | "
+                f"{topic} ships with Unreal Engine 5. | {topic.lower()} | {rng.randint(70, 98)} |"
+            )
+        else:
+            rows.append(
+                f"| {i} | Technical Art | Multiple Choice | Medium | Which statement about {topic} "
+                f"is correct (variant {nonce})? | It is part of UE5 | It is part of UE5 | "
+                f"It replaces the Content Browser | It is a Blueprint node | It only runs on mobile | A | "
+                f"{DOCS_BASE}{slug} | {topic} is documented for Unreal Engine 5. | "
+                f"{topic.lower()}, ue5 | {rng.randint(70, 98)} |"
+            )
+    return TABLE_HEADER + "\n".join(rows) + "\n"
+
+
+def prompt_text(body: Dict) -> str:
+    """
+    Concatenate all text parts of contents + systemInstruction.
+    """
+    parts = []
+    for content in body.get("contents") or []:
+        for part in content.get("parts") or []:
+            if isinstance(part, dict) and part.get("text"):
+                parts.append(part["text"])
+    system = body.get("systemInstruction") or body.get("system_instruction") or {}
+    for part in system.get("parts") or []:
+        if isinstance(part, dict) and part.get("text"):
+            parts.append(part["text"])
+    return "\n".join(parts)
+
+
+def usage_metadata(prompt_tokens: int, output_tokens: int) -> Dict:
+    return {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": output_tokens,
+        "totalTokenCount": prompt_tokens + output_tokens,
+    }
+
+
+def response_payload(model: str, text: str, usage: Optional[Dict], finished: bool) -> Dict:
+    candidate = {
+        "content": {"role": "model", "parts": [{"text": text}]},
+        "index": 0,
+    }
+    if finished:
+        candidate["finishReason"] = "STOP"
+    payload = {"candidates": [candidate], "modelVersion": model}
+    if usage:
+        payload["usageMetadata"] = usage
+    return payload
+
+
+def error_payload(code: int) -> Dict:
+    if code == 429:
+        return {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).",
+                          "status": "RESOURCE_EXHAUSTED"}}
+    return {"error": {"code": code, "message": "An internal error has occurred.", "status": "INTERNAL"}}
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    server_version = "FakeGemini/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> FakeGeminiState:
+        return self.server.state
+
+    def log_message(self, fmt, *args):  # keep benchmark output quiet
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    # ----- helpers -----
+    def _send_json(self, code: int, payload, headers: Optional[Dict] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw or b"{}")
+        except json.JSONDecodeError:
+            return {}
+
+    # ----- routes -----
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/_requests":
+            with self.state._lock:
+                data = list(self.state.requests)
+            self._send_json(200, data)
+        elif path == "/_stats":
+            with self.state._lock:
+                data = dict(self.state.stats, total=len(self.state.requests))
+            self._send_json(200, data)
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        if parsed.path == "/_reset":
+            self._read_body()
+            self.state.reset()
+            self._send_json(200, {"status": "reset"})
+            return
+
+        match = PATH_RE.match(parsed.path)
+        if not match:
+            self._read_body()
+            self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+            return
+
+        model = match.group("model")
+        stream = match.group("method") == "streamGenerateContent"
+        sse = parse_qs(parsed.query).get("alt", [""])[0] == "sse"
+        body = self._read_body()
+        prompt = prompt_text(body)
+        roll = self.state.roll()
+        received = time.time()
+
+        entry = {
+            "received_utc": dt.datetime.utcfromtimestamp(received).isoformat(),
+            "model": model,
+            "stream": stream,
+            "prompt_chars": len(prompt),
+            "prompt_preview": prompt[:120],
+            "outcome": roll["outcome"],
+            "latency_s": round(roll["latency"], 4),
+        }
+
+        # Errors come back after a short fraction of the latency, like a real overloaded backend
+        if roll["outcome"] != "ok":
+            time.sleep(roll["latency"] * 0.1)
+            code = int(roll["outcome"])
+            headers = {"Retry-After": "1"} if code == 429 else None
+            self.state.record(entry)
+            self._send_json(code, error_payload(code), headers)
+            return
+
+        text = self.state.next_canned()
+        if text is None:
+            count_match = COUNT_RE.search(prompt)
+            count = int(count_match.group(1)) if count_match else DEFAULT_QUESTION_COUNT
+            text = build_question_table(max(1, min(count, 50)), random.Random(roll["seed"]))
+
+        prompt_tokens = estimate_tokens(prompt)
+        output_tokens = estimate_tokens(text)
+        entry["input_tokens"] = prompt_tokens
+        entry["output_tokens"] = output_tokens
+        self.state.record(entry)
+
+        if not stream:
+            time.sleep(roll["latency"])
+            usage = usage_metadata(prompt_tokens, output_tokens)
+            self._send_json(200, response_payload(model, text, usage, finished=True))
+            return
+
+        self._stream(model, text, prompt_tokens, roll["latency"], sse)
+
+    def _stream(self, model: str, text: str, prompt_tokens: int, latency: float, sse: bool) -> None:
+        """
+        Emit text in chunk_chars pieces: first chunk after `latency`, then one
+        every chunk_interval. Usage metadata rides on every chunk (running
+        output count), as the real API does.
+        """
+        step = self.state.chunk_chars
+        pieces = [text[i:i + step] for i in range(0, len(text), step)] or [""]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream" if sse else "application/json; charset=UTF-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_chunk(data: bytes) -> None:
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        time.sleep(latency)
+        sent = ""
+        if not sse:
+            write_chunk(b"[")
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(self.state.chunk_interval)
+            sent += piece
+            last = i == len(pieces) - 1
+            usage = usage_metadata(prompt_tokens, estimate_tokens(sent))
+            payload = json.dumps(response_payload(model, piece, usage, finished=last))
+            if sse:
+                write_chunk(f"data: {payload}\r\n\r\n".encode("utf-8"))
+            else:
+                write_chunk(((",\r\n" if i else "") + payload).encode("utf-8"))
+        if not sse:
+            write_chunk(b"]")
+        write_chunk(b"")
+
+
+def make_server(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    state: Optional[FakeGeminiState] = None,
+    verbose: bool = False,
+) -> ThreadingHTTPServer:
+    """
+    Build (but do not start) a server; port 0 picks a free port.
+
+    Handy for benchmarks and tests:
+        server = make_server(port=0, state=FakeGeminiState(LatencyModel("fixed:0")))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    """
+    server = ThreadingHTTPServer((host, port), FakeGeminiHandler)
+    server.daemon_threads = True
+    server.state = state or FakeGeminiState(LatencyModel("fixed:0"))
+    server.verbose = verbose
+    return server
+
+
+def load_canned(path: Path) -> List[str]:
+    """
+    Canned responses: a JSON array of strings, or JSONL with {"text": ...} per line.
+    """
+    raw = path.read_text(encoding="utf-8")
+    if raw.lstrip().startswith("["):
+        return [str(t) for t in json.loads(raw)]
+    texts = []
+    for line in raw.splitlines():
+        line = line.strip()
+        if line:
+            texts.append(json.loads(line)["text"])
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake Gemini API server")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", default="fixed:0.5",
+                        help="fixed:S | uniform:LO,HI | lognormal:MEDIAN,SIGMA (seconds)")
+    parser.add_argument("--tail-prob", type=float, default=0.0,
+                        help="probability of a slow outlier response")
+    parser.add_argument("--tail-latency", type=float, default=10.0,
+                        help="latency of slow outliers (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of 429 responses")
+    parser.add_argument("--chunk-chars", type=int, default=200, help="characters per streamed chunk")
+    parser.add_argument("--chunk-interval", type=float, default=0.05, help="seconds between streamed chunks")
+    parser.add_argument("--canned", type=Path, help="JSON array or JSONL file of canned response texts")
+    parser.add_argument("--record", type=Path, help="append every received request to this JSONL file")
+    parser.add_argument("--seed", type=int, default=None, help="RNG seed for reproducible runs")
+    parser.add_argument("--verbose", action="store_true", help="log every HTTP request")
+    args = parser.parse_args()
+
+    try:
+        latency = LatencyModel(args.latency, args.tail_prob, args.tail_latency)
+    except ValueError as e:
+        parser.error(str(e))
+
+    state = FakeGeminiState(
+        latency,
+        error_rate=args.error_rate,
+        rate_429=args.rate_429,
+        chunk_chars=args.chunk_chars,
+        chunk_interval=args.chunk_interval,
+        canned=load_canned(args.canned) if args.canned else None,
+        record_path=args.record,
+        seed=args.seed,
+    )
+    server = make_server(args.host, args.port, state, verbose=args.verbose)
+    host, port = server.server_address[:2]
+    print(f"Fake Gemini listening on http://{host}:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+gemini_batch_runner.py
+
+Headless, resumable batch generation on top of gemini_client_with_usage.py.
+
+Reads a JSONL file of prompt jobs and runs them through
+generate_text_with_usage with bounded concurrency. Every finished job is
+appended to a results JSONL file (the checkpoint), so re-running the same
+command after an interruption skips jobs that already succeeded instead of
+paying for them again.
+
+Job file format (one JSON object per line):
+    {"id": "tech-art-easy-001", "prompt": "...", "model": "gemini-2.0-flash", "batch_size": 6}
+
+  - id:         required, unique per job (used as the checkpoint key)
+  - prompt:     required, the full user prompt
+  - model:      optional, defaults to --model
+  - batch_size: optional, number of questions the prompt asks for
+
+Throughput counts the questions actually parsed from each response (via
+question_stream_parser), not the requested batch_size.
+
+Usage:
+    python gemini_batch_runner.py jobs.jsonl results.jsonl
+    python gemini_batch_runner.py jobs.jsonl results.jsonl --concurrency 8
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import datetime as dt
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Set
+
+from gemini_client_with_usage import (
+    configure_attempt_pool,
+    cost_tracker,
+    generate_text_with_usage,
+    set_batch_id,
+)
+from gemini_metrics import start_metrics_server
+from gemini_tracing import enable_tracing, span
+from gemini_pricing import format_cost
+from question_stream_parser import parse_questions
+
+# =========================
+# CONFIG
+# =========================
+DEFAULT_MODEL = "gemini-2.0-flash"
+DEFAULT_CONCURRENCY = 4
+REPORT_INTERVAL_SECONDS = 10
+
+
+def load_completed_ids(results_path: Path) -> Set[str]:
+    """
+    Read the results checkpoint and return the ids of jobs that succeeded.
+
+    A trailing partial line (e.g. the process was killed mid-write) is
+    ignored, so that job simply runs again.
+    """
+    completed = set()
+    if not results_path.exists():
+        return completed
+
+    with results_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if rec.get("status") == "ok" and rec.get("id") is not None:
+                completed.add(str(rec["id"]))
+
+    return completed
+
+
+def iter_jobs(jobs_path: Path, default_model: str) -> Iterator[Dict]:
+    """
+    Stream jobs from the JSONL job file without loading it all into memory.
+    """
+    with jobs_path.open("r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"[batch] skipping line {line_no}: {e}", file=sys.stderr)
+                continue
+            if "id" not in job or "prompt" not in job:
+                print(f"[batch] skipping line {line_no}: missing id/prompt", file=sys.stderr)
+                continue
+            job["id"] = str(job["id"])
+            job.setdefault("model", default_model)
+            yield job
+
+
+def _truncate_partial_line(path: Path, block_size: int = 65536) -> None:
+    """
+    Cut a torn last line (killed mid-write) back to the previous newline, so
+    the next record does not get glued onto it. load_completed_ids already
+    skips that line, so its job runs again either way.
+    """
+    with path.open("rb+") as f:
+        end = f.seek(0, 2)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - block_size)
+            f.seek(start)
+            newline = f.read(pos - start).rfind(b"\n")
+            if newline >= 0:
+                pos = start + newline + 1
+                break
+            pos = start
+        if pos < end:
+            print(f"[batch] dropping {end - pos} bytes of a partial record at the end of {path}",
+                  file=sys.stderr)
+            f.truncate(pos)
+
+
+class ResultWriter:
+    """
+    Append-only, thread-safe checkpoint writer.
+
+    Each record is flushed as soon as it is written so a crash loses at most
+    the job that was in flight.
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            _truncate_partial_line(path)
+        self._file = path.open("a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ThroughputMeter:
+    """
+    Running counters for questions/min and tokens/s since the run started.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.jobs_ok = 0
+        self.jobs_failed = 0
+        self.questions = 0
+        self.tokens = 0
+
+    def record(self, ok: bool, questions: int = 0, tokens: int = 0) -> None:
+        with self._lock:
+            if ok:
+                self.jobs_ok += 1
+                self.questions += questions
+                self.tokens += tokens
+            else:
+                self.jobs_failed += 1
+
+    def summary(self) -> str:
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started, 1e-9)
+            q_per_min = self.questions / elapsed * 60
+            tok_per_s = self.tokens / elapsed
+            return (
+                f"{self.jobs_ok} ok, {self.jobs_failed} failed | "
+                f"{q_per_min:,.1f} questions/min | {tok_per_s:,.0f} tokens/s | "
+                f"{elapsed:,.0f}s elapsed"
+            )
+
+
+def run_job(job: Dict, call_options: Optional[Dict] = None) -> Dict:
+    """
+    Execute one job and build its checkpoint record.
+
+    call_options are passed through to generate_text_with_usage
+    (deadline, max_retries, hedge, call_type).
+    """
+    started = time.monotonic()
+    try:
+        response = generate_text_with_usage(job["model"], job["prompt"], **(call_options or {}))
+    except Exception as e:
+        return {
+            "id": job["id"],
+            "model": job["model"],
+            "status": "error",
+            "error": str(e),
+            "latency_s": round(time.monotonic() - started, 3),
+            "completed_utc": dt.datetime.utcnow().isoformat(),
+        }
+
+    usage = getattr(response, "usage_metadata", None)
+    input_tokens = int(getattr(usage, "prompt_token_count", 0) or 0)
+    output_tokens = int(getattr(usage, "candidates_token_count", 0) or 0)
+
+    text = getattr(response, "text", "") or ""
+    with span("parse", job_id=job["id"]) as trace_args:
+        questions = len(parse_questions(text))
+        trace_args["questions"] = questions
+
+    return {
+        "id": job["id"],
+        "model": job["model"],
+        "status": "ok",
+        "text": text,
+        "batch_size": int(job.get("batch_size", 0) or 0),
+        "questions": questions,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "latency_s": round(time.monotonic() - started, 3),
+        "completed_utc": dt.datetime.utcnow().isoformat(),
+    }
+
+
+def run_batch(
+    jobs_path: Path,
+    results_path: Path,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    default_model: str = DEFAULT_MODEL,
+    report_interval: float = REPORT_INTERVAL_SECONDS,
+    limit: Optional[int] = None,
+    call_options: Optional[Dict] = None,
+    batch_id: Optional[str] = None,
+) -> ThroughputMeter:
+    """
+    Run every job in jobs_path that is not already checkpointed in results_path.
+
+    At most `concurrency` requests are in flight at any time, and jobs are
+    pulled from the file lazily, so memory stays flat for very large job files.
+
+    Returns:
+        meter: the ThroughputMeter with final counts
+    """
+    batch_id = batch_id or results_path.stem
+    set_batch_id(batch_id)
+    call_options = call_options or {}
+    if call_options.get("deadline") is not None or call_options.get("hedge"):
+        # Attempts waiting for a pool worker would eat into their deadline
+        configure_attempt_pool(concurrency, bool(call_options.get("hedge")))
+
+    completed = load_completed_ids(results_path)
+    if completed:
+        print(f"[batch] resuming: {len(completed):,} jobs already done", file=sys.stderr)
+
+    writer = ResultWriter(results_path)
+    meter = ThroughputMeter()
+    last_report = time.monotonic()
+    submitted = 0
+
+    def report(prefix: str = "") -> None:
+        cost = format_cost(cost_tracker.batch_cost(batch_id) or 0.0)
+        print(f"[batch] {prefix}{meter.summary()} | {cost} spent", file=sys.stderr)
+
+    def handle(future) -> None:
+        record = future.result()
+        writer.write(record)
+        ok = record["status"] == "ok"
+        meter.record(
+            ok,
+            questions=record.get("questions", 0),
+            tokens=record.get("input_tokens", 0) + record.get("output_tokens", 0),
+        )
+        if not ok:
+            print(f"[batch] job {record['id']} failed: {record['error']}", file=sys.stderr)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            in_flight = set()
+            for job in iter_jobs(jobs_path, default_model):
+                if job["id"] in completed:
+                    continue
+                if limit is not None and submitted >= limit:
+                    break
+
+                # Keep the in-flight window bounded
+                while len(in_flight) >= concurrency:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        handle(future)
+
+                in_flight.add(pool.submit(run_job, job, call_options))
+                completed.add(job["id"])  # guards against duplicate ids in the job file
+                submitted += 1
+
+                if time.monotonic() - last_report >= report_interval:
+                    report()
+                    last_report = time.monotonic()
+
+            while in_flight:
+                done, in_flight = wait(in_flight, timeout=report_interval,
+                                       return_when=FIRST_COMPLETED)
+                for future in done:
+                    handle(future)
+                if time.monotonic() - last_report >= report_interval:
+                    report()
+                    last_report = time.monotonic()
+    finally:
+        writer.close()
+
+    report("finished: ")
+    return meter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable Gemini batch generation")
+    parser.add_argument("jobs", type=Path, help="JSONL file of prompt jobs")
+    parser.add_argument("results", type=Path, help="append-only JSONL results/checkpoint file")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"max requests in flight (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--model", default=DEFAULT_MODEL,
+                        help=f"model for jobs that do not set one (default: {DEFAULT_MODEL})")
+    parser.add_argument("--report-interval", type=float, default=REPORT_INTERVAL_SECONDS,
+                        help="seconds between throughput reports")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="stop after submitting this many new jobs")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="per-job deadline in seconds, including retries; the attempt pool is "
+                             "sized from --concurrency (doubled with --hedge) so queueing does not "
+                             "count against it")
+    parser.add_argument("--max-retries", type=int, default=None,
+                        help="retries on 429/5xx per job (client default if omitted)")
+    parser.add_argument("--batch-id", default=None,
+                        help="tag usage records with this batch id (default: results file name)")
+    parser.add_argument("--hedge", action="store_true",
+                        help="hedge requests that run past the observed p95 latency")
+    parser.add_argument("--call-type", default="generation",
+                        help="metrics label for these calls, e.g. generation or critique")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--trace", type=Path, default=None,
+                        help="write Chrome trace-event spans to this file")
+    args = parser.parse_args()
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    if args.trace is not None:
+        enable_tracing(args.trace)
+
+    if args.metrics_port is not None:
+        server = start_metrics_server(args.metrics_port)
+        print(f"[batch] metrics on http://127.0.0.1:{server.server_address[1]}/metrics",
+              file=sys.stderr)
+
+    call_options = {"deadline": args.deadline, "hedge": args.hedge, "call_type": args.call_type}
+    if args.max_retries is not None:
+        call_options["max_retries"] = args.max_retries
+
+    meter = run_batch(
+        args.jobs,
+        args.results,
+        concurrency=args.concurrency,
+        default_model=args.model,
+        report_interval=args.report_interval,
+        limit=args.limit,
+        call_options=call_options,
+        batch_id=args.batch_id,
+    )
+    sys.exit(1 if meter.jobs_failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,252 @@
 import os
 import json
+import itertools
+import random
+import threading
+import time
+import uuid
+import weakref
+import asyncio
+import atexit
 import datetime as dt
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
-from google import genai
+
+import gemini_metrics as metrics
+import gemini_tracing as tracing
+from gemini_pricing import CostAggregator, calculate_cost
+from gemini_usage_binlog import BinaryUsageWriter
 
 """
 gemini_client_with_usage.py
 
 Wrapper around Google Gemini that logs token usage per call into a local JSONL file.
 The floating widget reads that file to display daily token usage.
+
+Calls are retried with exponential backoff + jitter on 429/5xx, can be given
+an overall deadline, and can optionally be hedged: if an attempt is still
+running after the p95 latency observed so far, a duplicate request is fired
+and whichever finishes first wins. Every attempt that returns usage is
+logged (including the losing hedge), so the usage log reflects real cost.
+
+Each usage record carries its USD cost from the shared pricing table
+(gemini_pricing.py), and cost_tracker keeps per-model, per-day and per-batch
+totals in memory for this process.
+
+Requests, tokens, cost, latency and retries are also counted in
+gemini_metrics.py (labelled by model and call_type) and can be scraped from
+a local /metrics endpoint via gemini_metrics.start_metrics_server().
+
+Set GEMINI_TRACE_PATH to record per-call spans (network, time to first
+chunk, backoff, usage logging) in Chrome trace-event format; see
+gemini_tracing.py.
+
+The genai.Client is built on first use (get_client()), so importing this
+module needs neither the SDK import cost nor GOOGLE_API_KEY. One client with
+a pooled keep-alive transport is shared by all threads, so long batch runs
+reuse TLS connections instead of re-handshaking.
 """
 
 # Load GOOGLE_API_KEY from .env or environment variables
 load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise RuntimeError("GOOGLE_API_KEY not set in environment or .env file")
 
-# Gemini client
-client = genai.Client(api_key=GOOGLE_API_KEY)
+# Optional API endpoint override, e.g. fake_gemini_server.py for offline benchmarks
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
 
 # Path where we log usage locally (same folder as this script by default)
 USAGE_LOG_PATH = Path(__file__).resolve().parent / "gemini_usage_log.jsonl"
 
+# "jsonl" (default), "binary" (fixed-width records, see gemini_usage_binlog.py) or "both"
+USAGE_LOG_FORMAT = os.getenv("GEMINI_USAGE_LOG_FORMAT", "jsonl").lower()
+USAGE_BIN_LOG_PATH = USAGE_LOG_PATH.with_suffix(".bin")
 
-def _log_usage(model: str, input_tokens: int, output_tokens: int) -> None:
+# Retry / deadline / hedging defaults
+DEFAULT_DEADLINE_SECONDS = None      # None = no overall deadline
+DEFAULT_MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20               # don't hedge until the p95 estimate means something
+LATENCY_WINDOW = 500                 # successful-call latencies kept for the estimate
+ATTEMPT_POOL_SIZE = 32               # threads for deadline/hedged attempts; see configure_attempt_pool()
+
+# Keep-alive connection pool for the shared client's HTTP transport
+HTTP_MAX_CONNECTIONS = ATTEMPT_POOL_SIZE + 8
+HTTP_MAX_KEEPALIVE_CONNECTIONS = ATTEMPT_POOL_SIZE
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 90
+
+
+class LatencyTracker:
     """
-    Append a usage record to the local JSONL file.
+    Thread-safe sliding window of successful call latencies (seconds).
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(int(q * len(ordered)), len(ordered) - 1)
+        return ordered[index]
+
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()    # event loop -> genai.Client
+
+
+def _build_client():
+    """
+    Create a genai.Client with a pooled keep-alive transport.
+
+    google-genai's HTTP transport (httpx) is thread-safe, so one client is
+    shared by every thread. Versions of google-genai that don't accept
+    client_args get a plain client with the SDK's default pool.
+    """
+    from google import genai  # deferred: importing the SDK is slow
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise RuntimeError("GOOGLE_API_KEY not set in environment or .env file")
+
+    http_options = {"base_url": GEMINI_BASE_URL} if GEMINI_BASE_URL else {}
+    try:
+        import httpx
+
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        pooled = dict(http_options, client_args={"limits": limits},
+                      async_client_args={"limits": limits})
+        return genai.Client(api_key=api_key, http_options=pooled)
+    except (ImportError, TypeError, ValueError):
+        return genai.Client(api_key=api_key, http_options=http_options or None)
+
+
+def get_client():
+    """
+    The process-wide Gemini client, created on first use.
+
+    Raises:
+        RuntimeError: GOOGLE_API_KEY is not set
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+
+def get_async_client():
+    """
+    Async (client.aio) interface for the running event loop.
+
+    httpx async connections are bound to the loop that opened them, so each
+    loop gets its own client; it is dropped when the loop is garbage collected.
+    """
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = _build_client()
+    return client.aio
+
+
+def close_client() -> None:
+    """
+    Close the shared client's connection pool (a new one is built on next use).
+    """
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    close = getattr(client, "close", None)
+    if close is not None:
+        close()
+
+
+atexit.register(close_client)
+
+
+def __getattr__(name):
+    # Backwards compatible `gemini_client_with_usage.client`, built lazily
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+latency_tracker = LatencyTracker()
+cost_tracker = CostAggregator()
+_batch_id: Optional[str] = None
+_attempt_pool = ThreadPoolExecutor(max_workers=ATTEMPT_POOL_SIZE, thread_name_prefix="gemini-attempt")
+_attempt_pool_size = ATTEMPT_POOL_SIZE
+_attempt_pool_lock = threading.Lock()
+_binary_writer: Optional[BinaryUsageWriter] = None
+_binary_writer_lock = threading.Lock()
+
+
+def configure_attempt_pool(concurrency: int, hedge: bool = False) -> int:
+    """
+    Size the deadline/hedge attempt pool for `concurrency` simultaneous calls.
+
+    Time an attempt spends queued for a worker counts against its deadline,
+    so every call needs its attempts (two when hedging) to start at once. An
+    attempt abandoned at its deadline keeps its worker until the HTTP call
+    returns, so the pool gets twice that as headroom. The pool only grows,
+    and the HTTP connection limits grow with it for clients built afterwards.
+
+    Returns:
+        the pool size
+    """
+    global _attempt_pool, _attempt_pool_size, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS
+    needed = concurrency * (2 if hedge else 1) * 2
+    with _attempt_pool_lock:
+        if needed > _attempt_pool_size:
+            old = _attempt_pool
+            _attempt_pool = ThreadPoolExecutor(max_workers=needed, thread_name_prefix="gemini-attempt")
+            _attempt_pool_size = needed
+            old.shutdown(wait=False)   # attempts already submitted still finish
+            HTTP_MAX_CONNECTIONS = max(HTTP_MAX_CONNECTIONS, needed + 8)
+            HTTP_MAX_KEEPALIVE_CONNECTIONS = max(HTTP_MAX_KEEPALIVE_CONNECTIONS, needed)
+        return _attempt_pool_size
+
+
+def set_batch_id(batch_id: Optional[str]) -> None:
+    """
+    Tag subsequent usage records with a batch id (None to clear).
+    """
+    global _batch_id
+    _batch_id = batch_id
+
+
+def _log_usage(
+    model: str,
+    input_tokens: int,
+    output_tokens: int,
+    request_id: Optional[str] = None,
+    attempt: int = 1,
+    hedge: bool = False,
+    call_type: str = "generation",
+) -> None:
+    """
+    Append a usage record to the local usage log.
+
+    USAGE_LOG_FORMAT selects the JSONL file, the binary log
+    (USAGE_BIN_LOG_PATH) or both.
 
     Each line is a JSON object with:
       - timestamp_utc: ISO8601 timestamp in UTC
@@ -35,78 +254,275 @@ def _log_usage(model: str, input_tokens: int, output_tokens: int) -> None:
       - input_tokens: prompt tokens
       - output_tokens: completion tokens
       - total_tokens: sum of input + output
+      - request_id: id shared by all attempts of one logical call
+      - attempt: 1-based attempt number within that call
+      - hedge: True if this attempt was a hedged duplicate
+      - call_type: "generation", "critique", ...
+      - input_cost / output_cost / cost: USD, from the shared pricing table
+      - batch_id: set via set_batch_id(), or null
     """
+    input_cost, output_cost = calculate_cost(input_tokens, output_tokens, model)
     record = {
         "timestamp_utc": dt.datetime.utcnow().isoformat(),
         "model": model,
         "input_tokens": int(input_tokens),
         "output_tokens": int(output_tokens),
         "total_tokens": int(input_tokens + output_tokens),
+        "request_id": request_id,
+        "attempt": int(attempt),
+        "hedge": bool(hedge),
+        "call_type": call_type,
+        "input_cost": round(input_cost, 9),
+        "output_cost": round(output_cost, 9),
+        "cost": round(input_cost + output_cost, 9),
+        "batch_id": _batch_id,
     }
+    cost_tracker.add(record)
+    metrics.input_tokens_total.inc(model, call_type, amount=record["input_tokens"])
+    metrics.output_tokens_total.inc(model, call_type, amount=record["output_tokens"])
+    metrics.cost_usd_total.inc(model, call_type, amount=record["cost"])
+
+    with tracing.span("log_usage", cat="io", format=USAGE_LOG_FORMAT):
+        if USAGE_LOG_FORMAT in ("binary", "both"):
+            global _binary_writer
+            # Attempts log from _attempt_pool threads: build one shared writer
+            with _binary_writer_lock:
+                if _binary_writer is None or _binary_writer.path != USAGE_BIN_LOG_PATH:
+                    _binary_writer = BinaryUsageWriter(USAGE_BIN_LOG_PATH)
+                writer = _binary_writer
+            writer.append(record)
+            if USAGE_LOG_FORMAT == "binary":
+                return
+
+        # Ensure directory exists
+        USAGE_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+        # Append as JSONL (one JSON per line)
+        with USAGE_LOG_PATH.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def _is_retryable(error: Exception) -> bool:
+    """
+    429 and 5xx are retryable; google.genai errors carry the HTTP status in .code.
+    """
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    try:
+        return int(code) in RETRYABLE_STATUS_CODES
+    except (TypeError, ValueError):
+        return False
+
+
+def _backoff_delay(retry: int) -> float:
+    """
+    Exponential backoff with full jitter: uniform(0, min(max, base * 2^retry)).
+    """
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** retry)))
+
+
+def _remaining(deadline_at: Optional[float]) -> Optional[float]:
+    if deadline_at is None:
+        return None
+    return max(deadline_at - time.monotonic(), 0.0)
+
+
+def _call_once(
+    model: str,
+    prompt: str,
+    request_id: str,
+    attempt: int,
+    hedge: bool,
+    kwargs: dict,
+    call_type: str = "generation",
+):
+    """
+    One generate_content attempt. Logs its own usage when it returns, so an
+    abandoned (timed out or out-raced) attempt is still accounted for.
+    """
+    with tracing.span("attempt", request_id=request_id, attempt=attempt, hedge=hedge) as trace_args:
+        started = time.monotonic()
+        try:
+            with tracing.span("network", cat="net", model=model):
+                response = get_client().models.generate_content(
+                    model=model,
+                    contents=[{"role": "user", "parts": [{"text": prompt}]}],
+                    **kwargs,
+                )
+        except Exception:
+            metrics.requests_total.inc(model, call_type, "error")
+            metrics.request_latency_seconds.observe(model, call_type, value=time.monotonic() - started)
+            raise
+        latency = time.monotonic() - started
+        latency_tracker.add(latency)
+        metrics.requests_total.inc(model, call_type, "ok")
+        metrics.request_latency_seconds.observe(model, call_type, value=latency)
+
+        # usage_metadata should contain token counts for this call
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            # attribute names per Gemini Python client
+            input_tokens = getattr(usage, "prompt_token_count", 0) or 0
+            output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+            trace_args.update(input_tokens=input_tokens, output_tokens=output_tokens)
+            _log_usage(model, input_tokens, output_tokens, request_id, attempt, hedge, call_type)
+
+        return response
+
 
-    # Ensure directory exists
-    USAGE_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+def _run_attempt(model, prompt, request_id, counter, kwargs, deadline_at, hedge, call_type):
+    """
+    Run one logical attempt, optionally hedged, honouring the deadline.
+
+    `counter` hands out attempt numbers so retries and hedges of the same
+    call are numbered consecutively in the usage log. Raises the attempt's
+    error, or TimeoutError when the deadline passes first.
+    """
+    # Fast path: no deadline and no hedging -> call inline
+    if deadline_at is None and not hedge:
+        return _call_once(model, prompt, request_id, next(counter), False, kwargs, call_type)
 
-    # Append as JSONL (one JSON per line)
-    with USAGE_LOG_PATH.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(record) + "\n")
+    futures = {_attempt_pool.submit(
+        _call_once, model, prompt, request_id, next(counter), False, kwargs, call_type)}
 
+    hedge_after = latency_tracker.percentile(HEDGE_PERCENTILE) if hedge else None
+    if hedge_after is not None:
+        remaining = _remaining(deadline_at)
+        wait_for = hedge_after if remaining is None else min(hedge_after, remaining)
+        done, _ = wait(futures, timeout=wait_for)
+        if not done and (deadline_at is None or _remaining(deadline_at) > 0):
+            futures.add(_attempt_pool.submit(
+                _call_once, model, prompt, request_id, next(counter), True, kwargs, call_type))
 
-def generate_text_with_usage(model: str, prompt: str, **kwargs):
+    last_error = None
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=_remaining(deadline_at), return_when=FIRST_COMPLETED)
+        if not done:
+            raise TimeoutError(f"Gemini call {request_id} exceeded its deadline")
+        for future in done:
+            error = future.exception()
+            if error is None:
+                return future.result()
+            last_error = error
+    raise last_error
+
+
+def generate_text_with_usage(
+    model: str,
+    prompt: str,
+    deadline: Optional[float] = DEFAULT_DEADLINE_SECONDS,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    hedge: bool = False,
+    call_type: str = "generation",
+    **kwargs,
+):
     """
     Call Gemini's generate_content API and log token usage.
 
     Args:
         model: model name, e.g. "gemini-2.0-flash"
         prompt: user prompt (string)
+        deadline: overall seconds allowed for the call including retries (None = no limit)
+        max_retries: retries on 429/5xx before giving up
+        hedge: fire a duplicate request once an attempt exceeds the observed p95 latency
+        call_type: metrics/log label, e.g. "generation" or "critique"
         **kwargs: any extra args for generate_content, e.g. generation_config
 
     Returns:
         response: the normal Gemini response object
-    """
-    response = client.models.generate_content(
-        model=model,
-        contents=[{"role": "user", "parts": [{"text": prompt}]}],
-        **kwargs,
-    )
 
-    # usage_metadata should contain token counts for this call
-    usage = getattr(response, "usage_metadata", None)
-    if usage:
-        # attribute names per Gemini Python client
-        input_tokens = getattr(usage, "prompt_token_count", 0)
-        output_tokens = getattr(usage, "candidates_token_count", 0)
-        _log_usage(model, input_tokens, output_tokens)
+    Raises:
+        TimeoutError: the deadline passed before any attempt succeeded
+    """
+    deadline_at = time.monotonic() + deadline if deadline is not None else None
+    request_id = uuid.uuid4().hex[:12]
+    counter = itertools.count(1)
 
-    return response
+    with tracing.span("generate_text", model=model, request_id=request_id, call_type=call_type):
+        for retry in range(max_retries + 1):
+            try:
+                return _run_attempt(
+                    model, prompt, request_id, counter, kwargs, deadline_at, hedge, call_type)
+            except TimeoutError:
+                raise
+            except Exception as e:
+                if not _is_retryable(e) or retry == max_retries:
+                    raise
+                delay = _backoff_delay(retry)
+                remaining = _remaining(deadline_at)
+                if remaining is not None and delay >= remaining:
+                    raise TimeoutError(f"Gemini call {request_id} exceeded its deadline") from e
+                metrics.retries_total.inc(model, call_type)
+                with tracing.span("backoff", retry=retry, delay_s=round(delay, 3)):
+                    time.sleep(delay)
 
 
-def generate_stream_with_usage(model: str, prompt: str, **kwargs):
+def generate_stream_with_usage(
+    model: str,
+    prompt: str,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    call_type: str = "generation",
+    **kwargs,
+):
     """
     Streaming variant that logs usage after the stream finishes.
 
+    429/5xx errors raised before the first chunk arrives are retried with
+    backoff; once chunks have been yielded, errors propagate to the caller.
+
     Yields:
         chunks: streaming response chunks, same as generate_content_stream
     """
-    stream = client.models.generate_content_stream(
-        model=model,
-        contents=[{"role": "user", "parts": [{"text": prompt}]}],
-        **kwargs,
-    )
+    request_id = uuid.uuid4().hex[:12]
+    started = time.monotonic()
+    trace_start = tracing.now_us()
+
+    for retry in range(max_retries + 1):
+        try:
+            with tracing.span("time_to_first_chunk", cat="net", request_id=request_id,
+                              attempt=retry + 1):
+                stream = get_client().models.generate_content_stream(
+                    model=model,
+                    contents=[{"role": "user", "parts": [{"text": prompt}]}],
+                    **kwargs,
+                )
+                iterator = iter(stream)
+                first = next(iterator, None)
+            break
+        except Exception as e:
+            metrics.requests_total.inc(model, call_type, "error")
+            if not _is_retryable(e) or retry == max_retries:
+                raise
+            metrics.retries_total.inc(model, call_type)
+            delay = _backoff_delay(retry)
+            with tracing.span("backoff", retry=retry, delay_s=round(delay, 3)):
+                time.sleep(delay)
+            started = time.monotonic()
 
     final_usage = None
 
     # Yield chunks as they arrive
-    for chunk in stream:
+    if first is not None:
+        if getattr(first, "usage_metadata", None):
+            final_usage = first.usage_metadata
+        yield first
+    for chunk in iterator:
         if getattr(chunk, "usage_metadata", None):
             final_usage = chunk.usage_metadata
         yield chunk
 
+    metrics.requests_total.inc(model, call_type, "ok")
+    metrics.request_latency_seconds.observe(model, call_type, value=time.monotonic() - started)
+
     # After stream ends, log usage if available
     if final_usage:
-        input_tokens = getattr(final_usage, "prompt_token_count", 0)
-        output_tokens = getattr(final_usage, "candidates_token_count", 0)
-        _log_usage(model, input_tokens, output_tokens)
+        input_tokens = getattr(final_usage, "prompt_token_count", 0) or 0
+        output_tokens = getattr(final_usage, "candidates_token_count", 0) or 0
+        _log_usage(model, input_tokens, output_tokens, request_id, retry + 1, call_type=call_type)
+
+    if trace_start is not None:
+        tracing.record_span("generate_stream", trace_start, model=model, request_id=request_id,
+                            call_type=call_type, attempts=retry + 1)
 
 
 if __name__ == "__main__":
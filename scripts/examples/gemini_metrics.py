@@ -0,0 +1,231 @@
+"""
+gemini_metrics.py
+
+In-process Prometheus/OpenMetrics metrics for the Gemini client.
+
+gemini_client_with_usage.py updates these on every call; start_metrics_server()
+exposes them on a local /metrics endpoint so long batch runs can be scraped
+and alerted on (throughput drops, retry storms, cost burn).
+
+Metrics (all labelled by model and call_type, e.g. "generation"/"critique"):
+  gemini_requests_total{status}        attempts, status = ok | error
+  gemini_input_tokens_total            prompt tokens
+  gemini_output_tokens_total           completion tokens
+  gemini_cost_usd_total                USD, from the shared pricing table
+  gemini_retries_total                 backoff retries after 429/5xx
+  gemini_cache_hits_total              responses served from a caller's cache
+  gemini_request_latency_seconds       histogram of attempt latency
+
+Stdlib only. The default response is the Prometheus text format (0.0.4);
+scrapers that send Accept: application/openmetrics-text get OpenMetrics.
+
+Usage:
+    from gemini_metrics import start_metrics_server
+    start_metrics_server(9464)
+    curl http://127.0.0.1:9464/metrics
+"""
+import bisect
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# =========================
+# CONFIG
+# =========================
+DEFAULT_METRICS_HOST = "127.0.0.1"
+DEFAULT_METRICS_PORT = 9464
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """
+    Monotonic counter keyed by label values.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("counters can only increase")
+        key = tuple(str(v) for v in labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(tuple(str(v) for v in labels), 0.0)
+
+    def render(self, openmetrics: bool = False) -> List[str]:
+        # OpenMetrics names the family without the _total suffix
+        family = self.name[:-len("_total")] if openmetrics and self.name.endswith("_total") else self.name
+        lines = [f"# HELP {family} {self.documentation}", f"# TYPE {family} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram keyed by label values.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (non-cumulative, last = +Inf), sum]
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *labels: str, value: float) -> None:
+        key = tuple(str(v) for v in labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            series = self._series.get(tuple(str(v) for v in labels))
+            return sum(series[0]) if series else 0
+
+    def render(self, openmetrics: bool = False) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        return lines
+
+
+LABELS = ("model", "call_type")
+
+requests_total = Counter(
+    "gemini_requests_total", "Gemini API attempts by outcome.", LABELS + ("status",))
+input_tokens_total = Counter(
+    "gemini_input_tokens_total", "Prompt tokens reported by usage_metadata.", LABELS)
+output_tokens_total = Counter(
+    "gemini_output_tokens_total", "Completion tokens reported by usage_metadata.", LABELS)
+cost_usd_total = Counter(
+    "gemini_cost_usd_total", "Estimated spend in USD from modelPricing.json.", LABELS)
+retries_total = Counter(
+    "gemini_retries_total", "Backoff retries after retryable (429/5xx) errors.", LABELS)
+cache_hits_total = Counter(
+    "gemini_cache_hits_total", "Responses served from a cache instead of the API.", LABELS)
+request_latency_seconds = Histogram(
+    "gemini_request_latency_seconds", "Latency of individual Gemini API attempts.", LABELS)
+
+REGISTRY = (
+    requests_total,
+    input_tokens_total,
+    output_tokens_total,
+    cost_usd_total,
+    retries_total,
+    cache_hits_total,
+    request_latency_seconds,
+)
+
+
+def record_cache_hit(model: str, call_type: str = "generation") -> None:
+    """
+    For callers that cache responses: count a call the API never saw.
+    """
+    cache_hits_total.inc(model, call_type)
+
+
+def render_metrics(openmetrics: bool = False) -> str:
+    """
+    Text exposition of every metric in REGISTRY.
+    """
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(openmetrics))
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    server_version = "GeminiMetrics/1.0"
+
+    def log_message(self, fmt, *args):  # scraped every few seconds; stay quiet
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404, "only /metrics is served")
+            return
+        openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+        body = render_metrics(openmetrics).encode("utf-8")
+        self.send_response(200)
+        self.send_header(
+            "Content-Type", OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(
+    port: int = DEFAULT_METRICS_PORT,
+    host: str = DEFAULT_METRICS_HOST,
+) -> ThreadingHTTPServer:
+    """
+    Serve /metrics from a background daemon thread. Port 0 picks a free port.
+
+    Returns:
+        server: call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="gemini-metrics", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,128 @@
+"""
+gemini_pricing.py
+
+Python side of the shared pricing table (src/utils/modelPricing.json, also
+used by src/utils/tokenCounter.js) plus an in-memory cost aggregator.
+
+calculate_cost() follows tokenCounter.js: prices are USD per 1M tokens and
+unknown models fall back to the default model's price. CostAggregator keeps
+running per-model, per-day and per-batch totals that are updated in O(1) per
+usage record, so budget views never have to re-read the raw usage log.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Shared data file; override with GEMINI_PRICING_PATH for a custom table
+PRICING_PATH = Path(
+    os.getenv("GEMINI_PRICING_PATH")
+    or Path(__file__).resolve().parents[2] / "src" / "utils" / "modelPricing.json"
+)
+TOKENS_PER_UNIT = 1_000_000
+
+
+def load_pricing(path: Path = PRICING_PATH) -> Dict:
+    """
+    Load the pricing table: {"defaultModel": ..., "pricing": {...}, "tokenLimits": {...}}.
+    """
+    with Path(path).open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+_table = load_pricing()
+
+
+def get_model_pricing(model: str) -> Dict[str, float]:
+    """
+    Per-1M-token prices for `model`, falling back to the default model.
+    """
+    pricing = _table["pricing"]
+    return pricing.get(model) or pricing[_table["defaultModel"]]
+
+
+def calculate_cost(input_tokens: int, output_tokens: int, model: str) -> Tuple[float, float]:
+    """
+    Returns:
+        (input_cost, output_cost) in USD
+    """
+    prices = get_model_pricing(model)
+    input_cost = input_tokens / TOKENS_PER_UNIT * prices["input"]
+    output_cost = output_tokens / TOKENS_PER_UNIT * prices["output"]
+    return input_cost, output_cost
+
+
+def _empty_bucket() -> Dict:
+    return {
+        "requests": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "input_cost": 0.0,
+        "output_cost": 0.0,
+        "cost": 0.0,
+    }
+
+
+class CostAggregator:
+    """
+    Thread-safe running totals keyed by model, UTC day and batch id.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = _empty_bucket()
+        self.by_model: Dict[str, Dict] = {}
+        self.by_day: Dict[str, Dict] = {}
+        self.by_batch: Dict[str, Dict] = {}
+
+    def add(self, record: Dict) -> None:
+        """
+        Fold one usage record (as written by _log_usage) into the totals.
+        """
+        day = (record.get("timestamp_utc") or "")[:10]
+        keyed = [(self.by_model, record.get("model") or "unknown"), (self.by_day, day)]
+        if record.get("batch_id"):
+            keyed.append((self.by_batch, record["batch_id"]))
+
+        with self._lock:
+            buckets = [self.total]
+            for table, key in keyed:
+                bucket = table.get(key)
+                if bucket is None:
+                    bucket = table[key] = _empty_bucket()
+                buckets.append(bucket)
+
+            for bucket in buckets:
+                bucket["requests"] += 1
+                bucket["input_tokens"] += int(record.get("input_tokens", 0))
+                bucket["output_tokens"] += int(record.get("output_tokens", 0))
+                bucket["input_cost"] += float(record.get("input_cost", 0.0))
+                bucket["output_cost"] += float(record.get("output_cost", 0.0))
+                bucket["cost"] += float(record.get("cost", 0.0))
+
+    def snapshot(self) -> Dict:
+        """
+        Copy of all totals, safe to serialise or hand to another thread.
+        """
+        with self._lock:
+            return {
+                "total": dict(self.total),
+                "by_model": {k: dict(v) for k, v in self.by_model.items()},
+                "by_day": {k: dict(v) for k, v in self.by_day.items()},
+                "by_batch": {k: dict(v) for k, v in self.by_batch.items()},
+            }
+
+    def batch_cost(self, batch_id: str) -> Optional[float]:
+        with self._lock:
+            bucket = self.by_batch.get(batch_id)
+            return bucket["cost"] if bucket else None
+
+
+def format_cost(cost: float) -> str:
+    """
+    Same display rule as formatCost() in tokenCounter.js.
+    """
+    if cost < 0.01:
+        return f"${cost * 1000:.3f}k"
+    return f"${cost:.4f}"
@@ -1,66 +1,97 @@
+import argparse
 import json
-import datetime as dt
+import os
 import threading
-import time
 import tkinter as tk
+import urllib.error
+import urllib.request
 from pathlib import Path
 from tkinter import messagebox
 
+from gemini_usage_tail import (
+    RATE_AVERAGE_MINUTES,
+    UsageLogTail,
+    UsageLogWatcher,
+    current_epoch_minute,
+    seconds_until_next_minute,
+    seconds_until_utc_midnight,
+)
+
 # =========================
 # CONFIG
 # =========================
-POLL_INTERVAL_SECONDS = 30   # how often to refresh (seconds)
 WINDOW_OPACITY = 0.9
 BACKGROUND = "#111111"
 FOREGROUND = "#00ff99"
 FONT = ("Segoe UI", 10)
+SPARKLINE_WIDTH = 30         # characters; each covers RATE_WINDOW_MINUTES / SPARKLINE_WIDTH minutes
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
 
 USAGE_LOG_PATH = Path("gemini_usage_log.jsonl")
 
+# Optional gemini_usage_daemon.py URL; when set the widget queries it instead of tailing the log
+USAGE_DAEMON_URL = os.getenv("GEMINI_USAGE_DAEMON_URL")
+DAEMON_LONG_POLL_SECONDS = 60
+DAEMON_RETRY_SECONDS = 5
 
-def get_today_token_usage() -> int:
+
+def sparkline(values, width: int = SPARKLINE_WIDTH) -> str:
     """
-    Read the local usage log and sum total tokens for 'today' (UTC).
+    Render values as block characters, summing neighbours down to `width` columns.
     """
-    if not USAGE_LOG_PATH.exists():
-        return 0
+    if not values:
+        return ""
+    step = max(len(values) // width, 1)
+    buckets = [sum(values[i:i + step]) for i in range(0, len(values), step)]
+    peak = max(buckets)
+    if peak <= 0:
+        return SPARK_CHARS[0] * len(buckets)
+    top = len(SPARK_CHARS) - 1
+    return "".join(SPARK_CHARS[round(v / peak * top)] for v in buckets)
 
-    now = dt.datetime.utcnow()
-    start_of_day = dt.datetime(now.year, now.month, now.day)
-    end_of_day = start_of_day + dt.timedelta(days=1)
 
-    total_tokens = 0
+_usage_tail = UsageLogTail(USAGE_LOG_PATH)
 
-    with USAGE_LOG_PATH.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                rec = json.loads(line)
-            except json.JSONDecodeError:
-                continue
 
-            ts_str = rec.get("timestamp_utc")
-            if not ts_str:
-                continue
+def get_today_token_usage() -> int:
+    """
+    Sum total tokens for 'today' (UTC) from the local usage log.
+
+    Incremental: only lines appended since the last call are parsed.
+    """
+    return _usage_tail.poll()
 
-            try:
-                ts = dt.datetime.fromisoformat(ts_str)
-            except ValueError:
-                continue
 
-            if not (start_of_day <= ts < end_of_day):
-                continue
+def format_status(total: int, series) -> str:
+    """
+    Widget text: today's total, burn rates, last-hour sparkline and a
+    projected end-of-day total at the last hour's average rate.
+
+    `series` is [(tokens, requests), ...] per minute, oldest first, ending now.
+    """
+    recent = series[-RATE_AVERAGE_MINUTES:]
+    tokens_per_min = sum(t for t, _ in recent) / RATE_AVERAGE_MINUTES
+    requests_per_min = sum(r for _, r in recent) / RATE_AVERAGE_MINUTES
+    hour_rate = sum(t for t, _ in series) / len(series)
+    minutes_left = (1440 - current_epoch_minute() % 1440)
+    projected = total + hour_rate * minutes_left
+    return (
+        f"Gemini today: {total:,} tokens\n"
+        f"{tokens_per_min:,.0f} tok/min · {requests_per_min:.1f} req/min\n"
+        f"{sparkline([t for t, _ in series])}\n"
+        f"EOD ≈ {projected:,.0f} tokens"
+    )
 
-            total_tokens += int(rec.get("total_tokens", 0))
 
-    return total_tokens
+def _fetch_json(url: str, timeout: float):
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return json.load(resp)
 
 
 class TokenWidget:
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, daemon_url: str = None):
         self.root = root
+        self.daemon_url = daemon_url.rstrip("/") if daemon_url else None
         self.root.title("Gemini Tokens")
         self.root.overrideredirect(True)   # borderless
         self.root.attributes("-topmost", True)
@@ -78,6 +109,7 @@ class TokenWidget:
             bg=BACKGROUND,
             padx=10,
             pady=5,
+            justify=tk.LEFT,
         )
         self.label.pack()
 
@@ -91,7 +123,10 @@ class TokenWidget:
         self.label.bind("<Button-3>", self.on_right_click)
 
         self._stop_flag = False
-        self.thread = threading.Thread(target=self.poll_loop, daemon=True)
+        self._stop_event = threading.Event()
+        self.watcher = None if self.daemon_url else UsageLogWatcher(USAGE_LOG_PATH)
+        target = self.daemon_loop if self.daemon_url else self.poll_loop
+        self.thread = threading.Thread(target=target, daemon=True)
         self.thread.start()
 
         self.update_label("Gemini: loading...")
@@ -117,34 +152,72 @@ class TokenWidget:
 
     def quit(self):
         self._stop_flag = True
+        self._stop_event.set()
+        if self.watcher:
+            self.watcher.close()
         self.root.destroy()
 
-    # ----- polling -----
+    # ----- refresh -----
     def poll_loop(self):
+        """
+        Refresh on every change to the usage log, once a minute while there
+        was activity in the last hour (so rates decay), and at UTC midnight
+        so the daily total resets; otherwise sleep.
+        """
         while not self._stop_flag:
             try:
                 total = get_today_token_usage()
+                series = _usage_tail.rates.series(current_epoch_minute())
                 self.root.after(
-                    0, self.update_label, f"Gemini today: {total:,} tokens"
+                    0, self.update_label, format_status(total, series)
                 )
             except Exception as e:
                 self.root.after(
                     0, self.update_label, f"ERR: {str(e)[:40]}"
                 )
 
-            for _ in range(POLL_INTERVAL_SECONDS):
-                if self._stop_flag:
-                    break
-                time.sleep(1)
+            timeout = seconds_until_utc_midnight()
+            if _usage_tail.rates.active(current_epoch_minute()):
+                timeout = min(timeout, seconds_until_next_minute())
+            self.watcher.wait_for_change(timeout)
+
+    def daemon_loop(self):
+        """
+        Thin-client mode: long-poll gemini_usage_daemon.py, which wakes us
+        as soon as new usage arrives.
+        """
+        version = -1
+        while not self._stop_flag:
+            try:
+                today = _fetch_json(
+                    f"{self.daemon_url}/today?since={version}&timeout={DAEMON_LONG_POLL_SECONDS}",
+                    DAEMON_LONG_POLL_SECONDS + 10,
+                )
+                last_hour = _fetch_json(f"{self.daemon_url}/last-hour", 10)
+                version = today["version"]
+                series = [(m["tokens"], m["requests"]) for m in last_hour["series"]]
+                self.root.after(
+                    0, self.update_label, format_status(today["total_tokens"], series)
+                )
+            except (urllib.error.URLError, OSError, ValueError, KeyError) as e:
+                self.root.after(
+                    0, self.update_label, f"ERR: daemon {str(e)[:32]}"
+                )
+                self._stop_event.wait(DAEMON_RETRY_SECONDS)
 
     def update_label(self, text: str):
         self.label.config(text=text)
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Floating Gemini token usage widget")
+    parser.add_argument("--daemon", default=USAGE_DAEMON_URL,
+                        help="gemini_usage_daemon.py URL, e.g. http://127.0.0.1:8766")
+    args = parser.parse_args()
+
     root = tk.Tk()
     try:
-        app = TokenWidget(root)
+        app = TokenWidget(root, daemon_url=args.daemon)
         root.mainloop()
     except Exception as e:
         messagebox.showerror("Gemini Token Widget Error", str(e))
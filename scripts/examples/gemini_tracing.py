@@ -0,0 +1,148 @@
+"""
+gemini_tracing.py
+
+Optional request-level tracing for the Gemini client, written in the Chrome
+trace-event format so a batch run can be opened in chrome://tracing or
+https://ui.perfetto.dev and inspected per thread.
+
+Tracing is off by default and span() then costs one attribute check. Turn it
+on with GEMINI_TRACE_PATH=trace.json or enable_tracing(path).
+
+Spans recorded by gemini_client_with_usage.py / gemini_batch_runner.py:
+  generate_text / generate_stream   whole logical call, including retries
+  attempt                           one API attempt (hedges included)
+  network                           the generate_content call itself
+  time_to_first_chunk               stream start -> first chunk
+  backoff                           sleeps between retries
+  log_usage                         writing the usage record
+  parse                             parsing questions out of the response
+
+Events are appended as they finish ("X" complete events) and the file is
+flushed per event, so a trace survives an interrupted run; the closing "]"
+is optional in this format.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+
+class TraceWriter:
+    """
+    Thread-safe appender of trace events to a JSON array file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("w", encoding="utf-8")
+        self._file.write("[\n")
+        self._first = True
+        self._lock = threading.Lock()
+        self._named_threads = set()
+        self._pid = os.getpid()
+        self._closed = False
+
+    def _emit(self, event: dict) -> None:
+        line = json.dumps(event, separators=(",", ":"), default=str)
+        with self._lock:
+            if self._closed:
+                return
+            self._file.write(line if self._first else ",\n" + line)
+            self._first = False
+            self._file.flush()
+
+    def complete(self, name: str, cat: str, start_us: float, dur_us: float, args: dict) -> None:
+        tid = threading.get_native_id()
+        if tid not in self._named_threads:
+            self._named_threads.add(tid)
+            self._emit({
+                "name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                "args": {"name": threading.current_thread().name},
+            })
+        self._emit({
+            "name": name, "cat": cat, "ph": "X", "pid": self._pid, "tid": tid,
+            "ts": round(start_us, 3), "dur": round(dur_us, 3), "args": args,
+        })
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._file.write("\n]\n")
+            self._file.close()
+
+
+_writer: Optional[TraceWriter] = None
+
+
+def _now_us() -> float:
+    return time.perf_counter_ns() / 1000
+
+
+def enable_tracing(path: Path) -> TraceWriter:
+    """
+    Start writing spans to `path` (overwritten). Closed automatically at exit.
+    """
+    global _writer
+    disable_tracing()
+    _writer = TraceWriter(path)
+    atexit.register(_writer.close)
+    return _writer
+
+
+def disable_tracing() -> None:
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+
+def tracing_enabled() -> bool:
+    return _writer is not None
+
+
+@contextmanager
+def span(name: str, cat: str = "gemini", **args):
+    """
+    Time the enclosed block as one complete event. Yields the args dict so
+    the block can attach results (e.g. token counts) before the span ends.
+    """
+    writer = _writer
+    if writer is None:
+        yield args
+        return
+    start = _now_us()
+    try:
+        yield args
+    except BaseException as e:
+        args["error"] = type(e).__name__
+        raise
+    finally:
+        writer.complete(name, cat, start, _now_us() - start, args)
+
+
+def record_span(name: str, start_us: float, cat: str = "gemini", **args) -> None:
+    """
+    Record a span that started at `start_us` (from now_us()) and ends now.
+    For intervals that don't map onto a with-block, like time to first chunk.
+    """
+    writer = _writer
+    if writer is not None:
+        writer.complete(name, cat, start_us, _now_us() - start_us, args)
+
+
+def now_us() -> Optional[float]:
+    """
+    Trace clock in microseconds, or None when tracing is off.
+    """
+    return _now_us() if _writer is not None else None
+
+
+if os.getenv("GEMINI_TRACE_PATH"):
+    enable_tracing(Path(os.environ["GEMINI_TRACE_PATH"]))
@@ -0,0 +1,375 @@
+"""
+gemini_usage_binlog.py
+
+Fixed-width binary alternative to gemini_usage_log.jsonl.
+
+Scanning millions of JSONL lines is dominated by json.loads. This format
+stores each usage record as one 32-byte little-endian struct, so readers can
+mmap the file and aggregate in a single vectorized pass (NumPy if installed,
+otherwise struct.iter_unpack):
+
+    offset  type     field
+    0       int64    timestamp, microseconds since the Unix epoch (UTC)
+    8       uint16   model id        (index into the sidecar dictionary)
+    10      uint16   attempt
+    12      uint32   input_tokens
+    16      uint32   output_tokens
+    20      float64  cost (USD; priced from the tokens for records logged without one)
+    28      uint16   call_type id    (index into the sidecar dictionary)
+    30      uint16   flags           (bit 0 = hedge)
+
+The file starts with a 16-byte header (magic, version, record size). Model
+and call-type names live in a JSON sidecar next to the log
+(<log>.dict.json). request_id and batch_id are not stored; keep the JSONL
+log if you need them.
+
+Usage:
+    python gemini_usage_binlog.py convert gemini_usage_log.jsonl gemini_usage_log.bin
+    python gemini_usage_binlog.py summary gemini_usage_log.bin
+"""
+import argparse
+import datetime as dt
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from gemini_pricing import calculate_cost
+
+try:
+    import numpy as np
+except ImportError:  # optional: falls back to struct.iter_unpack
+    np = None
+
+# =========================
+# CONFIG
+# =========================
+MAGIC = b"GUSG"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sII4x")
+RECORD = struct.Struct("<qHHIIdHH")
+FLAG_HEDGE = 0x1
+CONVERT_CHUNK_SIZE = 10_000
+
+# Shared by every writer in the process, so header creation, appends and
+# sidecar updates are one step even when two writers point at the same file
+_WRITE_LOCK = threading.Lock()
+
+MICROS_PER_DAY = 86_400_000_000
+_EPOCH = dt.datetime(1970, 1, 1)
+_MICROSECOND = dt.timedelta(microseconds=1)
+
+if np is not None:
+    RECORD_DTYPE = np.dtype([
+        ("timestamp_us", "<i8"),
+        ("model_id", "<u2"),
+        ("attempt", "<u2"),
+        ("input_tokens", "<u4"),
+        ("output_tokens", "<u4"),
+        ("cost", "<f8"),
+        ("call_type_id", "<u2"),
+        ("flags", "<u2"),
+    ])
+    assert RECORD_DTYPE.itemsize == RECORD.size
+
+
+def sidecar_path(path: Path) -> Path:
+    return Path(str(path) + ".dict.json")
+
+
+def load_dictionary(path: Path) -> Dict[str, List[str]]:
+    """
+    Model and call-type names for the log at `path`: {"models": [...], "call_types": [...]}.
+    """
+    try:
+        with sidecar_path(path).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        data = {}
+    return {"models": list(data.get("models", [])), "call_types": list(data.get("call_types", []))}
+
+
+def to_micros(timestamp_utc: str) -> int:
+    """
+    ISO8601 UTC timestamp (as written by _log_usage) -> microseconds since the epoch.
+    """
+    parsed = dt.datetime.fromisoformat(timestamp_utc)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return (parsed - _EPOCH) // _MICROSECOND
+
+
+def day_string(day_number: int) -> str:
+    return (_EPOCH + dt.timedelta(days=int(day_number))).strftime("%Y-%m-%d")
+
+
+class BinaryUsageWriter:
+    """
+    Appends usage records to a binary log, growing the sidecar dictionary
+    when a new model or call type shows up.
+
+    Thread-safe within one process, also between writers on the same file.
+    The sidecar is re-read before a new id is assigned and replaced
+    atomically, so writers in separate processes only race if they introduce
+    the same new name at the same moment.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._names = load_dictionary(self.path)
+
+    def _id_for(self, kind: str, name: str) -> int:
+        names = self._names[kind]
+        if name in names:
+            return names.index(name)
+        with _WRITE_LOCK:
+            self._names = load_dictionary(self.path)
+            names = self._names[kind]
+            if name not in names:
+                names.append(name)
+                tmp = sidecar_path(self.path).with_suffix(".tmp")
+                tmp.write_text(json.dumps(self._names, indent=2), encoding="utf-8")
+                os.replace(tmp, sidecar_path(self.path))
+        return names.index(name)
+
+    def _pack(self, record: Dict) -> bytes:
+        input_tokens = int(record.get("input_tokens", 0))
+        output_tokens = int(record.get("output_tokens", 0))
+        if "cost" in record:
+            cost = float(record["cost"] or 0.0)
+        else:  # logged before costs were recorded
+            cost = sum(calculate_cost(input_tokens, output_tokens, record.get("model") or ""))
+        return RECORD.pack(
+            to_micros(record["timestamp_utc"]),
+            self._id_for("models", record.get("model") or "unknown"),
+            int(record.get("attempt", 1) or 1),
+            input_tokens,
+            output_tokens,
+            cost,
+            self._id_for("call_types", record.get("call_type") or "generation"),
+            FLAG_HEDGE if record.get("hedge") else 0,
+        )
+
+    def append(self, record: Dict) -> None:
+        """
+        Append one usage record (the dict _log_usage builds).
+        """
+        with self._lock:
+            self._write(self._pack(record))
+
+    def append_many(self, records: Iterable[Dict]) -> int:
+        """
+        Append records with a single write; returns how many were written.
+        """
+        with self._lock:
+            packed = [self._pack(r) for r in records]
+            self._write(b"".join(packed))
+        return len(packed)
+
+    def _write(self, data: bytes) -> None:
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size)
+        with _WRITE_LOCK:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                # O_EXCL: exactly one creator writes the header, other processes included
+                fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
+                pass
+            else:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(header)
+            with self.path.open("ab") as f:
+                if f.tell() == 0:  # left empty by something else
+                    f.write(header)
+                f.write(data)
+
+
+def _open_records(path: Path):
+    """
+    mmap the log and validate its header.
+
+    Returns:
+        (mm, count): the mapping (None for an empty log) and the number of
+        complete records; a torn trailing record is ignored
+    """
+    with Path(path).open("rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            return None, 0
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, record_size = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD.size:
+        mm.close()
+        raise ValueError(f"{path} is not a version {FORMAT_VERSION} binary usage log")
+    return mm, (size - HEADER.size) // RECORD.size
+
+
+def aggregate(path: Path, since_us: Optional[int] = None) -> Dict:
+    """
+    Totals per model and per UTC day in one pass over the mmap'd log.
+
+    Args:
+        since_us: only count records at or after this timestamp (microseconds)
+
+    Returns:
+        {"total": bucket, "by_model": {model: bucket}, "by_day": {day: bucket}}
+        where bucket = {"requests", "input_tokens", "output_tokens", "cost"}
+    """
+    names = load_dictionary(path)["models"]
+    mm, count = _open_records(path)
+    try:
+        if np is not None:
+            return _aggregate_numpy(mm, count, names, since_us)
+        return _aggregate_struct(mm, count, names, since_us)
+    finally:
+        if mm is not None:
+            mm.close()
+
+
+def _bucket(requests=0, input_tokens=0, output_tokens=0, cost=0.0) -> Dict:
+    return {
+        "requests": int(requests),
+        "input_tokens": int(input_tokens),
+        "output_tokens": int(output_tokens),
+        "cost": float(cost),
+    }
+
+
+def _aggregate_numpy(mm, count: int, names: List[str], since_us: Optional[int]) -> Dict:
+    if not count:
+        return {"total": _bucket(), "by_model": {}, "by_day": {}}
+    records = np.frombuffer(mm, dtype=RECORD_DTYPE, count=count, offset=HEADER.size)
+    if since_us is not None:
+        records = records[records["timestamp_us"] >= since_us]
+
+    input_tokens = records["input_tokens"].astype(np.int64)
+    output_tokens = records["output_tokens"].astype(np.int64)
+    cost = records["cost"]
+
+    def grouped(keys, label):
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        requests = np.bincount(inverse, minlength=len(uniq))
+        ins = np.bincount(inverse, weights=input_tokens, minlength=len(uniq))
+        outs = np.bincount(inverse, weights=output_tokens, minlength=len(uniq))
+        costs = np.bincount(inverse, weights=cost, minlength=len(uniq))
+        return {
+            label(k): _bucket(r, i, o, c)
+            for k, r, i, o, c in zip(uniq.tolist(), requests, ins, outs, costs)
+        }
+
+    return {
+        "total": _bucket(len(records), input_tokens.sum(), output_tokens.sum(), cost.sum()),
+        "by_model": grouped(records["model_id"], lambda k: names[k] if k < len(names) else f"#{k}"),
+        "by_day": grouped(records["timestamp_us"] // MICROS_PER_DAY, day_string),
+    }
+
+
+def _aggregate_struct(mm, count: int, names: List[str], since_us: Optional[int]) -> Dict:
+    total = _bucket()
+    by_model_id: Dict[int, Dict] = {}
+    by_day_number: Dict[int, Dict] = {}
+    if count:
+        view = memoryview(mm)[HEADER.size:HEADER.size + count * RECORD.size]
+        try:
+            for ts, model_id, _, ins, outs, cost, _, _ in RECORD.iter_unpack(view):
+                if since_us is not None and ts < since_us:
+                    continue
+                day = ts // MICROS_PER_DAY
+                model_bucket = by_model_id.get(model_id)
+                if model_bucket is None:
+                    model_bucket = by_model_id[model_id] = _bucket()
+                day_bucket = by_day_number.get(day)
+                if day_bucket is None:
+                    day_bucket = by_day_number[day] = _bucket()
+                for bucket in (total, model_bucket, day_bucket):
+                    bucket["requests"] += 1
+                    bucket["input_tokens"] += ins
+                    bucket["output_tokens"] += outs
+                    bucket["cost"] += cost
+        finally:
+            view.release()
+    return {
+        "total": total,
+        "by_model": {
+            (names[k] if k < len(names) else f"#{k}"): v for k, v in sorted(by_model_id.items())
+        },
+        "by_day": {day_string(k): v for k, v in sorted(by_day_number.items())},
+    }
+
+
+def today_token_usage(path: Path) -> int:
+    """
+    Total tokens for today (UTC): the binary counterpart of the widget's JSONL scan.
+    """
+    now = dt.datetime.utcnow()
+    midnight = dt.datetime(now.year, now.month, now.day)
+    try:
+        totals = aggregate(path, since_us=(midnight - _EPOCH) // _MICROSECOND)["total"]
+    except FileNotFoundError:
+        return 0
+    return totals["input_tokens"] + totals["output_tokens"]
+
+
+def _iter_jsonl_records(jsonl_path: Path) -> Iterator[Dict]:
+    with Path(jsonl_path).open("r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+                to_micros(rec["timestamp_utc"])
+            except (json.JSONDecodeError, KeyError, ValueError, TypeError) as e:
+                print(f"[binlog] skipping line {line_no}: {e}", file=sys.stderr)
+                continue
+            yield rec
+
+
+def convert_jsonl(jsonl_path: Path, bin_path: Path, chunk_size: int = CONVERT_CHUNK_SIZE) -> int:
+    """
+    Append every valid record from a JSONL usage log to a binary log.
+
+    Returns:
+        converted: number of records written
+    """
+    writer = BinaryUsageWriter(bin_path)
+    converted = 0
+    chunk: List[Dict] = []
+    for rec in _iter_jsonl_records(jsonl_path):
+        chunk.append(rec)
+        if len(chunk) >= chunk_size:
+            converted += writer.append_many(chunk)
+            chunk = []
+    if chunk:
+        converted += writer.append_many(chunk)
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary Gemini usage log tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    convert = sub.add_parser("convert", help="convert a JSONL usage log to the binary format")
+    convert.add_argument("jsonl", type=Path)
+    convert.add_argument("binary", type=Path)
+
+    summary = sub.add_parser("summary", help="print per-model and per-day totals")
+    summary.add_argument("binary", type=Path)
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        if args.binary.exists():
+            parser.error(f"{args.binary} already exists; refusing to append a second copy")
+        count = convert_jsonl(args.jsonl, args.binary)
+        print(f"[binlog] wrote {count:,} records to {args.binary}", file=sys.stderr)
+    else:
+        print(json.dumps(aggregate(args.binary), indent=2))
+
+
+if __name__ == "__main__":
+    main()
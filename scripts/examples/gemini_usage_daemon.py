@@ -0,0 +1,273 @@
+"""
+gemini_usage_daemon.py
+
+Tails gemini_usage_log.jsonl once, keeps aggregates in memory and answers
+queries over localhost HTTP, so the widget, scripts and reports don't each
+re-scan the log.
+
+Endpoints (all GET, JSON):
+  /today       today's (UTC) requests, tokens and cost
+  /last-hour   per-minute series for the last hour + tokens/min, requests/min
+  /by-model    totals per model
+  /by-day      totals per UTC day
+  /summary     all of the above
+
+Every response carries a `version` that increases whenever new records are
+folded in. Pass ?since=<version>&timeout=<seconds> to long-poll: the request
+returns as soon as there is newer data (or when the timeout expires), which
+lets clients like the token widget stay event-driven.
+
+Usage:
+    python gemini_usage_daemon.py
+    python gemini_usage_daemon.py --log path/to/gemini_usage_log.jsonl --port 8766
+    curl http://127.0.0.1:8766/today
+"""
+import argparse
+import json
+import sys
+import threading
+import datetime as dt
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+from gemini_pricing import CostAggregator, calculate_cost
+from gemini_usage_tail import (
+    RATE_AVERAGE_MINUTES,
+    RateWindow,
+    UsageLogTail,
+    UsageLogWatcher,
+    current_epoch_minute,
+    epoch_minute,
+    seconds_until_next_minute,
+    seconds_until_utc_midnight,
+)
+
+# =========================
+# CONFIG
+# =========================
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+DEFAULT_LOG_PATH = Path(__file__).resolve().parent / "gemini_usage_log.jsonl"
+MAX_LONG_POLL_SECONDS = 300
+
+
+class UsageAggregates:
+    """
+    In-memory aggregates over every record in the usage log.
+
+    refresh() folds in only the lines appended since the previous call.
+    Records written before cost fields existed are priced on the fly.
+    """
+
+    def __init__(self, path: Path):
+        self.tail = UsageLogTail(path)
+        self.costs = CostAggregator()
+        self.rates = RateWindow()
+        self.version = 0
+        self._cond = threading.Condition()
+
+    def refresh(self) -> int:
+        """
+        Read new lines; returns how many records were added.
+        """
+        blocks, truncated = self.tail.read_new_blocks()
+        changed = truncated
+        if truncated:
+            with self._cond:
+                self.costs = CostAggregator()
+                self.rates = RateWindow()
+
+        added = 0
+        # One block at a time, so catching up on a large log stays bounded in memory
+        for lines in blocks:
+            changed = True
+            with self._cond:
+                for line in lines:
+                    try:
+                        rec = json.loads(line)
+                        minute = epoch_minute(str(rec.get("timestamp_utc", "")))
+                    except (json.JSONDecodeError, UnicodeDecodeError, ValueError, TypeError):
+                        continue
+                    if "cost" not in rec:
+                        input_cost, output_cost = calculate_cost(
+                            int(rec.get("input_tokens", 0)),
+                            int(rec.get("output_tokens", 0)),
+                            rec.get("model") or "",
+                        )
+                        rec["input_cost"] = input_cost
+                        rec["output_cost"] = output_cost
+                        rec["cost"] = input_cost + output_cost
+                    self.costs.add(rec)
+                    self.rates.add(minute, int(rec.get("total_tokens", 0)))
+                    added += 1
+
+        if changed:
+            with self._cond:
+                self.version += 1
+                self._cond.notify_all()
+        return added
+
+    def tick(self) -> None:
+        """
+        Bump the version without new data (time-based views moved on).
+        """
+        with self._cond:
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait_newer(self, since: int, timeout: float) -> None:
+        """
+        Block until version > since or the timeout expires.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > since, timeout=timeout)
+
+    # ----- queries -----
+    def today(self) -> Dict:
+        day = dt.datetime.utcnow().strftime("%Y-%m-%d")
+        snapshot = self.costs.snapshot()
+        bucket = snapshot["by_day"].get(day, CostAggregator().total)
+        return {
+            "date": day,
+            "total_tokens": bucket["input_tokens"] + bucket["output_tokens"],
+            **bucket,
+        }
+
+    def last_hour(self) -> Dict:
+        with self._cond:
+            series = self.rates.series(current_epoch_minute())
+        recent = series[-RATE_AVERAGE_MINUTES:]
+        return {
+            "series": [{"tokens": t, "requests": r} for t, r in series],
+            "tokens_per_min": sum(t for t, _ in recent) / RATE_AVERAGE_MINUTES,
+            "requests_per_min": sum(r for _, r in recent) / RATE_AVERAGE_MINUTES,
+            "tokens": sum(t for t, _ in series),
+            "requests": sum(r for _, r in series),
+        }
+
+    def by_model(self) -> Dict:
+        return {"models": self.costs.snapshot()["by_model"]}
+
+    def by_day(self) -> Dict:
+        return {"days": self.costs.snapshot()["by_day"]}
+
+    def summary(self) -> Dict:
+        snapshot = self.costs.snapshot()
+        return {
+            "total": snapshot["total"],
+            "today": self.today(),
+            "last_hour": self.last_hour(),
+            "by_model": snapshot["by_model"],
+            "by_day": snapshot["by_day"],
+            "by_batch": snapshot["by_batch"],
+        }
+
+
+class UsageQueryHandler(BaseHTTPRequestHandler):
+    server_version = "GeminiUsageDaemon/1.0"
+
+    ROUTES = {
+        "/today": "today",
+        "/last-hour": "last_hour",
+        "/by-model": "by_model",
+        "/by-day": "by_day",
+        "/summary": "summary",
+    }
+
+    def log_message(self, fmt, *args):  # queries are frequent; stay quiet
+        pass
+
+    def _send_json(self, code: int, payload) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        method = self.ROUTES.get(parsed.path)
+        if method is None:
+            self._send_json(404, {"error": "unknown endpoint", "endpoints": sorted(self.ROUTES)})
+            return
+
+        aggregates: UsageAggregates = self.server.aggregates
+        params = parse_qs(parsed.query)
+        try:
+            since = int(params.get("since", ["-1"])[0])
+            timeout = min(float(params.get("timeout", ["0"])[0]), MAX_LONG_POLL_SECONDS)
+        except ValueError:
+            self._send_json(400, {"error": "since/timeout must be numbers"})
+            return
+        if since >= 0 and timeout > 0:
+            aggregates.wait_newer(since, timeout)
+
+        payload = getattr(aggregates, method)()
+        payload["version"] = aggregates.version
+        self._send_json(200, payload)
+
+
+def follow(aggregates: UsageAggregates, watcher: UsageLogWatcher, stop: threading.Event) -> None:
+    """
+    Fold in new records whenever the log changes. While the last hour saw
+    traffic it also ticks once a minute so long-polling clients see rates
+    decay, and it ticks at UTC midnight so /today rolls over.
+    """
+    while not stop.is_set():
+        aggregates.refresh()
+        if aggregates.rates.active(current_epoch_minute()):
+            timeout = seconds_until_next_minute()
+        else:
+            timeout = seconds_until_utc_midnight()
+        if not watcher.wait_for_change(timeout) and not stop.is_set():
+            aggregates.tick()
+
+
+def make_server(
+    log_path: Path = DEFAULT_LOG_PATH,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+) -> ThreadingHTTPServer:
+    """
+    Build the daemon (initial scan done, follower not started). Port 0 picks a free port.
+    """
+    aggregates = UsageAggregates(log_path)
+    aggregates.refresh()
+    server = ThreadingHTTPServer((host, port), UsageQueryHandler)
+    server.daemon_threads = True
+    server.aggregates = aggregates
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gemini usage aggregation daemon")
+    parser.add_argument("--log", type=Path, default=DEFAULT_LOG_PATH, help="usage log to tail")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    server = make_server(args.log, args.host, args.port)
+    stop = threading.Event()
+    watcher = UsageLogWatcher(args.log)
+    follower = threading.Thread(
+        target=follow, args=(server.aggregates, watcher, stop), daemon=True)
+    follower.start()
+
+    host, port = server.server_address[:2]
+    mode = "inotify" if watcher.uses_inotify else "polling"
+    print(f"Usage daemon on http://{host}:{port} ({args.log}, {mode})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        watcher.close()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
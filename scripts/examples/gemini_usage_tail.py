@@ -0,0 +1,378 @@
+"""
+gemini_usage_tail.py
+
+Shared helpers for consumers of the Gemini usage log (gemini_usage_log.jsonl):
+
+  - UsageLogTail:    incremental reader (byte offset, rotation/truncation aware)
+                     with today's running total and a per-minute RateWindow
+  - UsageLogWatcher: blocks until the log changes (inotify, stat() fallback)
+  - RateWindow:      O(1)-update ring buffer of per-minute token/request counts
+
+Used by gemini_token_widget.py and gemini_usage_daemon.py.
+"""
+import ctypes
+import ctypes.util
+import json
+import datetime as dt
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+# =========================
+# CONFIG
+# =========================
+POLL_INTERVAL_SECONDS = 1    # stat() interval when inotify is unavailable (seconds)
+RATE_WINDOW_MINUTES = 60     # ring buffer length
+RATE_AVERAGE_MINUTES = 5     # tokens/min and requests/min are averaged over this
+READ_BLOCK_BYTES = 1 << 20   # bytes per read(), so a first poll of a huge log stays small in memory
+
+
+_day_ordinals = {}
+
+
+def epoch_minute(ts: str) -> int:
+    """
+    Minutes since 0001-01-01 for an ISO timestamp, without fromisoformat.
+    """
+    day = ts[:10]
+    ordinal = _day_ordinals.get(day)
+    if ordinal is None:
+        ordinal = dt.date(int(day[:4]), int(day[5:7]), int(day[8:10])).toordinal()
+        _day_ordinals[day] = ordinal
+    return ordinal * 1440 + int(ts[11:13]) * 60 + int(ts[14:16])
+
+
+def current_epoch_minute() -> int:
+    now = dt.datetime.utcnow()
+    return now.toordinal() * 1440 + now.hour * 60 + now.minute
+
+
+class RateWindow:
+    """
+    Fixed-size ring buffer of per-minute token and request counts.
+
+    add() is O(1): a record lands in slot minute % size, and a slot whose
+    stored minute is stale is reset before reuse. Reads cost O(size).
+    """
+
+    def __init__(self, minutes: int = RATE_WINDOW_MINUTES):
+        self.size = minutes
+        self._minute = [-1] * minutes
+        self._tokens = [0] * minutes
+        self._requests = [0] * minutes
+        self.last_minute = -1
+
+    def add(self, minute: int, tokens: int) -> None:
+        i = minute % self.size
+        if self._minute[i] != minute:
+            if self._minute[i] > minute:
+                return  # older than the window
+            self._minute[i] = minute
+            self._tokens[i] = 0
+            self._requests[i] = 0
+        self._tokens[i] += tokens
+        self._requests[i] += 1
+        self.last_minute = max(self.last_minute, minute)
+
+    def series(self, now_minute: int):
+        """
+        (tokens, requests) per minute, oldest first, ending at now_minute.
+        """
+        out = []
+        for minute in range(now_minute - self.size + 1, now_minute + 1):
+            i = minute % self.size
+            if self._minute[i] == minute:
+                out.append((self._tokens[i], self._requests[i]))
+            else:
+                out.append((0, 0))
+        return out
+
+    def rates(self, now_minute: int, span: int = RATE_AVERAGE_MINUTES):
+        """
+        Average (tokens/min, requests/min) over the last `span` minutes.
+        """
+        recent = self.series(now_minute)[-span:]
+        return (sum(t for t, _ in recent) / span, sum(r for _, r in recent) / span)
+
+    def active(self, now_minute: int) -> bool:
+        return self.last_minute > now_minute - self.size
+
+
+class UsageLogTail:
+    """
+    Incremental reader for the usage log.
+
+    Keeps a byte offset and today's running total between polls, so each
+    poll only parses lines appended since the previous one. Records are
+    matched to the current UTC day by their ISO date prefix instead of
+    parsing every timestamp.
+
+    - UTC midnight: the running total restarts at 0
+    - rotation (file replaced, new inode): keep the total, read the new file from the start
+    - truncation (same file, shrunk): recount from the start
+
+    Records from today and yesterday also feed `rates`, the per-minute
+    RateWindow (yesterday matters for the hour after midnight).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._offset = 0
+        self._file_id = None
+        self._day = None
+        self.total_tokens = 0
+        self.rates = RateWindow()
+
+    def _clear(self) -> None:
+        self.total_tokens = 0
+        self.rates = RateWindow()
+
+    def read_new_blocks(self, markers: Optional[List[bytes]] = None) -> Tuple[Iterator[List[bytes]], bool]:
+        """
+        Return the complete lines appended since the last call, as batches
+        read READ_BLOCK_BYTES at a time, and whether the file was truncated
+        (callers holding aggregates should start over before consuming).
+
+        The offset advances as batches are consumed, so memory is bounded by
+        one block however far behind the reader is.
+
+        If `markers` is given, only lines containing one of them are returned
+        (a byte-level pre-filter that skips JSON decoding of irrelevant lines).
+        """
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self._offset = 0
+            self._file_id = None
+            return [], False
+
+        truncated = False
+        file_id = (stat.st_dev, stat.st_ino)
+        if self._file_id is None:
+            self._file_id = file_id
+        elif file_id != self._file_id:
+            self._offset = 0
+            self._file_id = file_id
+        elif stat.st_size < self._offset:
+            self._offset = 0
+            truncated = True
+
+        if stat.st_size == self._offset:
+            return iter(()), truncated
+        return self._read_blocks(markers), truncated
+
+    def _read_blocks(self, markers: Optional[List[bytes]]) -> Iterator[List[bytes]]:
+        with self.path.open("rb") as f:
+            f.seek(self._offset)
+            partial = b""
+            while True:
+                data = f.read(READ_BLOCK_BYTES)
+                if not data:
+                    # Only consume complete lines; a partial last line is re-read next time
+                    return
+                data = partial + data
+                end = data.rfind(b"\n")
+                if end == -1:
+                    partial = data
+                    continue
+                partial = data[end + 1:]
+                self._offset += end + 1
+                lines = data[:end].split(b"\n")
+                if markers:
+                    lines = [line for line in lines if any(m in line for m in markers)]
+                yield lines
+
+    def poll(self) -> int:
+        """
+        Consume newly appended lines and return today's total tokens.
+        """
+        today = dt.datetime.utcnow().strftime("%Y-%m-%d")
+        if today != self._day:
+            self._day = today
+            self.total_tokens = 0
+
+        # Cheap pre-filter: json.dumps writes '"timestamp_utc": "YYYY-MM-DD...'
+        yesterday = (dt.datetime.utcnow() - dt.timedelta(days=1)).strftime("%Y-%m-%d")
+        markers = [
+            f'"timestamp_utc": "{today}'.encode("utf-8"),
+            f'"timestamp_utc": "{yesterday}'.encode("utf-8"),
+        ]
+
+        blocks, truncated = self.read_new_blocks(markers)
+        if truncated:
+            self._clear()
+
+        for lines in blocks:
+            for line in lines:
+                try:
+                    rec = json.loads(line)
+                    ts = str(rec.get("timestamp_utc", ""))
+                    tokens = int(rec.get("total_tokens", 0))
+                    minute = epoch_minute(ts)
+                except (json.JSONDecodeError, UnicodeDecodeError, ValueError, TypeError):
+                    continue
+                self.rates.add(minute, tokens)
+                if ts.startswith(today):
+                    self.total_tokens += tokens
+
+        return self.total_tokens
+
+
+class UsageLogWatcher:
+    """
+    Blocks until the usage log changes.
+
+    On Linux this uses inotify on the log's directory (so creation and
+    rotation are seen too) and costs nothing while idle. Elsewhere it falls
+    back to a cheap stat() of the file every POLL_INTERVAL_SECONDS.
+    """
+
+    # inotify constants from <sys/inotify.h>
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._closed = threading.Event()
+        self._waiters = 0                   # threads inside select() on the fds below
+        self._fd_lock = threading.Condition()
+        self._inotify_fd = None
+        self._wake_r, self._wake_w = None, None
+        self._last_stat = self._stat()
+        if sys.platform.startswith("linux"):
+            self._init_inotify()
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._inotify_fd is not None
+
+    def _init_inotify(self) -> None:
+        directory = self.path.resolve().parent
+        if not directory.is_dir():
+            return
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            return
+        try:
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if fd < 0:
+            return
+        mask = (self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_CREATE
+                | self.IN_DELETE | self.IN_MOVED_FROM | self.IN_MOVED_TO)
+        if libc.inotify_add_watch(fd, os.fsencode(str(directory)), mask) < 0:
+            os.close(fd)
+            return
+        self._inotify_fd = fd
+        self._wake_r, self._wake_w = os.pipe()
+
+    def _stat(self):
+        try:
+            st = self.path.stat()
+            return (st.st_ino, st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    def _drain_inotify(self) -> bool:
+        """
+        Read all queued events; True if any concerns the log file.
+        """
+        name = self.path.name.encode("utf-8")
+        relevant = False
+        while True:
+            try:
+                buf = os.read(self._inotify_fd, 64 * 1024)
+            except BlockingIOError:
+                return relevant
+            if not buf:
+                return relevant
+            offset = 0
+            while offset + self.EVENT_HEADER.size <= len(buf):
+                _wd, _mask, _cookie, length = self.EVENT_HEADER.unpack_from(buf, offset)
+                offset += self.EVENT_HEADER.size
+                event_name = buf[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if event_name == name:
+                    relevant = True
+
+    def wait_for_change(self, timeout: float) -> bool:
+        """
+        Wait up to `timeout` seconds. True if the log changed, False on
+        timeout or close().
+        """
+        with self._fd_lock:
+            inotify_fd, wake_r = self._inotify_fd, self._wake_r
+            if inotify_fd is not None:
+                if self._closed.is_set():
+                    return False
+                self._waiters += 1
+        if inotify_fd is not None:
+            try:
+                deadline = time.monotonic() + timeout
+                while not self._closed.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    ready, _, _ = select.select([inotify_fd, wake_r], [], [], remaining)
+                    if inotify_fd in ready and self._drain_inotify():
+                        return True
+                return False
+            finally:
+                with self._fd_lock:
+                    self._waiters -= 1
+                    self._fd_lock.notify_all()
+
+        deadline = time.monotonic() + timeout
+        while not self._closed.wait(min(POLL_INTERVAL_SECONDS, max(deadline - time.monotonic(), 0))):
+            current = self._stat()
+            if current != self._last_stat:
+                self._last_stat = current
+                return True
+            if time.monotonic() >= deadline:
+                return False
+        return False
+
+    def close(self) -> None:
+        """
+        Wake any waiter, then release the inotify and pipe fds. Safe to call twice.
+        """
+        with self._fd_lock:
+            if self._closed.is_set():
+                return
+            self._closed.set()
+            if self._wake_w is None:
+                return
+            os.write(self._wake_w, b"x")
+            # Closing an fd another thread is selecting on is undefined; let waiters leave first
+            while self._waiters:
+                self._fd_lock.wait()
+            for fd in (self._inotify_fd, self._wake_r, self._wake_w):
+                os.close(fd)
+            self._inotify_fd = self._wake_r = self._wake_w = None
+
+
+def seconds_until_utc_midnight() -> float:
+    now = dt.datetime.utcnow()
+    midnight = dt.datetime(now.year, now.month, now.day) + dt.timedelta(days=1)
+    return (midnight - now).total_seconds() + 0.5
+
+
+def seconds_until_next_minute() -> float:
+    now = dt.datetime.utcnow()
+    return 60 - now.second - now.microsecond / 1e6 + 0.05
+
+
@@ -0,0 +1,377 @@
+"""
+question_stream_parser.py
+
+Incremental version of parseQuestions() from src/utils/questionHelpers.js.
+
+generate_stream_with_usage yields raw chunks; instead of waiting for the
+whole stream, feed the chunks to StreamingQuestionParser and it hands back
+each question object as soon as its markdown table row (or JSON object) is
+complete. Question dicts use the same keys and defaults as parseQuestions.
+
+Differences from parseQuestions:
+  - questions are emitted one by one, so intra-batch dedup
+    (removeDuplicateQuestions) is left to the consumer
+  - the output format (JSON vs markdown table) is decided from the first
+    meaningful line instead of searching the full text for brackets
+  - only JSON objects are converted; parseQuestions also turns stray
+    strings or numbers in the array into default questions
+
+Usage:
+    from gemini_client_with_usage import generate_stream_with_usage
+    from question_stream_parser import iter_questions
+
+    for question in iter_questions(generate_stream_with_usage(model, prompt)):
+        validate(question)
+"""
+import json
+import random
+import re
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional
+
+FENCE_RE = re.compile(r"```[a-z]*", re.IGNORECASE)
+SEPARATOR_START_RE = re.compile(r"^\|?\s*:?\s*-+")
+SEPARATOR_CELL_RE = re.compile(r"\|\s*:?\s*-{2,}\s*:?\s*\|")
+HEADER_RE = re.compile(r"\|\s*ID\s*\|", re.IGNORECASE)
+LEADING_INT_RE = re.compile(r"^\s*([+-]?\d+)")
+SINGLE_LETTER_RE = re.compile(r"^[A-D]$", re.IGNORECASE)
+
+MODE_UNKNOWN = "unknown"
+MODE_TABLE = "table"
+MODE_JSON = "json"
+
+
+def _parse_int(value) -> Optional[int]:
+    """
+    Mimic `parseInt(value) || null` from the JS parser.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value) or None
+    match = LEADING_INT_RE.match(str(value))
+    if not match:
+        return None
+    return int(match.group(1)) or None
+
+
+def _make_id(index: int) -> float:
+    """
+    Same shape as the JS `Date.now() + index + Math.random()` ids.
+    """
+    return time.time() * 1000 + index + random.random()
+
+
+def _is_question_item(item: Dict) -> bool:
+    """
+    The `isValidData` test: once one item passes, parseQuestions converts every item.
+    """
+    return bool(item.get("Question") or item.get("question") or item.get("Discipline"))
+
+
+def _question_from_json(item: Dict, index: int) -> Dict:
+    """
+    Convert one JSON item to a question dict (JSON branch of parseQuestions).
+    """
+    type_raw = item.get("Type")
+    is_tf = bool(type_raw) and "true" in str(type_raw).lower()
+    q_type = "True/False" if is_tf else "Multiple Choice"
+
+    if is_tf:
+        options = {"A": "TRUE", "B": "FALSE"}
+    else:
+        options = {
+            "A": item.get("OptionA") or "",
+            "B": item.get("OptionB") or "",
+            "C": item.get("OptionC") or "",
+            "D": item.get("OptionD") or "",
+        }
+
+    tags_raw = item.get("Tags")
+    if not tags_raw:
+        tags = []
+    elif isinstance(tags_raw, list):
+        tags = tags_raw
+    else:
+        tags = [t.strip() for t in str(tags_raw).split(",")]
+
+    return {
+        "id": _make_id(index),
+        "uniqueId": str(uuid.uuid4()),
+        "discipline": item.get("Discipline") or "General",
+        "type": q_type,
+        "difficulty": item.get("Difficulty") or "Easy",
+        "question": item.get("Question") or "",
+        "options": options,
+        "correct": item.get("CorrectLetter") or "",
+        "sourceUrl": item.get("SourceURL") or "",
+        "sourceExcerpt": item.get("SourceExcerpt") or "",
+        "qualityScore": _parse_int(item.get("QualityScore")),
+        "status": "pending",
+        "critique": None,
+        "critiqueScore": None,
+        "tags": tags,
+    }
+
+
+def _is_table_data_line(line: str) -> bool:
+    """
+    Same row filter as the markdown branch of parseQuestions.
+    """
+    trimmed = line.strip()
+    if not trimmed:
+        return False
+    if trimmed.count("|") < 4:
+        return False
+    if SEPARATOR_START_RE.match(trimmed) or SEPARATOR_CELL_RE.search(trimmed):
+        return False
+    if HEADER_RE.search(trimmed):
+        return False
+    return True
+
+
+def _question_from_row(line: str, index: int) -> Optional[Dict]:
+    """
+    Convert one markdown table row to a question dict, or None if rejected.
+
+    Columns: | ID | Discipline | Type | Difficulty | Question | Answer | OptionA |
+             OptionB | OptionC | OptionD | CorrectLetter | SourceURL |
+             SourceExcerpt | Tags | QualityScore |
+    """
+    cols = [c.strip() for c in line.replace("｜", "|").split("|")]
+    if cols and cols[0] == "":
+        cols.pop(0)
+    if cols and cols[-1] == "":
+        cols.pop()
+
+    def col(i: int) -> Optional[str]:
+        return cols[i] if i < len(cols) else None
+
+    question = col(4)
+    correct_letter = col(10)
+    if not question or not correct_letter or "---" in question:
+        return None
+
+    quality_score = None
+    if col(14):
+        match = re.search(r"\d+", col(14))
+        if match:
+            quality_score = int(match.group(0))
+
+    tags_raw = col(13)
+    tags = []
+    if tags_raw and tags_raw != "-":
+        tags = [t.strip().lstrip("#") for t in tags_raw.split(",")]
+        tags = [t for t in tags if t]
+
+    type_raw = col(2)
+    is_tf = bool(type_raw) and "true" in type_raw.lower()
+    q_type = "True/False" if is_tf else "Multiple Choice"
+
+    if is_tf:
+        options = {"A": "TRUE", "B": "FALSE"}
+    else:
+        options = {
+            "A": col(6) or "",
+            "B": col(7) or "",
+            "C": col(8) or "",
+            "D": col(9) or "",
+        }
+        # Reject questions where any option is just a single letter (likely malformed)
+        if any(opt and SINGLE_LETTER_RE.match(opt.strip()) for opt in options.values()):
+            return None
+
+    source_url = col(11)
+
+    return {
+        "id": _make_id(index),
+        "uniqueId": str(uuid.uuid4()),
+        "discipline": col(1) or "General",
+        "type": q_type,
+        "difficulty": col(3) or "Easy",
+        "question": question,
+        "options": options,
+        "correct": correct_letter,
+        "sourceUrl": source_url if source_url and " " not in source_url else "",
+        "sourceExcerpt": col(12) or "",
+        "tags": tags,
+        "qualityScore": quality_score,
+        "status": "pending",
+        "critique": None,
+        "critiqueScore": None,
+    }
+
+
+class StreamingQuestionParser:
+    """
+    Push-style parser: call feed() with each text chunk and close() at the end.
+
+    Both return the list of questions completed by that call.
+    """
+
+    def __init__(self):
+        self.mode = MODE_UNKNOWN
+        self.emitted = 0
+        self._chunks: List[str] = []     # full text, for the JSON -> table fallback
+        self._line_buf = ""              # table mode / mode detection
+        self._row_index = 0              # index of data rows, like dataLines.forEach
+        # JSON scanner state
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._obj_start_depth = 0
+        self._obj_buf: List[str] = []
+        self._valid_seen = False
+        self._held: List[Dict] = []      # objects before the first valid one
+
+    # ----- public API -----
+    def feed(self, text: str) -> List[Dict]:
+        if not text:
+            return []
+        self._chunks.append(text)
+
+        if self.mode == MODE_JSON:
+            return self._scan_json(text)
+
+        self._line_buf += text
+        return self._drain_lines(final=False)
+
+    def close(self) -> List[Dict]:
+        out: List[Dict] = []
+        if self.mode != MODE_JSON:
+            out.extend(self._drain_lines(final=True))
+
+        # parseQuestions falls back to the table parser when JSON yields nothing
+        if self.mode == MODE_JSON and self.emitted == 0:
+            self.mode = MODE_TABLE
+            self._line_buf = "".join(self._chunks)
+            self._row_index = 0
+            out.extend(self._drain_lines(final=True))
+
+        return out
+
+    # ----- table / mode detection -----
+    def _drain_lines(self, final: bool) -> List[Dict]:
+        out: List[Dict] = []
+        while True:
+            nl = self._line_buf.find("\n")
+            if nl == -1:
+                if not final:
+                    # Mode detection can start before the line is complete
+                    if self.mode == MODE_UNKNOWN and self._detect_json(self._line_buf):
+                        rest, self._line_buf = self._line_buf, ""
+                        return out + self._scan_json(rest)
+                    return out
+                line, self._line_buf = self._line_buf, ""
+                if not line:
+                    return out
+            else:
+                line, self._line_buf = self._line_buf[:nl], self._line_buf[nl + 1:]
+
+            if self.mode == MODE_UNKNOWN and self._detect_json(line):
+                rest = line + ("\n" + self._line_buf if nl != -1 else "")
+                self._line_buf = ""
+                return out + self._scan_json(rest)
+
+            question = self._handle_table_line(line)
+            if question:
+                out.append(question)
+
+    def _detect_json(self, text: str) -> bool:
+        cleaned = FENCE_RE.sub("", text).strip()
+        if cleaned[:1] in ("[", "{"):
+            self.mode = MODE_JSON
+            return True
+        return False
+
+    def _handle_table_line(self, line: str) -> Optional[Dict]:
+        line = FENCE_RE.sub("", line)
+        if not _is_table_data_line(line):
+            return None
+        self.mode = MODE_TABLE
+        index = self._row_index
+        self._row_index += 1
+        question = _question_from_row(line, index)
+        if question:
+            self.emitted += 1
+        return question
+
+    # ----- JSON -----
+    def _scan_json(self, text: str) -> List[Dict]:
+        out: List[Dict] = []
+        for ch in text:
+            if self._obj_buf:
+                self._obj_buf.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if not self._obj_buf and self._depth <= 1:
+                    self._obj_buf = [ch]
+                    self._obj_start_depth = self._depth
+                self._depth += 1
+            elif ch == "[":
+                self._depth += 1
+            elif ch in ("}", "]"):
+                self._depth = max(self._depth - 1, 0)
+                if ch == "}" and self._obj_buf and self._depth == self._obj_start_depth:
+                    out.extend(self._finish_object("".join(self._obj_buf)))
+                    self._obj_buf = []
+        return out
+
+    def _finish_object(self, raw: str) -> List[Dict]:
+        try:
+            item = json.loads(raw)
+        except json.JSONDecodeError:
+            return []
+        if not self._valid_seen:
+            if not _is_question_item(item):
+                self._held.append(item)
+                return []
+            self._valid_seen = True
+            items, self._held = self._held + [item], []
+        else:
+            items = [item]
+        out = []
+        for item in items:
+            out.append(_question_from_json(item, self.emitted))
+            self.emitted += 1
+        return out
+
+
+def _chunk_text(chunk) -> str:
+    if isinstance(chunk, str):
+        return chunk
+    return getattr(chunk, "text", None) or ""
+
+
+def iter_questions(chunks: Iterable) -> Iterator[Dict]:
+    """
+    Consume a chunk iterator (strings or Gemini stream chunks with .text) and
+    yield each question as soon as it is complete.
+    """
+    parser = StreamingQuestionParser()
+    for chunk in chunks:
+        for question in parser.feed(_chunk_text(chunk)):
+            yield question
+    for question in parser.close():
+        yield question
+
+
+def parse_questions(text: str) -> List[Dict]:
+    """
+    Non-streaming convenience wrapper: parse a complete response text.
+    """
+    return list(iter_questions([text]))
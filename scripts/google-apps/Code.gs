@@ -77,91 +77,20 @@ function doPost(e) {
     `).setMimeType(ContentService.MimeType.HTML);
   }
 
+  // --- HANDLE CHUNKED PUSH (scripts/question_bank/sheets_push.py) ---
+  if (e.parameter.action === 'chunk') {
+    return handleChunk(ss, e);
+  }
+  if (e.parameter.action === 'commit') {
+    return handleCommit(ss, e);
+  }
+
   // --- HANDLE SAVE ACTION ---
   try {
     const payload = JSON.parse(e.parameter.data);
     const questions = payload.questions;
     const timestamp = new Date();
-
-    // 1. SAVE TO MASTER DB (Split by Language)
-    questions.forEach(q => {
-      const lang = q.Language || 'English';
-      const masterSheetName = `Master_${lang}`;
-      let masterSheet = ss.getSheetByName(masterSheetName);
-      
-      if (!masterSheet) {
-        masterSheet = ss.insertSheet(masterSheetName);
-        masterSheet.appendRow(HEADERS);
-        masterSheet.getRange(1, 1, 1, HEADERS.length).setFontWeight("bold").setBackground("#e0e7ff"); // Light indigo for Master
-        masterSheet.setTabColor("4f46e5"); // Indigo tab color
-      }
-
-      // Check if headers match v2.0 update, append if missing
-      const currentHeaders = masterSheet.getRange(1, 1, 1, masterSheet.getLastColumn()).getValues()[0];
-      if (currentHeaders.length < HEADERS.length) {
-         // Naive update: just warn user or append to end? 
-         // For now, let's assume new sheet or manual fix.
-         // Actually, if we just appendRow with more columns than header, it works but looks messy.
-         // Let's force update the header row if it's short.
-         masterSheet.getRange(1, 1, 1, HEADERS.length).setValues([HEADERS]);
-      }
-
-      const row = [
-        q.ID, q.uniqueId, q.Status || 'Approved', q.Discipline, q.Difficulty, q.Type, q.Question, 
-        q.OptionA, q.OptionB, q.OptionC, q.OptionD, q.Answer, q.Explanation, 
-        q.Language, q.SourceFile || '', q.QualityScore || '', q.AICritique || '', q.TokenCost || '',
-        q.RejectionReason || '', q.HumanVerifiedBy || '', q.RejectedAt || '', timestamp
-      ];
-      masterSheet.appendRow(row);
-    });
-
-    // 2. CREATE SEPARATE EXPORT FILE (Granular Tabs)
-    // Group by Language + Type + Difficulty
-    const granularGroups = {};
-    questions.forEach(q => {
-      const lang = q.Language || 'English';
-      const typeShort = q.Type.includes('True') ? 'TF' : 'MC';
-      const diffShort = q.Difficulty.split(' ')[0]; // 'Easy', 'Medium', 'Hard'
-      
-      // Group Key: "English_TF_Easy"
-      const groupKey = `${lang}_${typeShort}_${diffShort}`;
-      
-      if (!granularGroups[groupKey]) granularGroups[groupKey] = [];
-      granularGroups[groupKey].push(q);
-    });
-
-    // Create ONE new Spreadsheet for this batch
-    // Filename: UE5_Export_${Lang}_${Date}
-    const batchName = `UE5_Export_${Object.keys(granularGroups)[0].split('_')[0]}_${Utilities.formatDate(timestamp, Session.getScriptTimeZone(), "yyyy-MM-dd_HH-mm")}`;
-    const newSS = SpreadsheetApp.create(batchName);
-    const fileId = newSS.getId();
-    
-    // Create tabs for each granular group
-    Object.keys(granularGroups).forEach(groupName => {
-      let sheet = newSS.getSheetByName(groupName);
-      if (!sheet) {
-        sheet = newSS.insertSheet(groupName);
-      }
-      
-      sheet.appendRow(HEADERS);
-      sheet.getRange(1, 1, 1, HEADERS.length).setFontWeight("bold").setBackground("#dcfce7"); // Light green for export
-      
-      granularGroups[groupName].forEach(q => {
-        const row = [
-          q.ID, q.uniqueId, q.Status || 'Approved', q.Discipline, q.Difficulty, q.Type, q.Question, 
-          q.OptionA, q.OptionB, q.OptionC, q.OptionD, q.Answer, q.Explanation, 
-          q.Language, q.SourceFile || '', q.QualityScore || '', q.AICritique || '', q.TokenCost || '',
-          q.RejectionReason || '', q.HumanVerifiedBy || '', q.RejectedAt || '', timestamp
-        ];
-        sheet.appendRow(row);
-      });
-    });
-
-    // Remove default "Sheet1" if it's empty and not used
-    const defaultSheet = newSS.getSheetByName('Sheet1');
-    if (defaultSheet && defaultSheet.getLastRow() === 0) {
-      newSS.deleteSheet(defaultSheet);
-    }
+    const fileId = saveQuestions(ss, questions, timestamp);
 
     // Return Success Page
     const htmlOutput = `
@@ -185,3 +114,220 @@ function doPost(e) {
     return ContentService.createTextOutput("Error: " + err.toString());
   }
 }
+
+// Builds a Master / export row from one payload question.
+// Missing values become '' (setValues, unlike appendRow, rejects undefined).
+function buildRow(q, timestamp) {
+  return [
+    q.ID, q.uniqueId, q.Status || 'Approved', q.Discipline, q.Difficulty, q.Type, q.Question, 
+    q.OptionA, q.OptionB, q.OptionC, q.OptionD, q.Answer, q.Explanation, 
+    q.Language, q.SourceFile || '', q.QualityScore || '', q.AICritique || '', q.TokenCost || '',
+    q.RejectionReason || '', q.HumanVerifiedBy || '', q.RejectedAt || '', timestamp
+  ].map(v => (v === undefined || v === null ? '' : v));
+}
+
+// Saves questions to the Master_ sheets and a new export file; returns the file id.
+// Rows are written with one setValues call per sheet instead of appendRow per question.
+function saveQuestions(ss, questions, timestamp) {
+  // Group everything before writing, so a bad question fails the call before any sheet changes
+  // (a chunked push that fails half-way would otherwise duplicate Master rows on retry).
+  // Master DB: split by Language. Export file: Language + Type + Difficulty.
+  const masterRows = {};
+  const granularGroups = {};
+  questions.forEach(q => {
+    const lang = q.Language || 'English';
+    const row = buildRow(q, timestamp);
+    if (!masterRows[lang]) masterRows[lang] = [];
+    masterRows[lang].push(row);
+
+    const typeShort = String(q.Type || '').includes('True') ? 'TF' : 'MC';
+    const diffShort = String(q.Difficulty || '').split(' ')[0]; // 'Easy', 'Medium', 'Hard'
+    
+    // Group Key: "English_TF_Easy"
+    const groupKey = `${lang}_${typeShort}_${diffShort}`;
+    
+    if (!granularGroups[groupKey]) granularGroups[groupKey] = [];
+    granularGroups[groupKey].push(row);
+  });
+
+  // 1. SAVE TO MASTER DB (Split by Language)
+  Object.keys(masterRows).forEach(lang => {
+    const masterSheetName = `Master_${lang}`;
+    let masterSheet = ss.getSheetByName(masterSheetName);
+    
+    if (!masterSheet) {
+      masterSheet = ss.insertSheet(masterSheetName);
+      masterSheet.appendRow(HEADERS);
+      masterSheet.getRange(1, 1, 1, HEADERS.length).setFontWeight("bold").setBackground("#e0e7ff"); // Light indigo for Master
+      masterSheet.setTabColor("4f46e5"); // Indigo tab color
+    }
+
+    // Check if headers match v2.0 update, force update the header row if it's short
+    const currentHeaders = masterSheet.getRange(1, 1, 1, masterSheet.getLastColumn()).getValues()[0];
+    if (currentHeaders.length < HEADERS.length) {
+      masterSheet.getRange(1, 1, 1, HEADERS.length).setValues([HEADERS]);
+    }
+
+    const rows = masterRows[lang];
+    masterSheet.getRange(masterSheet.getLastRow() + 1, 1, rows.length, HEADERS.length).setValues(rows);
+  });
+
+  // 2. CREATE SEPARATE EXPORT FILE (Granular Tabs)
+  // Create ONE new Spreadsheet for this batch
+  // Filename: UE5_Export_${Lang}_${Date}
+  const batchName = `UE5_Export_${Object.keys(granularGroups)[0].split('_')[0]}_${Utilities.formatDate(timestamp, Session.getScriptTimeZone(), "yyyy-MM-dd_HH-mm")}`;
+  const newSS = SpreadsheetApp.create(batchName);
+  
+  // Create tabs for each granular group
+  Object.keys(granularGroups).forEach(groupName => {
+    let sheet = newSS.getSheetByName(groupName);
+    if (!sheet) {
+      sheet = newSS.insertSheet(groupName);
+    }
+    
+    const rows = granularGroups[groupName];
+    sheet.getRange(sheet.getLastRow() + 1, 1, rows.length + 1, HEADERS.length).setValues([HEADERS].concat(rows));
+    sheet.getRange(1, 1, 1, HEADERS.length).setFontWeight("bold").setBackground("#dcfce7"); // Light green for export
+  });
+
+  // Remove default "Sheet1" if it's empty and not used
+  const defaultSheet = newSS.getSheetByName('Sheet1');
+  if (defaultSheet && defaultSheet.getLastRow() === 0) {
+    newSS.deleteSheet(defaultSheet);
+  }
+
+  return newSS.getId();
+}
+
+// --- CHUNKED PUSH ---
+// sheets_push.py sends the bank as numbered chunks, then a commit:
+//   POST ?action=chunk&pushId=P&index=N   body: base64(gzip(JSON {questions: [...]}))
+//   POST ?action=commit&pushId=P&total=T
+// Chunks are staged in a hidden _Push_<pushId> sheet, one question per row.
+// A chunk index that was already staged is acknowledged without writing it again,
+// so clients can retry any request. Commit saves everything in chunk order once all
+// T chunks are staged; committing the same push again returns the first result.
+// Status 'Busy' (lock not acquired) is safe to retry; 'Error' is not.
+const PUSH_SHEET_PREFIX = '_Push_';
+const LOCK_TIMEOUT_MS = 30000;
+
+function jsonResponse(obj) {
+  return ContentService.createTextOutput(JSON.stringify(obj)).setMimeType(ContentService.MimeType.JSON);
+}
+
+function pushKey(pushId) {
+  return `push_${pushId}`;
+}
+
+function pushDoneKey(pushId) {
+  return `pushdone_${pushId}`;
+}
+
+function validPushId(pushId) {
+  return typeof pushId === 'string' && /^[A-Za-z0-9_-]{1,64}$/.test(pushId);
+}
+
+function decodeChunk(body) {
+  const bytes = Utilities.base64Decode(body.trim());
+  const json = Utilities.ungzip(Utilities.newBlob(bytes, 'application/x-gzip')).getDataAsString('UTF-8');
+  return JSON.parse(json).questions;
+}
+
+function handleChunk(ss, e) {
+  const pushId = e.parameter.pushId;
+  const index = parseInt(e.parameter.index, 10);
+  if (!validPushId(pushId) || !(index >= 0)) {
+    return jsonResponse({ status: 'Error', message: 'pushId and index are required' });
+  }
+
+  let questions;
+  try {
+    questions = decodeChunk(e.postData ? e.postData.contents : '');
+    if (!Array.isArray(questions)) throw new Error('questions must be an array');
+  } catch (err) {
+    return jsonResponse({ status: 'Error', message: `Bad chunk ${index}: ${err}` });
+  }
+
+  const lock = LockService.getScriptLock();
+  if (!lock.tryLock(LOCK_TIMEOUT_MS)) {
+    return jsonResponse({ status: 'Busy', message: 'Another push request holds the lock' });
+  }
+  try {
+    const props = PropertiesService.getScriptProperties();
+    if (props.getProperty(pushDoneKey(pushId))) {
+      return jsonResponse({ status: 'Success', index: index, duplicate: true, committed: true });
+    }
+    const received = JSON.parse(props.getProperty(pushKey(pushId)) || '[]');
+    if (received.indexOf(index) !== -1) {
+      return jsonResponse({ status: 'Success', index: index, duplicate: true });
+    }
+
+    let staging = ss.getSheetByName(PUSH_SHEET_PREFIX + pushId);
+    if (!staging) {
+      staging = ss.insertSheet(PUSH_SHEET_PREFIX + pushId);
+      staging.hideSheet();
+    }
+    if (questions.length > 0) {
+      const rows = questions.map((q, i) => [index, i, JSON.stringify(q)]);
+      staging.getRange(staging.getLastRow() + 1, 1, rows.length, 3).setValues(rows);
+    }
+
+    received.push(index);
+    props.setProperty(pushKey(pushId), JSON.stringify(received));
+    return jsonResponse({ status: 'Success', index: index, rows: questions.length, duplicate: false });
+  } catch (err) {
+    return jsonResponse({ status: 'Error', message: `Chunk ${index}: ${err}` });
+  } finally {
+    lock.releaseLock();
+  }
+}
+
+function handleCommit(ss, e) {
+  const pushId = e.parameter.pushId;
+  const total = parseInt(e.parameter.total, 10);
+  if (!validPushId(pushId) || !(total >= 0)) {
+    return jsonResponse({ status: 'Error', message: 'pushId and total are required' });
+  }
+
+  const lock = LockService.getScriptLock();
+  if (!lock.tryLock(LOCK_TIMEOUT_MS)) {
+    return jsonResponse({ status: 'Busy', message: 'Another push request holds the lock' });
+  }
+  try {
+    const props = PropertiesService.getScriptProperties();
+    const done = props.getProperty(pushDoneKey(pushId));
+    if (done) {
+      return jsonResponse(Object.assign({ status: 'Success', duplicate: true }, JSON.parse(done)));
+    }
+
+    const received = JSON.parse(props.getProperty(pushKey(pushId)) || '[]');
+    const missing = [];
+    for (let i = 0; i < total; i++) {
+      if (received.indexOf(i) === -1) missing.push(i);
+    }
+    if (missing.length > 0) {
+      return jsonResponse({ status: 'Incomplete', missing: missing });
+    }
+
+    const staging = ss.getSheetByName(PUSH_SHEET_PREFIX + pushId);
+    const staged = staging && staging.getLastRow() > 0
+      ? staging.getRange(1, 1, staging.getLastRow(), 3).getValues()
+      : [];
+    staged.sort((a, b) => (a[0] - b[0]) || (a[1] - b[1]));
+    const questions = staged.map(row => JSON.parse(row[2]));
+
+    const result = { count: questions.length, fileId: null };
+    if (questions.length > 0) {
+      result.fileId = saveQuestions(ss, questions, new Date());
+    }
+
+    if (staging) ss.deleteSheet(staging);
+    props.deleteProperty(pushKey(pushId));
+    props.setProperty(pushDoneKey(pushId), JSON.stringify(result));
+    return jsonResponse(Object.assign({ status: 'Success', duplicate: false }, result));
+  } catch (err) {
+    return jsonResponse({ status: 'Error', message: `Commit: ${err}` });
+  } finally {
+    lock.releaseLock();
+  }
+}
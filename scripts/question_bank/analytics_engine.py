@@ -0,0 +1,816 @@
+"""
+analytics_engine.py
+
+Query the analytics store (src/utils/analyticsStore.js) from Python without
+re-scanning it for every question.
+
+getMetrics, updateSummary and getTokenStats filter the whole event list and
+re-parse every ISO timestamp on each call, and logQuestion finds an existing
+question with a linear findIndex. This engine loads the store once into
+column arrays and answers from those:
+
+  - timestamps are parsed once to epoch milliseconds and rows are sorted by
+    time, so a time range is two binary searches and range totals are two
+    lookups into running totals (prefix sums)
+  - discipline, difficulty, model, status and type are small integer codes,
+    so per-discipline and acceptance-rate queries are masks / bincounts over
+    the selected slice
+  - per-day (UTC) buckets are computed at load; week and month reports are
+    rolled up from them, so a multi-year history costs days, not events
+  - questions are indexed by id (a dict), merged like logQuestion does
+
+With NumPy installed the columns are NumPy arrays and every query is
+vectorized; without it the same queries run on array/list columns with
+bisect and plain loops (same results, slower).
+
+Input is the `ue5_analytics` localStorage value saved as JSON (see
+columnar_export.py), or the CSV from exportAnalytics(); the CSV only has
+generations, so question metrics come back empty.
+
+Usage:
+    python analytics_engine.py ue5_analytics.json
+    python analytics_engine.py ue5_analytics.json --range week --discipline Lighting
+    python analytics_engine.py ue5_analytics.json --report month --since 2023-01-01
+    python analytics_engine.py ue5_analytics.json --question q123
+    python analytics_engine.py --self-test
+"""
+import argparse
+import csv
+import json
+import math
+import random
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, timezone
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from columnar_export import _to_float, _to_int, _to_millis, load_analytics
+from csv_export import js_truthy
+
+try:
+    import numpy as np
+except ImportError:  # optional: falls back to array/bisect and plain loops
+    np = None
+
+# =========================
+# CONFIG
+# =========================
+MS_PER_DAY = 86_400_000
+TIME_RANGES = {"day": 1, "week": 7, "month": 30}   # getMetrics cutoffs, in days
+REPORT_PERIODS = ("day", "week", "month")
+UNKNOWN = "Unknown"
+UNDATED = -(2 ** 63)          # sorts before every real timestamp
+RECENT_GENERATIONS = 10       # getTokenStats: slice(-10)
+BUCKET_CATEGORIES = ("discipline",)
+
+_EPOCH_DATE = date(1970, 1, 1)
+
+if np is not None:
+    _NP_TYPES = {"q": np.int64, "i": np.int32, "b": np.int8, "d": np.float64}
+
+GENERATION_MEASURES = ("input_tokens", "output_tokens", "cost", "succeeded", "questions_generated")
+QUESTION_MEASURES = ("accepted", "rejected", "quality", "rated")
+
+
+def js_round(value: float) -> int:
+    """
+    Math.round: halves round up.
+    """
+    return int(math.floor(value + 0.5))
+
+
+def category_name(value: Any) -> str:
+    return UNKNOWN if value is None or value == "" else str(value)
+
+
+def day_number(value: date) -> int:
+    return (value - _EPOCH_DATE).days
+
+
+def period_key(day: int, period: str) -> int:
+    """
+    Bucket number of a UTC day number: the day itself, the Monday-based week
+    (1970-01-01 was a Thursday) or the month since 1970-01.
+    """
+    if period == "day":
+        return day
+    if period == "week":
+        return (day + 3) // 7
+    d = _EPOCH_DATE + timedelta(days=day)
+    return (d.year - 1970) * 12 + d.month - 1
+
+
+def period_label(key: int, period: str) -> str:
+    if period == "day":
+        return (_EPOCH_DATE + timedelta(days=key)).isoformat()
+    if period == "week":
+        year, week, _ = (_EPOCH_DATE + timedelta(days=key * 7 - 3)).isocalendar()
+        return f"{year}-W{week:02d}"
+    return f"{1970 + key // 12}-{key % 12 + 1:02d}"
+
+
+# ----- column primitives (NumPy or array/list) -----
+
+def _sorted_column(values: List, typecode: str, order):
+    """
+    `values` reordered by `order` as a typed column.
+    """
+    if np is not None:
+        return np.asarray(values, dtype=_NP_TYPES[typecode])[order]
+    return array(typecode, [values[i] for i in order])
+
+
+def _prefix(column, typecode: str):
+    """
+    Running totals with a leading 0: sum(column[lo:hi]) == p[hi] - p[lo].
+    """
+    if np is not None:
+        totals = np.cumsum(column, dtype=np.float64 if typecode == "d" else np.int64)
+        return np.concatenate((np.zeros(1, dtype=totals.dtype), totals))
+    return array("d" if typecode == "d" else "q", accumulate(column, initial=0))
+
+
+def _search(column, value: int) -> int:
+    if np is not None:
+        return int(np.searchsorted(column, value, side="left"))
+    return bisect_left(column, value)
+
+
+def _bincount(codes, size: int, weights=None) -> List:
+    """
+    Per-code count (or sum of `weights`) as a list of length `size`.
+    """
+    if np is not None:
+        return np.bincount(np.asarray(codes, dtype=np.int64), weights=weights, minlength=size).tolist()
+    out = [0] * size
+    if weights is None:
+        for c in codes:
+            out[c] += 1
+    else:
+        for c, w in zip(codes, weights):
+            out[c] += w
+    return out
+
+
+def _scalar(value):
+    return value.item() if hasattr(value, "item") else value
+
+
+class _Codes:
+    """
+    Category name -> small int code, in first-seen order.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def code(self, value: Any) -> int:
+        name = category_name(value)
+        c = self._index.get(name)
+        if c is None:
+            c = self._index[name] = len(self.names)
+            self.names.append(name)
+        return c
+
+    def get(self, name: str) -> Optional[int]:
+        return self._index.get(name)
+
+
+class EventTable:
+    """
+    One event list (generations or questions) as time-sorted columns.
+
+    Rows without a parseable timestamp sort first; they count towards
+    whole-table totals only, never towards a time range or a report.
+    """
+
+    def __init__(self, timestamps: List[Optional[int]], categories: Dict[str, List[Any]],
+                 measures: Dict[str, Tuple[str, List]]):
+        ts = [UNDATED if t is None else t for t in timestamps]
+        if np is not None:
+            order = np.argsort(np.asarray(ts, dtype=np.int64), kind="stable")
+        else:
+            order = sorted(range(len(ts)), key=ts.__getitem__)
+        self.size = len(ts)
+        self.undated = sum(1 for t in timestamps if t is None)
+        self.order = order
+        self.timestamps = _sorted_column(ts, "q", order)
+
+        self.codes = {}
+        self.names: Dict[str, _Codes] = {}
+        for name, values in categories.items():
+            names = _Codes()
+            self.codes[name] = _sorted_column([names.code(v) for v in values], "i", order)
+            self.names[name] = names
+
+        self.measures = {}
+        self.prefix = {}
+        for name, (typecode, values) in measures.items():
+            self.measures[name] = _sorted_column(values, typecode, order)
+            self.prefix[name] = _prefix(self.measures[name], typecode)
+
+        self._build_day_buckets()
+
+    def _build_day_buckets(self) -> None:
+        """
+        buckets[None][measure][d] and buckets[category][measure][d * n + code]
+        for day d = day0 + index; "count" is one of the measures.
+        """
+        self.day0, self.ndays = 0, 0
+        self.buckets: Dict[Optional[str], Dict[str, List]] = {}
+        if self.size == self.undated:
+            return
+        dated = self.timestamps[self.undated:]
+        self.day0 = _scalar(dated[0]) // MS_PER_DAY
+        self.ndays = _scalar(dated[-1]) // MS_PER_DAY - self.day0 + 1
+        if np is not None:
+            days = dated // MS_PER_DAY - self.day0
+        else:
+            days = [t // MS_PER_DAY - self.day0 for t in dated]
+
+        def bucketed(keys, size):
+            out = {"count": _bincount(keys, size)}
+            for name, column in self.measures.items():
+                out[name] = _bincount(keys, size, column[self.undated:])
+            return out
+
+        self.buckets[None] = bucketed(days, self.ndays)
+        for category in BUCKET_CATEGORIES:
+            if category not in self.codes:
+                continue
+            n = len(self.names[category].names)
+            codes = self.codes[category][self.undated:]
+            if np is not None:
+                keys = days * n + codes
+            else:
+                keys = [d * n + c for d, c in zip(days, codes)]
+            self.buckets[category] = bucketed(keys, self.ndays * n)
+
+    def code(self, category: str, name: str) -> Optional[int]:
+        return self.names[category].get(name)
+
+    def bounds(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Row slice [lo, hi) with start_ms <= timestamp < end_ms.
+        """
+        lo = self.undated if start_ms is None else max(self.undated, _search(self.timestamps, start_ms))
+        hi = self.size if end_ms is None else max(lo, _search(self.timestamps, end_ms))
+        return lo, hi
+
+    def totals(self, lo: int = 0, hi: Optional[int] = None) -> Dict[str, float]:
+        hi = self.size if hi is None else hi
+        out = {"count": hi - lo}
+        for name, prefix in self.prefix.items():
+            out[name] = _scalar(prefix[hi] - prefix[lo])
+        return out
+
+    def totals_where(self, lo: int, hi: int, category: str, code: Optional[int]) -> Dict[str, float]:
+        """
+        Totals over [lo, hi) restricted to rows whose `category` has `code`.
+        """
+        if code is None:
+            return dict.fromkeys(["count", *self.measures], 0)
+        codes = self.codes[category][lo:hi]
+        if np is not None:
+            mask = codes == code
+            out = {"count": int(np.count_nonzero(mask))}
+            for name, column in self.measures.items():
+                out[name] = column[lo:hi][mask].sum().item()
+            return out
+        rows = [i for i, c in enumerate(codes, lo) if c == code]
+        out = {"count": len(rows)}
+        for name, column in self.measures.items():
+            out[name] = sum(column[i] for i in rows)
+        return out
+
+    def grouped(self, lo: int, hi: int, category: str) -> Dict[str, Dict[str, float]]:
+        """
+        Totals over [lo, hi) per `category` value (values with no rows are left out).
+        """
+        names = self.names[category].names
+        codes = self.codes[category][lo:hi]
+        sums = {"count": _bincount(codes, len(names))}
+        for name, column in self.measures.items():
+            sums[name] = _bincount(codes, len(names), column[lo:hi])
+        return {
+            label: {name: values[c] for name, values in sums.items()}
+            for c, label in enumerate(names) if sums["count"][c]
+        }
+
+    def rollup(self, period: str, first_day: Optional[int] = None, last_day: Optional[int] = None,
+               category: Optional[str] = None, code: Optional[int] = None) -> Dict[int, Dict[str, float]]:
+        """
+        Day buckets in [first_day, last_day] summed per period key.
+        """
+        if not self.ndays or (category is not None and code is None):
+            return {}
+        lo = 0 if first_day is None else max(first_day - self.day0, 0)
+        hi = self.ndays if last_day is None else min(last_day - self.day0 + 1, self.ndays)
+        if hi <= lo:
+            return {}
+        keys = [period_key(self.day0 + d, period) for d in range(lo, hi)]
+        k0 = keys[0]
+        index = [k - k0 for k in keys]
+        size = index[-1] + 1
+        if category is None:
+            buckets = {name: values[lo:hi] for name, values in self.buckets[None].items()}
+        else:
+            n = len(self.names[category].names)
+            buckets = {name: values[lo * n + code:hi * n:n] for name, values in self.buckets[category].items()}
+        sums = {name: _bincount(index, size, values) for name, values in buckets.items()}
+        return {k0 + i: {name: values[i] for name, values in sums.items()} for i in range(size)}
+
+
+def merge_questions(questions: List[Dict]) -> List[Dict]:
+    """
+    Question events merged by id the way logQuestion does (later fields win,
+    first position kept); events without an id are kept as they are.
+    """
+    merged: Dict[Any, Dict] = {}
+    for q in questions:
+        if not isinstance(q, dict):
+            continue
+        qid = q.get("id")
+        key = ("row", len(merged)) if qid is None else ("id", qid)
+        merged[key] = {**merged[key], **q} if key in merged else q
+    return list(merged.values())
+
+
+def _generation_measures(g: Dict) -> Tuple[int, int, float, int, int]:
+    tokens = g.get("tokensUsed") if isinstance(g.get("tokensUsed"), dict) else {}
+    return (
+        _to_int(tokens.get("input")) or 0,
+        _to_int(tokens.get("output")) or 0,
+        _to_float(g.get("estimatedCost")) or 0.0,
+        1 if js_truthy(g.get("success")) else 0,
+        _to_int(g.get("questionsGenerated")) or 0,
+    )
+
+
+def _question_measures(q: Dict) -> Tuple[int, int, float, int]:
+    status = q.get("status")
+    quality = _to_float(q.get("qualityScore"))
+    return (
+        1 if status == "accepted" else 0,
+        1 if status == "rejected" else 0,
+        quality if quality is not None and math.isfinite(quality) else 0.0,
+        1 if quality is not None and math.isfinite(quality) else 0,
+    )
+
+
+def _stats(gen: Dict[str, float], qs: Dict[str, float]) -> Dict:
+    """
+    Range metrics from generation and question totals.
+    """
+    decided = qs.get("accepted", 0) + qs.get("rejected", 0)
+    rated = qs.get("rated", 0)
+    input_tokens = int(gen.get("input_tokens", 0))
+    output_tokens = int(gen.get("output_tokens", 0))
+    return {
+        "generations": int(gen.get("count", 0)),
+        "successful_generations": int(gen.get("succeeded", 0)),
+        "questions_generated": int(gen.get("questions_generated", 0)),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "estimated_cost": round(gen.get("cost", 0.0), 6),
+        "questions": int(qs.get("count", 0)),
+        "accepted": int(qs.get("accepted", 0)),
+        "rejected": int(qs.get("rejected", 0)),
+        "acceptance_rate": js_round(qs["accepted"] / decided * 100) if decided else 0,
+        "average_quality": js_round(qs["quality"] / rated) if rated else 0,
+    }
+
+
+class AnalyticsEngine:
+    """
+    The analytics store as columns, loaded once.
+
+        engine = AnalyticsEngine.from_path(Path("ue5_analytics.json"))
+        engine.metrics("week", discipline="Lighting")
+        engine.report("month")
+    """
+
+    def __init__(self, data: Dict):
+        generations = [g for g in data.get("generations") or [] if isinstance(g, dict)]
+        gen_measures = list(zip(*map(_generation_measures, generations))) or [[]] * len(GENERATION_MEASURES)
+        self.generations = EventTable(
+            [_to_millis(g.get("timestamp")) for g in generations],
+            {
+                "discipline": [g.get("discipline") for g in generations],
+                "difficulty": [g.get("difficulty") for g in generations],
+                "model": [g.get("model") for g in generations],
+            },
+            {
+                "input_tokens": ("q", gen_measures[0]),
+                "output_tokens": ("q", gen_measures[1]),
+                "cost": ("d", gen_measures[2]),
+                "succeeded": ("b", gen_measures[3]),
+                "questions_generated": ("q", gen_measures[4]),
+            },
+        )
+
+        questions = merge_questions(data.get("questions") or [])
+        q_measures = list(zip(*map(_question_measures, questions))) or [[]] * len(QUESTION_MEASURES)
+        self.questions = EventTable(
+            [_to_millis(q.get("created")) for q in questions],
+            {
+                "discipline": [q.get("discipline") for q in questions],
+                "difficulty": [q.get("difficulty") for q in questions],
+                "status": [q.get("status") for q in questions],
+                "type": [q.get("type") for q in questions],
+            },
+            {
+                "accepted": ("b", q_measures[0]),
+                "rejected": ("b", q_measures[1]),
+                "quality": ("d", q_measures[2]),
+                "rated": ("b", q_measures[3]),
+            },
+        )
+        # id -> sorted row (the findIndex in logQuestion, as a hash lookup)
+        order = self.questions.order.tolist() if np is not None else self.questions.order
+        self.question_index: Dict[Any, int] = {}
+        self._question_ids: List[Any] = [None] * len(questions)
+        for row, i in enumerate(order):
+            qid = questions[i].get("id")
+            self._question_ids[row] = qid
+            if qid is not None:
+                self.question_index[qid] = row
+
+        actions = [a for a in data.get("critiqueActions") or [] if isinstance(a, dict)]
+        self.critique_actions = len(actions)
+        self.critique_applied = sum(1 for a in actions if a.get("action") == "applied")
+
+    @classmethod
+    def from_path(cls, path: Path) -> "AnalyticsEngine":
+        path = Path(path)
+        if path.suffix.lower() == ".csv":
+            return cls({"generations": load_export_csv(path)})
+        return cls(load_analytics(path))
+
+    # ----- the analyticsStore.js queries -----
+    def summary(self) -> Dict:
+        """
+        The summary object updateSummary maintains (plus critiqueAcceptanceRate).
+        """
+        gen = self.generations.totals()
+        qs = self.questions.totals()
+        stats = _stats(gen, qs)
+        return {
+            "totalGenerations": stats["generations"],
+            "totalQuestions": stats["questions"],
+            "totalTokens": stats["total_tokens"],
+            "estimatedCost": gen["cost"],
+            "averageQuality": stats["average_quality"],
+            "acceptanceRate": stats["acceptance_rate"],
+            "critiqueAcceptanceRate": (js_round(self.critique_applied / self.critique_actions * 100)
+                                       if self.critique_actions else 0),
+        }
+
+    def token_stats(self, recent: int = RECENT_GENERATIONS) -> Dict:
+        """
+        getTokenStats: totals plus averages over the `recent` latest generations.
+        """
+        table = self.generations
+        lo = max(table.size - recent, 0)
+        last = table.totals(lo, table.size)
+        n = last["count"]
+        return {
+            "total": self.summary()["totalTokens"],
+            "recent": last["input_tokens"] + last["output_tokens"],
+            "avgInput": js_round(last["input_tokens"] / n) if n else 0,
+            "avgOutput": js_round(last["output_tokens"] / n) if n else 0,
+            "estimatedCost": table.totals()["cost"],
+        }
+
+    def metrics(self, time_range: str = "all", now_ms: Optional[int] = None,
+                discipline: Optional[str] = None) -> Dict:
+        """
+        getMetrics(timeRange) as aggregates: 'day', 'week', 'month' (last 1/7/30 days) or 'all'.
+        """
+        if time_range == "all":
+            return self.range_stats(discipline=discipline)
+        if time_range not in TIME_RANGES:
+            raise ValueError(f"unknown time range {time_range!r}")
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        return self.range_stats(now_ms - TIME_RANGES[time_range] * MS_PER_DAY, None, discipline)
+
+    # ----- general queries -----
+    def range_stats(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                    discipline: Optional[str] = None) -> Dict:
+        """
+        Metrics for events with start_ms <= timestamp < end_ms, optionally one discipline.
+        """
+        parts = []
+        for table in (self.generations, self.questions):
+            lo, hi = table.bounds(start_ms, end_ms)
+            if discipline is None:
+                parts.append(table.totals(lo, hi))
+            else:
+                parts.append(table.totals_where(lo, hi, "discipline", table.code("discipline", discipline)))
+        return _stats(*parts)
+
+    def by_discipline(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        range_stats per discipline, in one pass over each table's slice.
+        """
+        gen = self.generations.grouped(*self.generations.bounds(start_ms, end_ms), "discipline")
+        qs = self.questions.grouped(*self.questions.bounds(start_ms, end_ms), "discipline")
+        return {name: _stats(gen.get(name, {}), qs.get(name, {})) for name in sorted(set(gen) | set(qs))}
+
+    def report(self, period: str = "week", since: Optional[date] = None, until: Optional[date] = None,
+               discipline: Optional[str] = None) -> List[Dict]:
+        """
+        Metrics per day / week / month from the day buckets, every period from
+        the first to the last event (empty periods included). `since` and
+        `until` are inclusive UTC dates.
+        """
+        if period not in REPORT_PERIODS:
+            raise ValueError(f"unknown report period {period!r}")
+        first = None if since is None else day_number(since)
+        last = None if until is None else day_number(until)
+        rolled = []
+        for table in (self.generations, self.questions):
+            if discipline is None:
+                rolled.append(table.rollup(period, first, last))
+            else:
+                rolled.append(table.rollup(period, first, last, "discipline", table.code("discipline", discipline)))
+        keys = set(rolled[0]) | set(rolled[1])
+        if not keys:
+            return []
+        return [
+            {"period": period_label(k, period), **_stats(rolled[0].get(k, {}), rolled[1].get(k, {}))}
+            for k in range(min(keys), max(keys) + 1)
+        ]
+
+    def question(self, question_id: Any) -> Optional[Dict]:
+        """
+        The merged question event with this id, from the id index.
+        """
+        row = self.question_index.get(question_id)
+        if row is None:
+            return None
+        table = self.questions
+        created = _scalar(table.timestamps[row])
+        out = {"id": question_id, "created_ms": None if created == UNDATED else created}
+        for category, names in table.names.items():
+            out[category] = names.names[table.codes[category][row]]
+        rated = _scalar(table.measures["rated"][row])
+        out["quality_score"] = _scalar(table.measures["quality"][row]) if rated else None
+        return out
+
+
+def load_export_csv(path: Path) -> List[Dict]:
+    """
+    Generations from the exportAnalytics() CSV, in the logGeneration shape.
+    """
+    generations = []
+    with Path(path).open("r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            generations.append({
+                "timestamp": row.get("Timestamp"),
+                "discipline": row.get("Discipline"),
+                "difficulty": row.get("Difficulty"),
+                "batchSize": _to_int(row.get("Batch Size")),
+                "tokensUsed": {"input": _to_int(row.get("Input Tokens")),
+                               "output": _to_int(row.get("Output Tokens"))},
+                "duration": _to_int(row.get("Duration (ms)")),
+                "questionsGenerated": _to_int(row.get("Questions Generated")),
+                "averageQuality": _to_float(row.get("Average Quality")),
+                "success": row.get("Success") == "Yes",
+                "estimatedCost": _to_float(row.get("Cost ($)")),
+            })
+    return generations
+
+
+# ----- self-test -----
+
+def _synthetic_store(generations: int, questions: int, years: int = 3, seed: int = 7) -> Dict:
+    rng = random.Random(seed)
+    disciplines = ["Lighting", "Blueprints", "Materials", "Animation", "Niagara", None]
+    start = datetime(2022, 3, 1, tzinfo=timezone.utc).timestamp()
+    span = years * 365 * 86400
+
+    def stamp():
+        return datetime.fromtimestamp(start + rng.random() * span, timezone.utc).isoformat(
+            timespec="milliseconds").replace("+00:00", "Z")
+
+    gens = []
+    for i in range(generations):
+        gens.append({
+            "id": f"g{i}", "timestamp": stamp(), "discipline": rng.choice(disciplines),
+            "difficulty": rng.choice(["Easy", "Medium", "Hard"]),
+            "tokensUsed": {"input": rng.randint(200, 4000), "output": rng.randint(500, 9000)},
+            "questionsGenerated": rng.randint(0, 8), "success": rng.random() > 0.05,
+            "model": rng.choice(["gemini-2.0-flash", "gemini-1.5-pro"]),
+            "estimatedCost": rng.random() / 100,
+        })
+    qs = []
+    for i in range(questions):
+        qs.append({
+            "id": f"q{rng.randrange(questions)}" if rng.random() < 0.05 else f"q{i}",
+            "created": "not a date" if rng.random() < 0.002 else stamp(),
+            "status": rng.choice(["accepted", "accepted", "rejected", "pending"]),
+            "qualityScore": None if rng.random() < 0.2 else rng.randint(1, 100),
+            "discipline": rng.choice(disciplines), "difficulty": rng.choice(["Easy", "Medium", "Hard"]),
+            "type": rng.choice(["Multiple Choice", "True/False"]),
+        })
+    actions = [{"action": rng.choice(["applied", "rejected"])} for _ in range(500)]
+    return {"generations": gens, "questions": qs, "critiqueActions": actions}
+
+
+def _reference_stats(data: Dict, start_ms: Optional[int], end_ms: Optional[int],
+                     discipline: Optional[str]) -> Dict:
+    """
+    range_stats the way analyticsStore.js computes it: filter, re-parse, sum.
+    """
+    def keep(event, field):
+        t = _to_millis(event.get(field))
+        return (t is not None and (start_ms is None or t >= start_ms) and (end_ms is None or t < end_ms)
+                and (discipline is None or category_name(event.get("discipline")) == discipline))
+
+    gen = {"count": 0, **dict.fromkeys(GENERATION_MEASURES, 0)}
+    for g in data["generations"]:
+        if keep(g, "timestamp"):
+            gen["count"] += 1
+            for name, value in zip(GENERATION_MEASURES, _generation_measures(g)):
+                gen[name] += value
+    qs = {"count": 0, **dict.fromkeys(QUESTION_MEASURES, 0)}
+    for q in merge_questions(data["questions"]):
+        if keep(q, "created"):
+            qs["count"] += 1
+            for name, value in zip(QUESTION_MEASURES, _question_measures(q)):
+                qs[name] += value
+    return _stats(gen, qs)
+
+
+def _same(a: Any, b: Any) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        return math.isclose(a, b, abs_tol=1e-6)
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def self_test(generations: int = 30_000, questions: int = 30_000) -> int:
+    """
+    Compare engine queries against the filter-and-sum reference on a
+    synthetic three-year store (with NumPy, also the pure-Python fallback).
+
+    Returns:
+        failures
+    """
+    global np
+    data = _synthetic_store(generations, questions)
+    now_ms = _to_millis("2025-02-20T12:00:00Z")
+    ranges = [(None, None, None), (now_ms - MS_PER_DAY, None, None), (now_ms - 7 * MS_PER_DAY, None, None),
+              (now_ms - 30 * MS_PER_DAY, None, "Lighting"), (_to_millis("2023-01-01"), _to_millis("2024-01-01"), None),
+              (_to_millis("2023-06-15T08:00:00Z"), _to_millis("2023-06-15T20:00:00Z"), UNKNOWN),
+              (None, None, "Not a discipline")]
+
+    started = time.monotonic()
+    expected = [_reference_stats(data, *r) for r in ranges]
+    reference_seconds = (time.monotonic() - started) / len(ranges)
+
+    backends = [("numpy", np), ("pure Python", None)] if np is not None else [("pure Python", None)]
+    saved = np
+    failures = 0
+    try:
+        for label, module in backends:
+            np = module
+            started = time.monotonic()
+            engine = AnalyticsEngine(data)
+            load_seconds = time.monotonic() - started
+            started = time.monotonic()
+            got = [engine.range_stats(*r) for r in ranges]
+            query_seconds = (time.monotonic() - started) / len(ranges)
+            for r, want, have in zip(ranges, expected, got):
+                if not _same(want, have):
+                    failures += 1
+                    print(f"[analytics] {label}: range {r} differs:\n  want {want}\n  got  {have}", file=sys.stderr)
+
+            grouped = engine.by_discipline(*ranges[4][:2])
+            for name, stats in grouped.items():
+                if not _same(stats, _reference_stats(data, *ranges[4][:2], name)):
+                    failures += 1
+                    print(f"[analytics] {label}: by_discipline {name} differs", file=sys.stderr)
+
+            for period in REPORT_PERIODS:
+                report = engine.report(period, date(2023, 5, 3), date(2024, 2, 10), discipline="Materials")
+                for row in report[:3] + report[-3:]:
+                    first, last = _period_bounds(row["period"], period, date(2023, 5, 3), date(2024, 2, 10))
+                    want = _reference_stats(data, first, last, "Materials")
+                    if not _same({"period": row["period"], **want}, row):
+                        failures += 1
+                        print(f"[analytics] {label}: {period} {row['period']} differs", file=sys.stderr)
+            total_report = sum(row["questions"] for row in engine.report("month"))
+            if total_report != expected[0]["questions"]:
+                failures += 1
+                print(f"[analytics] {label}: monthly report covers {total_report} questions", file=sys.stderr)
+
+            summary = engine.summary()
+            if summary["totalQuestions"] != engine.questions.size or summary["totalGenerations"] != generations:
+                failures += 1
+                print(f"[analytics] {label}: summary counts differ: {summary}", file=sys.stderr)
+            merged = {q["id"]: q for q in merge_questions(data["questions"])}
+            for qid in ("q0", "q17", f"q{questions - 1}", "missing"):
+                found = engine.question(qid)
+                want_status = merged[qid]["status"] if qid in merged else None
+                if (found or {}).get("status") != want_status:
+                    failures += 1
+                    print(f"[analytics] {label}: question {qid} lookup differs", file=sys.stderr)
+
+            print(f"[analytics] {label}: load {load_seconds:.2f}s, query {query_seconds * 1000:.2f}ms "
+                  f"(reference {reference_seconds * 1000:.0f}ms)", file=sys.stderr)
+    finally:
+        np = saved
+    print(f"[analytics] self-test: {failures} failures", file=sys.stderr)
+    return failures
+
+
+def _period_bounds(label: str, period: str, since: date, until: date) -> Tuple[int, int]:
+    """
+    [start_ms, end_ms) of a report row, clipped to since/until (self-test helper).
+    """
+    if period == "day":
+        first = date.fromisoformat(label)
+        last = first
+    elif period == "week":
+        year, week = label.split("-W")
+        first = date.fromisocalendar(int(year), int(week), 1)
+        last = first + timedelta(days=6)
+    else:
+        year, month = map(int, label.split("-"))
+        first = date(year, month, 1)
+        last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    first, last = max(first, since), min(last, until)
+    return day_number(first) * MS_PER_DAY, (day_number(last) + 1) * MS_PER_DAY
+
+
+def _parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the analytics store (ue5_analytics JSON or exportAnalytics CSV)")
+    parser.add_argument("store", type=Path, nargs="?", help="ue5_analytics .json or exportAnalytics .csv")
+    parser.add_argument("--range", choices=["all", *TIME_RANGES], default="all", help="getMetrics time range")
+    parser.add_argument("--now", default=None, help="ISO time the range ends at (default: now)")
+    parser.add_argument("--discipline", default=None)
+    parser.add_argument("--report", choices=REPORT_PERIODS, default=None, help="per-period metrics")
+    parser.add_argument("--since", type=_parse_date, default=None, help="report start date (inclusive)")
+    parser.add_argument("--until", type=_parse_date, default=None, help="report end date (inclusive)")
+    parser.add_argument("--question", default=None, help="look up one question by id")
+    parser.add_argument("--self-test", action="store_true", help="check against the reference on synthetic data")
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(1 if self_test() else 0)
+    if args.store is None:
+        parser.error("give an analytics file or --self-test")
+
+    now_ms = None
+    if args.now is not None:
+        now_ms = _to_millis(args.now)
+        if now_ms is None:
+            parser.error(f"--now: cannot parse {args.now!r}")
+
+    started = time.monotonic()
+    engine = AnalyticsEngine.from_path(args.store)
+    print(f"[analytics] {engine.generations.size:,} generations, {engine.questions.size:,} questions "
+          f"loaded in {time.monotonic() - started:.2f}s ({'numpy' if np is not None else 'pure Python'})",
+          file=sys.stderr)
+
+    if args.question is not None:
+        result = engine.question(args.question)
+        if result is None:
+            print(f"[analytics] no question with id {args.question!r}", file=sys.stderr)
+            sys.exit(1)
+    elif args.report is not None:
+        result = engine.report(args.report, args.since, args.until, args.discipline)
+    else:
+        result = {
+            "summary": engine.summary(),
+            "tokens": engine.token_stats(),
+            "metrics": engine.metrics(args.range, now_ms, args.discipline),
+        }
+        if args.discipline is None:
+            start_ms = None
+            if args.range != "all":
+                start_ms = (now_ms or int(time.time() * 1000)) - TIME_RANGES[args.range] * MS_PER_DAY
+            result["by_discipline"] = engine.by_discipline(start_ms)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
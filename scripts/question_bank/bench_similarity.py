@@ -0,0 +1,209 @@
+"""
+bench_similarity.py
+
+Check the Python textSimilarity port against the shared JS fixture, then time
+the edit-distance kernels on realistic question pairs.
+
+Kernels compared:
+  naive      literal port of the JS code: full (len(a)+1) x (len(b)+1) matrix
+  two-row    levenshtein(), the reference port kept to two rows
+  myers      BitParallelPattern, masks rebuilt for every pair
+  batch      SimilarityQuery: one query's masks reused across all candidates
+  threshold  SimilarityQuery.matches() at 0.85, with length rejection and early exit
+
+Exits with status 1 if any fixture score differs from the JS value, so it can
+run as a check before the timings are trusted.
+
+Usage:
+    python bench_similarity.py
+    python bench_similarity.py --bank questions.json --queries 50 --candidates 500
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from question_io import load_questions
+from text_similarity import (
+    DUPLICATE_THRESHOLD,
+    LONG_TEXT_LENGTH,
+    BitParallelPattern,
+    SimilarityQuery,
+    levenshtein,
+    normalize,
+    text_similarity,
+    utf16_units,
+    word_jaccard,
+)
+
+# =========================
+# CONFIG
+# =========================
+FIXTURE_PATH = Path(__file__).resolve().parents[2] / "src" / "utils" / "textSimilarity.fixture.json"
+DEFAULT_QUERIES = 10
+DEFAULT_CANDIDATES = 100
+DEFAULT_SEED = 40
+
+
+def _code_units(text: str) -> List[int]:
+    data = text.encode("utf-16-le", "surrogatepass")
+    return [int.from_bytes(data[i:i + 2], "little") for i in range(0, len(data), 2)]
+
+
+def naive_text_similarity(str1, str2) -> float:
+    """
+    textSimilarity() transcribed line by line, matrix and all.
+    """
+    if not str1 or not str2:
+        return 0
+    # Code units as ints, independent of utf16_units()
+    a = _code_units(normalize(str(str1)))
+    b = _code_units(normalize(str(str2)))
+    if a == b:
+        return 1
+    if len(a) == 0 or len(b) == 0:
+        return 0
+    if len(a) > LONG_TEXT_LENGTH or len(b) > LONG_TEXT_LENGTH:
+        return word_jaccard(normalize(str(str1)), normalize(str(str2)))
+
+    matrix = [[None] * (len(a) + 1) for _ in range(len(b) + 1)]
+    for i in range(len(a) + 1):
+        matrix[0][i] = i
+    for j in range(len(b) + 1):
+        matrix[j][0] = j
+    for j in range(1, len(b) + 1):
+        for i in range(1, len(a) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            matrix[j][i] = min(
+                matrix[j][i - 1] + 1,
+                matrix[j - 1][i] + 1,
+                matrix[j - 1][i - 1] + cost,
+            )
+    return 1 - (matrix[len(b)][len(a)] / max(len(a), len(b)))
+
+
+def check_fixture(path: Path = FIXTURE_PATH) -> int:
+    """
+    Compare every implementation with the JS scores in the fixture.
+
+    Returns:
+        mismatches: number of (case, implementation) pairs that differ
+    """
+    with path.open("r", encoding="utf-8") as f:
+        cases = json.load(f)
+
+    implementations = {
+        "text_similarity": text_similarity,
+        "naive": naive_text_similarity,
+        "batch": lambda a, b: SimilarityQuery(a).similarities([b])[0],
+        "batch-reversed": lambda a, b: SimilarityQuery(b).similarities([a])[0],
+    }
+    mismatches = 0
+    for n, case in enumerate(cases):
+        expected = case["similarity"]
+        for name, fn in implementations.items():
+            got = fn(case["a"], case["b"])
+            if got != expected:
+                mismatches += 1
+                print(f"[bench] case {n} {name}: got {got!r}, JS gives {expected!r}", file=sys.stderr)
+        matched = SimilarityQuery(case["a"]).matches([case["b"]], DUPLICATE_THRESHOLD)
+        if bool(matched) != (expected >= DUPLICATE_THRESHOLD):
+            mismatches += 1
+            print(f"[bench] case {n} matches(): wrong duplicate decision", file=sys.stderr)
+    print(f"[bench] fixture: {len(cases)} cases, {mismatches} mismatches", file=sys.stderr)
+    return mismatches
+
+
+def _workload(texts: List[str], queries: int, candidates: int, seed: int) -> List[Tuple[str, List[str]]]:
+    """
+    Query/candidate groups of normalized texts under the Levenshtein cutoff.
+    """
+    rng = random.Random(seed)
+    pool = [normalize(t) for t in texts if t]
+    pool = [t for t in pool if t and len(utf16_units(t)) <= LONG_TEXT_LENGTH]
+    if not pool:
+        raise SystemExit("[bench] no usable question texts")
+    return [(rng.choice(pool), [rng.choice(pool) for _ in range(candidates)]) for _ in range(queries)]
+
+
+def _synthetic_texts(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    subjects = ["Nanite", "Lumen", "Niagara", "Blueprint", "Material", "Sequencer", "Chaos", "World Partition"]
+    verbs = ["configure", "profile", "debug", "optimize", "enable", "replicate"]
+    texts = []
+    for _ in range(count):
+        text = (f"In Unreal Engine 5, how do you {rng.choice(verbs)} {rng.choice(subjects)} "
+                f"when {rng.choice(subjects)} {rng.choice(verbs)}s {rng.randint(1, 500)} assets in a level?")
+        if rng.random() < 0.3:
+            words = text.split()
+            words[rng.randrange(len(words))] = rng.choice(subjects)
+            text = " ".join(words)
+        texts.append(text)
+    return texts
+
+
+def _time(label: str, fn: Callable[[], int], pairs: int) -> float:
+    start = time.perf_counter()
+    checksum = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<10} {elapsed:8.3f}s  {elapsed / pairs * 1e6:9.1f} us/pair  (checksum {checksum})")
+    return elapsed
+
+
+def run_benchmark(workload: List[Tuple[str, List[str]]], skip_naive: bool = False) -> None:
+    pairs = sum(len(c) for _, c in workload)
+    unit_groups = [(utf16_units(q), [utf16_units(c) for c in cands]) for q, cands in workload]
+    print(f"[bench] {len(workload)} queries x {len(workload[0][1])} candidates = {pairs:,} pairs")
+
+    def naive():
+        return sum(int(naive_text_similarity(q, c) * 1000) for q, cands in workload for c in cands)
+
+    def two_row():
+        return sum(levenshtein(q, c) for q, cands in unit_groups for c in cands)
+
+    def myers():
+        return sum(BitParallelPattern(q).distance(c) for q, cands in unit_groups for c in cands)
+
+    def batch():
+        total = 0
+        for q, cands in unit_groups:
+            pattern = BitParallelPattern(q)
+            total += sum(pattern.distance(c) for c in cands)
+        return total
+
+    def threshold():
+        return sum(len(SimilarityQuery(q).matches(cands, DUPLICATE_THRESHOLD)) for q, cands in workload)
+
+    if not skip_naive:
+        _time("naive", naive, pairs)
+    _time("two-row", two_row, pairs)
+    _time("myers", myers, pairs)
+    _time("batch", batch, pairs)
+    _time("threshold", threshold, pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify and benchmark textSimilarity kernels")
+    parser.add_argument("--bank", type=Path, help="question bank to sample from (default: synthetic questions)")
+    parser.add_argument("--fixture", type=Path, default=FIXTURE_PATH)
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--candidates", type=int, default=DEFAULT_CANDIDATES)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--skip-naive", action="store_true", help="leave out the (slow) full-matrix port")
+    args = parser.parse_args()
+
+    if check_fixture(args.fixture):
+        sys.exit(1)
+
+    if args.bank:
+        texts = [q.get("question") for q in load_questions(args.bank)]
+    else:
+        texts = _synthetic_texts(2000, args.seed)
+    run_benchmark(_workload(texts, args.queries, args.candidates, args.seed), args.skip_naive)
+
+
+if __name__ == "__main__":
+    main()
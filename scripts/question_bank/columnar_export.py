@@ -0,0 +1,402 @@
+"""
+columnar_export.py
+
+Export the question bank and the analytics store to Parquet (or Arrow IPC)
+files for dashboards and ad-hoc analysis.
+
+Tables written to --output-dir:
+  questions.parquet             the bank (question_io input), one row per question
+  generations.parquet           analytics `generations` (logGeneration in analyticsStore.js)
+  analytics_questions.parquet   analytics `questions` (logQuestion)
+
+Low-cardinality text columns (discipline, difficulty, type, status,
+language, ...) are dictionary-encoded: each row stores a small integer code
+into a per-column dictionary that only grows, so codes stay valid across
+row groups. Rows are converted and written ROW_GROUP_SIZE at a time, so
+memory is bounded by one row group regardless of bank size. Analytics
+timestamps become UTC timestamps; the tokensUsed object of a generation is
+split into input_tokens / output_tokens.
+
+Writing needs pyarrow (`pip install pyarrow`). Reading back is then a
+single call, e.g. pyarrow.parquet.read_table("questions.parquet",
+columns=["discipline", "status"]) or pandas.read_parquet(...).
+
+The analytics file is the `ue5_analytics` localStorage value saved as JSON
+(from the browser console: copy(localStorage.getItem("ue5_analytics"))).
+
+Usage:
+    python columnar_export.py question_bank.jsonl --output-dir columnar/
+    python columnar_export.py bank.json --analytics ue5_analytics.json --output-dir columnar/
+    python columnar_export.py bank.csv --format arrow --row-group-size 100000
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from csv_export import js_truthy, source_verified_label
+from question_io import iter_questions
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed to write files
+    pa = None
+    pq = None
+
+# =========================
+# CONFIG
+# =========================
+ROW_GROUP_SIZE = 65_536
+PARQUET_COMPRESSION = "zstd"
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Column kinds: category (dictionary-encoded string), string, int, float,
+# bool, timestamp (ISO 8601 string -> UTC, millisecond precision)
+KINDS = ("category", "string", "int", "float", "bool", "timestamp")
+SOURCE_VERIFIED_EXPORT_LABELS = {"Verified", "Unverified", "Assumed", "Missing", "Invalid", "Unknown"}
+
+
+class Column(NamedTuple):
+    name: str
+    kind: str
+    get: Callable[[Dict], Any]
+
+
+def _field(name: str) -> Callable[[Dict], Any]:
+    return lambda row: row.get(name)
+
+
+def _option(letter: str) -> Callable[[Dict], Any]:
+    def get(row: Dict) -> Any:
+        options = row.get("options")
+        return options.get(letter) if isinstance(options, dict) else None
+    return get
+
+
+def _tokens(key: str) -> Callable[[Dict], Any]:
+    def get(row: Dict) -> Any:
+        tokens = row.get("tokensUsed")
+        return tokens.get(key) if isinstance(tokens, dict) else None
+    return get
+
+
+def _source_verified(q: Dict) -> str:
+    value = q.get("sourceVerified")
+    # CSV exports already hold the label
+    if isinstance(value, str) and value in SOURCE_VERIFIED_EXPORT_LABELS:
+        return value
+    return source_verified_label(value)
+
+
+QUESTION_COLUMNS = (
+    Column("id", "string", _field("id")),
+    Column("unique_id", "string", _field("uniqueId")),
+    Column("discipline", "category", _field("discipline")),
+    Column("difficulty", "category", _field("difficulty")),
+    Column("type", "category", _field("type")),
+    Column("status", "category", lambda q: q.get("status") or "pending"),
+    Column("language", "category", lambda q: q.get("language") or "English"),
+    Column("question", "string", _field("question")),
+    Column("option_a", "string", _option("A")),
+    Column("option_b", "string", _option("B")),
+    Column("option_c", "string", _option("C")),
+    Column("option_d", "string", _option("D")),
+    Column("correct", "category", _field("correct")),
+    Column("source_url", "string", _field("sourceUrl")),
+    Column("source_verified", "category", _source_verified),
+    Column("human_verified", "bool", _field("humanVerified")),
+    Column("critique_score", "float", _field("critiqueScore")),
+    Column("token_cost", "float", _field("tokenCost")),
+    Column("creator", "category", lambda q: q.get("creatorName") or q.get("creator")),
+    Column("reviewer", "category", _field("reviewerName")),
+    Column("rejection_reason", "string", _field("rejectionReason")),
+    Column("created", "string", lambda q: q.get("created") or q.get("generationDate")),
+)
+
+GENERATION_COLUMNS = (
+    Column("id", "string", _field("id")),
+    Column("timestamp", "timestamp", _field("timestamp")),
+    Column("discipline", "category", _field("discipline")),
+    Column("difficulty", "category", _field("difficulty")),
+    Column("batch_size", "int", _field("batchSize")),
+    Column("input_tokens", "int", _tokens("input")),
+    Column("output_tokens", "int", _tokens("output")),
+    Column("duration_ms", "int", _field("duration")),
+    Column("questions_generated", "int", _field("questionsGenerated")),
+    Column("average_quality", "float", _field("averageQuality")),
+    Column("success", "bool", _field("success")),
+    Column("error_message", "string", _field("errorMessage")),
+    Column("model", "category", _field("model")),
+    Column("estimated_cost", "float", _field("estimatedCost")),
+)
+
+ANALYTICS_QUESTION_COLUMNS = (
+    Column("id", "string", _field("id")),
+    Column("generation_id", "string", _field("generationId")),
+    Column("created", "timestamp", _field("created")),
+    Column("status", "category", _field("status")),
+    Column("quality_score", "float", _field("qualityScore")),
+    Column("discipline", "category", _field("discipline")),
+    Column("difficulty", "category", _field("difficulty")),
+    Column("type", "category", _field("type")),
+    Column("critique_score", "float", _field("critiqueScore")),
+    Column("critique_text", "string", _field("critiqueText")),
+    Column("question_text", "string", _field("questionText")),
+    Column("was_rewritten", "bool", _field("wasRewritten")),
+    Column("deletion_reason", "category", _field("deletionReason")),
+    Column("deleted_at", "timestamp", _field("deletedAt")),
+)
+
+
+def _to_string(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+
+def _to_int(value: Any) -> Optional[int]:
+    if isinstance(value, bool) or value is None or value == "":
+        return None
+    try:
+        return int(float(value)) if isinstance(value, str) else int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_bool(value: Any) -> Optional[bool]:
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ("true", "yes", "1"):
+            return True
+        if lowered in ("false", "no", "0", ""):
+            return False
+        return None
+    return js_truthy(value)
+
+
+def _to_millis(value: Any) -> Optional[int]:
+    """
+    Milliseconds since the epoch (UTC) for an ISO 8601 string or epoch
+    milliseconds; None if it does not parse.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+CONVERTERS = {
+    "string": _to_string,
+    "int": _to_int,
+    "float": _to_float,
+    "bool": _to_bool,
+    "timestamp": _to_millis,
+}
+
+
+class ColumnBatcher:
+    """
+    Turns rows into column batches of at most `size` rows. Category columns
+    come out as codes into a dictionary shared by all batches (new values
+    are appended, so earlier codes never change).
+    """
+
+    def __init__(self, columns: Tuple[Column, ...], size: int = ROW_GROUP_SIZE):
+        for column in columns:
+            if column.kind not in KINDS:
+                raise ValueError(f"unknown column kind {column.kind!r} for {column.name}")
+        self.columns = columns
+        self.size = size
+        self.dictionaries: Dict[str, List[str]] = {c.name: [] for c in columns if c.kind == "category"}
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in self.dictionaries}
+        self.rows = 0
+
+    def _encode(self, name: str, value: Any) -> Optional[int]:
+        value = _to_string(value)
+        if value is None:
+            return None
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            self.dictionaries[name].append(value)
+        return code
+
+    def batches(self, rows: Iterable[Dict]) -> Iterator[Dict[str, List]]:
+        """
+        {column name: values} per batch; category values are codes.
+        """
+        getters = [(c.name, c.get, (lambda v, n=c.name: self._encode(n, v)) if c.kind == "category"
+                    else CONVERTERS[c.kind]) for c in self.columns]
+        batch: Dict[str, List] = {name: [] for name, _, _ in getters}
+        count = 0
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            for name, get, convert in getters:
+                batch[name].append(convert(get(row)))
+            count += 1
+            if count == self.size:
+                self.rows += count
+                yield batch
+                batch = {name: [] for name, _, _ in getters}
+                count = 0
+        if count or self.rows == 0:
+            self.rows += count
+            yield batch
+
+
+def arrow_schema(columns: Tuple[Column, ...]):
+    """
+    The pyarrow schema for a table; category columns are dictionary<int32, string>.
+    """
+    types = {
+        "category": pa.dictionary(pa.int32(), pa.string()),
+        "string": pa.string(),
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("ms", tz="UTC"),
+    }
+    return pa.schema([pa.field(c.name, types[c.kind]) for c in columns])
+
+
+def _record_batch(batcher: ColumnBatcher, batch: Dict[str, List], schema):
+    arrays = []
+    for column, field in zip(batcher.columns, schema):
+        values = batch[column.name]
+        if column.kind == "category":
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array(values, type=pa.int32()),
+                pa.array(batcher.dictionaries[column.name], type=pa.string()),
+            ))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_table(rows: Iterable[Dict], columns: Tuple[Column, ...], path: Path,
+                fmt: str = "parquet", row_group_size: int = ROW_GROUP_SIZE) -> Dict:
+    """
+    Write rows to one Parquet / Arrow IPC file, a row group at a time.
+
+    Returns:
+        {"path", "rows", "dictionaries": {column: distinct values}}
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to write columnar files (pip install pyarrow)")
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r}; use one of {sorted(FORMATS)}")
+    schema = arrow_schema(columns)
+    batcher = ColumnBatcher(columns, row_group_size)
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(str(path), schema, compression=PARQUET_COMPRESSION)
+
+        def write(batch):
+            writer.write_table(pa.Table.from_batches([batch]), row_group_size=row_group_size)
+    else:
+        # The dictionaries only grow, so later batches can be sent as deltas
+        options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        writer = pa.ipc.new_file(str(path), schema, options=options)
+        write = writer.write_batch
+    try:
+        for batch in batcher.batches(rows):
+            write(_record_batch(batcher, batch, schema))
+    finally:
+        writer.close()
+    return {
+        "path": str(path),
+        "rows": batcher.rows,
+        "dictionaries": {name: len(values) for name, values in batcher.dictionaries.items()},
+    }
+
+
+def load_analytics(path: Path) -> Dict:
+    """
+    The analytics store ({generations, questions, ...}) from a JSON file.
+    """
+    with Path(path).open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, str):
+        data = json.loads(data)   # the localStorage value copied as a JSON string
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected the ue5_analytics object")
+    return data
+
+
+def export_all(banks: List[Path], analytics: Optional[Path], output_dir: Path,
+               fmt: str = "parquet", row_group_size: int = ROW_GROUP_SIZE) -> List[Dict]:
+    """
+    Write every table that has a source.
+
+    Returns:
+        write_table results, one per file
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    suffix = FORMATS[fmt]
+    results = []
+    if banks:
+        questions = (q for path in banks for q in iter_questions(path))
+        results.append(write_table(questions, QUESTION_COLUMNS, output_dir / f"questions{suffix}", fmt, row_group_size))
+    if analytics is not None:
+        data = load_analytics(analytics)
+        results.append(write_table(data.get("generations") or [], GENERATION_COLUMNS,
+                                   output_dir / f"generations{suffix}", fmt, row_group_size))
+        results.append(write_table(data.get("questions") or [], ANALYTICS_QUESTION_COLUMNS,
+                                   output_dir / f"analytics_questions{suffix}", fmt, row_group_size))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the question bank and analytics to Parquet / Arrow")
+    parser.add_argument("banks", type=Path, nargs="*", help="question bank(s): .jsonl, .json or .csv")
+    parser.add_argument("--analytics", type=Path, default=None, help="ue5_analytics JSON (generations/questions)")
+    parser.add_argument("--output-dir", type=Path, default=Path("columnar"))
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args()
+
+    if not args.banks and args.analytics is None:
+        parser.error("give a question bank and/or --analytics")
+    if args.row_group_size < 1:
+        parser.error("--row-group-size must be positive")
+    if pa is None:
+        print("[columnar] pyarrow is not installed: pip install pyarrow", file=sys.stderr)
+        sys.exit(2)
+
+    started = time.monotonic()
+    results = export_all(args.banks, args.analytics, args.output_dir, args.format, args.row_group_size)
+    elapsed = time.monotonic() - started
+    for result in results:
+        dictionaries = ", ".join(f"{name}={n}" for name, n in result["dictionaries"].items())
+        print(f"  {result['rows']:>10,}  {result['path']}  ({dictionaries})")
+    print(f"[columnar] {len(results)} files written ({elapsed:.2f}s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+csv_export.py
+
+Streaming port of getCSVContent() from src/utils/exportUtils.js for banks
+too large to export from the browser.
+
+Output is byte-identical to the JS export: same header row, same column
+order and fallbacks, FIELD_DELIMITER (",") between cells and every cell run
+through safe() from stringHelpers.js (whitespace collapsed, line breaks and
+quotes removed, value wrapped in double quotes). Values are converted with
+JavaScript's String() rules, so numbers, booleans and arrays print the way
+they do in the app.
+
+Questions are read one at a time (question_io.iter_questions) and every row
+is written as soon as it is built, so memory does not grow with the bank.
+Output can be gzip-compressed (--gzip, or an output path ending in .gz); the
+gzip header carries no timestamp, so the same bank always gives the same
+bytes.
+
+src/utils/exportUtils.golden.json / exportUtils.golden.csv hold a shared
+input and the JS output for it; exportUtils.test.js and
+`python csv_export.py --check-golden` both compare against them.
+
+Usage:
+    python csv_export.py questions.jsonl --output question_bank.csv
+    python csv_export.py firestore_export.json --output bank.csv.gz --creator Sam --reviewer Alex
+    python csv_export.py bank.jsonl --no-headers --date 2025-01-15 > rows.csv
+    python csv_export.py --check-golden
+"""
+import argparse
+import gzip
+import io
+import json
+import math
+import re
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from question_io import JS_WHITESPACE, iter_questions
+
+# =========================
+# CONFIG
+# =========================
+REPO_ROOT = Path(__file__).resolve().parents[2]
+GOLDEN_INPUT = REPO_ROOT / "src" / "utils" / "exportUtils.golden.json"
+GOLDEN_OUTPUT = REPO_ROOT / "src" / "utils" / "exportUtils.golden.csv"
+FIELD_DELIMITER = ","          # src/utils/constants.js
+GOLDEN_DATE = "2025-01-15"
+GOLDEN_CREATOR = "Sam"
+GOLDEN_REVIEWER = "Alex"
+WRITE_BUFFER_ROWS = 1_000
+
+# Header row of getCSVContent, in column order
+CSV_HEADERS = (
+    "ID", "Question ID", "Discipline", "Type", "Difficulty", "Question",
+    "Option A", "Option B", "Option C", "Option D", "Correct Answer",
+    "Generation Date", "Source URL", "Source Excerpt",
+    "Source Verified", "Human Verified", "Human Verified At", "Human Verified By",
+    "Creator", "Reviewer", "Language", "Quality Score", "AI Critique",
+    "Token Cost", "Status", "Rejection Reason", "Rejected At",
+)
+
+SOURCE_VERIFIED_LABELS = {"unverified": "Unverified", "assumed": "Assumed", "missing": "Missing"}
+
+_JS_SPACE_RUN_RE = re.compile("[" + re.escape(JS_WHITESPACE) + "]{2,}")
+_INVISIBLE_RE = re.compile("[\u200b\ufeff\u00a0]")
+_LINE_BREAK_RE = re.compile(r"\r\n|\n|\r|\t")
+_QUOTES_RE = re.compile("['\"]")
+# Anything safe() would change; most cells have none of it
+_NEEDS_CLEANING_RE = re.compile(
+    "\\A[{ws}]|[{ws}]\\Z|[{ws}]{{2}}|[\u200b\ufeff\u00a0\r\n\t'\"]".format(ws=re.escape(JS_WHITESPACE))
+)
+
+
+def js_number(value: float) -> str:
+    """
+    Number.prototype.toString(): shortest round-trip digits, exponent form
+    only from 1e21 up or below 1e-6.
+    """
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "Infinity" if value > 0 else "-Infinity"
+    if value == 0:
+        return "0"
+    sign = "-" if value < 0 else ""
+    mantissa, _, exponent = repr(abs(value)).partition("e")
+    int_part, _, frac_part = mantissa.partition(".")
+    digits = (int_part + frac_part.rstrip("0")).lstrip("0")
+    # Decimal exponent n such that value = 0.digits * 10**n
+    n = len(int_part.lstrip("0")) if int_part.strip("0") else -(len(frac_part) - len(frac_part.lstrip("0")))
+    n += int(exponent or 0)
+    k = len(digits)
+    if k <= n <= 21:
+        return sign + digits + "0" * (n - k)
+    if 0 < n <= 21:
+        return sign + digits[:n] + "." + digits[n:]
+    if -6 < n <= 0:
+        return sign + "0." + "0" * -n + digits
+    e = n - 1
+    body = digits[0] + ("." + digits[1:] if k > 1 else "")
+    return f"{sign}{body}e{'+' if e >= 0 else '-'}{abs(e)}"
+
+
+def js_string(value: Any) -> str:
+    """
+    String(value) for values that come out of JSON.
+    """
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return str(value) if abs(value) < 2 ** 53 else js_number(float(value))
+    if isinstance(value, float):
+        return js_number(value)
+    if isinstance(value, list):
+        # Array.prototype.join: null and undefined become ""
+        return ",".join("" if v is None else js_string(v) for v in value)
+    return "[object Object]"
+
+
+def js_truthy(value: Any) -> bool:
+    """
+    JavaScript truthiness: empty lists and objects are truthy, NaN is not.
+    """
+    if value is None or value is False or value == "":
+        return False
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value == value and value != 0
+    return True
+
+
+def _or(*values: Any) -> Any:
+    """
+    `a || b || ...`: the first truthy value, else the last one.
+    """
+    for value in values[:-1]:
+        if js_truthy(value):
+            return value
+    return values[-1]
+
+
+def safe(value: Any) -> str:
+    """
+    safe() from stringHelpers.js: one quoted CSV cell.
+    """
+    if value is None:
+        return '""'
+    content = value if type(value) is str else js_string(value)
+    if not _NEEDS_CLEANING_RE.search(content):
+        return f'"{content}"'
+    content = content.strip(JS_WHITESPACE)
+    content = _INVISIBLE_RE.sub(" ", content)
+    content = _JS_SPACE_RUN_RE.sub(" ", content).strip(JS_WHITESPACE)
+    content = _LINE_BREAK_RE.sub(" ", content)
+    content = _QUOTES_RE.sub("", content)
+    return f'"{content}"'
+
+
+def source_verified_label(value: Any) -> str:
+    """
+    The "Source Verified" column for a question's sourceVerified value.
+    """
+    if value is True:
+        return "Verified"
+    if value is False:
+        return "Invalid"
+    if isinstance(value, str):
+        return SOURCE_VERIFIED_LABELS.get(value, "Unknown")
+    return "Unknown"
+
+
+def csv_row(row: Dict, index: int, creator_name: Any, reviewer_name: Any, generation_date: str) -> List[Any]:
+    """
+    The rowData array getCSVContent builds for the question at `index`.
+    """
+    source_url = row.get("sourceUrl")
+    cleaned_source_url = source_url if js_truthy(source_url) and "grounding-api" not in js_string(source_url) else ""
+    options = _or(row.get("options"), {})
+    if not isinstance(options, dict):
+        options = {}   # arrays and strings have no .A/.B/.C/.D
+    return [
+        str(index + 1),
+        row.get("uniqueId"),
+        row.get("discipline"),
+        row.get("type"),
+        row.get("difficulty"),
+        row.get("question"),
+        options.get("A"),
+        options.get("B"),
+        options.get("C"),
+        _or(options.get("D"), ""),
+        row.get("correct"),
+        generation_date,
+        cleaned_source_url,
+        row.get("sourceExcerpt"),
+        source_verified_label(row.get("sourceVerified")),
+        "Yes" if js_truthy(row.get("humanVerified")) else "No",
+        _or(row.get("humanVerifiedAt"), ""),
+        _or(row.get("humanVerifiedBy"), ""),
+        creator_name,
+        reviewer_name,
+        _or(row.get("language"), "English"),
+        _or(row.get("critiqueScore"), row.get("initialQuality"), ""),
+        _or(row.get("critique"), ""),
+        _or(row.get("tokenCost"), ""),
+        _or(row.get("status"), "pending"),
+        _or(row.get("rejectionReason"), ""),
+        _or(row.get("rejectedAt"), ""),
+    ]
+
+
+def iter_csv_lines(questions: Iterable[Dict], creator_name: Any, reviewer_name: Any,
+                   include_headers: bool = True, generation_date: Optional[str] = None) -> Iterator[str]:
+    """
+    getCSVContent one line at a time (each line ends with "\\n").
+
+    Args:
+        generation_date: YYYY-MM-DD for the "Generation Date" column
+            (default: today, like formatDate(new Date()))
+    """
+    if generation_date is None:
+        generation_date = date.today().isoformat()
+    if include_headers:
+        yield FIELD_DELIMITER.join(safe(h) for h in CSV_HEADERS) + "\n"
+    for i, row in enumerate(questions):
+        yield FIELD_DELIMITER.join(safe(v) for v in csv_row(row, i, creator_name, reviewer_name, generation_date)) + "\n"
+
+
+def export_csv(questions: Iterable[Dict], out: TextIO, creator_name: Any, reviewer_name: Any,
+               include_headers: bool = True, generation_date: Optional[str] = None) -> int:
+    """
+    Write the CSV export to a text stream, a batch of rows at a time.
+
+    Returns:
+        data rows written
+    """
+    rows = 0
+    batch = []
+    for line in iter_csv_lines(questions, creator_name, reviewer_name, include_headers, generation_date):
+        batch.append(line)
+        if len(batch) >= WRITE_BUFFER_ROWS:
+            out.write("".join(batch))
+            batch.clear()
+        rows += 1
+    out.write("".join(batch))
+    return rows - 1 if include_headers else rows
+
+
+@contextmanager
+def open_output(path: Optional[Path], compress: bool) -> Iterator[TextIO]:
+    """
+    Text stream for the export: a file or stdout, optionally gzip-compressed
+    with a fixed (zero) header timestamp.
+    """
+    with ExitStack() as stack:
+        binary = sys.stdout.buffer if path is None else stack.enter_context(Path(path).open("wb"))
+        if compress:
+            binary = stack.enter_context(gzip.GzipFile(filename="", mode="wb", fileobj=binary, mtime=0))
+        # newline="" keeps "\n" line endings on every platform, as in the JS export
+        out = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+        try:
+            yield out
+        finally:
+            out.flush()
+            out.detach()   # the binary stream is closed (or left open, for stdout) by the stack
+        if path is None:
+            sys.stdout.buffer.flush()
+
+
+def check_golden(input_path: Path = GOLDEN_INPUT, output_path: Path = GOLDEN_OUTPUT) -> int:
+    """
+    Export the golden input and compare with the JS output byte for byte.
+
+    Returns:
+        differing lines (1 if only the line count differs)
+    """
+    with Path(input_path).open("r", encoding="utf-8") as f:
+        questions = json.load(f)
+    got = "".join(iter_csv_lines(questions, GOLDEN_CREATOR, GOLDEN_REVIEWER, generation_date=GOLDEN_DATE))
+    expected = Path(output_path).read_bytes().decode("utf-8")
+    if got == expected:
+        print(f"[csv] golden: {len(questions)} questions, output identical", file=sys.stderr)
+        return 0
+    got_lines, expected_lines = got.split("\n"), expected.split("\n")
+    mismatches = 0
+    for n, (a, b) in enumerate(zip(got_lines, expected_lines)):
+        if a != b:
+            mismatches += 1
+            print(f"[csv] line {n + 1}:\n  got {a!r}\n  JS  {b!r}", file=sys.stderr)
+    mismatches = mismatches or 1
+    print(f"[csv] golden: {mismatches} differing lines ({len(got_lines)} vs {len(expected_lines)} lines)",
+          file=sys.stderr)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export question banks to the app's CSV format (getCSVContent)")
+    parser.add_argument("banks", type=Path, nargs="*",
+                        help="question bank(s): .jsonl, .json (incl. Firestore exports) or .csv")
+    parser.add_argument("--output", "-o", type=Path, default=None, help="output file (default: stdout)")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output (implied by a .gz output path)")
+    parser.add_argument("--creator", default="", help="Creator column value")
+    parser.add_argument("--reviewer", default="", help="Reviewer column value")
+    parser.add_argument("--date", default=None, help="Generation Date column, YYYY-MM-DD (default: today)")
+    parser.add_argument("--no-headers", action="store_true", help="leave out the header row")
+    parser.add_argument("--check-golden", action="store_true", help="compare with the JS golden file and exit")
+    args = parser.parse_args()
+
+    if args.check_golden:
+        sys.exit(1 if check_golden() else 0)
+    if not args.banks:
+        parser.error("give at least one question bank (or --check-golden)")
+    if args.date is not None:
+        try:
+            date.fromisoformat(args.date)
+        except ValueError:
+            parser.error(f"--date must be YYYY-MM-DD, got {args.date!r}")
+
+    compress = args.gzip or (args.output is not None and args.output.suffix == ".gz")
+    started = time.monotonic()
+    questions = (q for path in args.banks for q in iter_questions(path))
+    with open_output(args.output, compress) as out:
+        rows = export_csv(questions, out, args.creator, args.reviewer, not args.no_headers, args.date)
+    elapsed = time.monotonic() - started
+    target = args.output if args.output is not None else "stdout"
+    print(f"[csv] {rows:,} questions written to {target} ({elapsed:.2f}s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+fake_sheets_server.py
+
+Local stand-in for the Apps Script web app in scripts/google-apps/Code.gs,
+for testing and timing sheets_push.py without a Google account.
+
+Implements the chunked push protocol with the same rules as Code.gs:
+  POST ?action=chunk&pushId=P&index=N    body: base64(gzip(JSON {"questions": [...]}))
+  POST ?action=commit&pushId=P&total=T
+  GET  ?action=read                       {"status": "Success", "data": [Master rows]}
+
+Chunks are staged per push and acknowledged once per index (repeats come
+back with "duplicate": true); commit writes the staged questions, in chunk
+order, to in-memory Master_<Language> sheets using Code.gs's row layout. As
+with a deployed web app, every POST is answered with a 302 to an echo URL
+that returns the result.
+
+The server can inject latency, 500s before a request is processed, and
+"lost responses" (processed, then answered with a 500), so retries and
+idempotency can be exercised.
+
+Inspection endpoints:
+  GET /_state     {"masters": {...}, "staged": {...}, "committed": {...}, "stats": {...}}
+  POST /_reset    clear all sheets and pushes
+
+Usage:
+    python fake_sheets_server.py --port 8766 --latency 0.3 --error-rate 0.05 --lost-rate 0.05
+    python sheets_push.py bank.jsonl --url http://127.0.0.1:8766/exec
+"""
+import argparse
+import base64
+import gzip
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+# =========================
+# CONFIG
+# =========================
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+ECHO_PATH = "/macros/echo"
+
+# Code.gs HEADERS (Master sheet columns)
+HEADERS = [
+    "ID", "Unique ID", "Status", "Discipline", "Difficulty", "Question Type", "Question",
+    "Option A", "Option B", "Option C", "Option D", "Answer", "Explanation", "Language",
+    "SourceFile", "QualityScore", "AICritique", "TokenCost", "RejectionReason",
+    "HumanVerifiedBy", "RejectedAt", "LastUpdated",
+]
+PUSH_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _or(value, default):
+    return value if value not in (None, "", 0, False) else default
+
+
+def build_row(q: Dict, timestamp: str) -> List:
+    """
+    buildRow() in Code.gs.
+    """
+    row = [
+        q.get("ID"), q.get("uniqueId"), _or(q.get("Status"), "Approved"), q.get("Discipline"),
+        q.get("Difficulty"), q.get("Type"), q.get("Question"),
+        q.get("OptionA"), q.get("OptionB"), q.get("OptionC"), q.get("OptionD"), q.get("Answer"),
+        q.get("Explanation"), q.get("Language"), _or(q.get("SourceFile"), ""),
+        _or(q.get("QualityScore"), ""), _or(q.get("AICritique"), ""), _or(q.get("TokenCost"), ""),
+        _or(q.get("RejectionReason"), ""), _or(q.get("HumanVerifiedBy"), ""), _or(q.get("RejectedAt"), ""),
+        timestamp,
+    ]
+    return ["" if v is None else v for v in row]
+
+
+def decode_chunk(body: bytes) -> List[Dict]:
+    """
+    decodeChunk() in Code.gs: base64 -> gunzip -> JSON -> questions.
+    """
+    questions = json.loads(gzip.decompress(base64.b64decode(body.strip())).decode("utf-8"))["questions"]
+    if not isinstance(questions, list):
+        raise ValueError("questions must be an array")
+    return questions
+
+
+class FakeSheetsState:
+    """
+    Sheets, staged pushes and injected failures; one lock, like LockService.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, lost_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lost_rate = lost_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.masters: Dict[str, List[List]] = {}
+        self.staged: Dict[str, Dict[int, List[Dict]]] = {}
+        self.committed: Dict[str, Dict] = {}
+        self.echo: Dict[str, Dict] = {}
+        self.stats: Dict[str, int] = {}
+
+    def roll(self) -> str:
+        with self._lock:
+            r = self._rng.random()
+        if r < self.error_rate:
+            return "error"
+        if r < self.error_rate + self.lost_rate:
+            return "lost"
+        return "ok"
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.masters, self.staged, self.committed, self.echo, self.stats = {}, {}, {}, {}, {}
+
+    def chunk(self, push_id: str, index: int, body: bytes) -> Dict:
+        try:
+            questions = decode_chunk(body)
+        except Exception as e:  # anything Code.gs would catch
+            return {"status": "Error", "message": f"Bad chunk {index}: {e}"}
+        with self._lock:
+            if push_id in self.committed:
+                return {"status": "Success", "index": index, "duplicate": True, "committed": True}
+            staged = self.staged.setdefault(push_id, {})
+            if index in staged:
+                return {"status": "Success", "index": index, "duplicate": True}
+            staged[index] = questions
+        return {"status": "Success", "index": index, "rows": len(questions), "duplicate": False}
+
+    def commit(self, push_id: str, total: int) -> Dict:
+        with self._lock:
+            if push_id in self.committed:
+                return {"status": "Success", "duplicate": True, **self.committed[push_id]}
+            staged = self.staged.get(push_id, {})
+            missing = [i for i in range(total) if i not in staged]
+            if missing:
+                return {"status": "Incomplete", "missing": missing}
+            timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+            count = 0
+            for index in sorted(staged):
+                for q in staged[index]:
+                    self.masters.setdefault(q.get("Language") or "English", []).append(build_row(q, timestamp))
+                    count += 1
+            result = {"count": count, "fileId": uuid.uuid4().hex if count else None}
+            self.staged.pop(push_id, None)
+            self.committed[push_id] = result
+        return {"status": "Success", "duplicate": False, **result}
+
+    def read(self) -> Dict:
+        with self._lock:
+            data = [dict(zip(HEADERS, row)) for rows in self.masters.values() for row in rows]
+        return {"status": "Success", "data": data}
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    server_version = "FakeSheets/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> FakeSheetsState:
+        return self.server.state
+
+    def log_message(self, fmt, *args):  # keep test output quiet
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    # ----- helpers -----
+    def _send_json(self, code: int, payload) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _redirect_to_echo(self, result: Dict) -> None:
+        key = uuid.uuid4().hex
+        with self.state._lock:
+            self.state.echo[key] = result
+        self.send_response(302)
+        self.send_header("Location", f"{ECHO_PATH}?user_content_key={key}")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    # ----- routes -----
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        if parsed.path == ECHO_PATH:
+            with self.state._lock:
+                result = self.state.echo.pop(params.get("user_content_key", ""), None)
+            if result is None:
+                self._send_json(404, {"status": "Error", "message": "unknown echo key"})
+            else:
+                self._send_json(200, result)
+        elif parsed.path == "/_state":
+            with self.state._lock:
+                data = {
+                    "masters": self.state.masters,
+                    "staged": {p: sorted(chunks) for p, chunks in self.state.staged.items()},
+                    "committed": self.state.committed,
+                    "stats": self.state.stats,
+                }
+                self._send_json(200, data)
+        elif params.get("action") == "read":
+            self._send_json(200, self.state.read())
+        else:
+            self._send_json(200, {"status": "Error", "message": "Invalid action"})
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        body = self._read_body()
+        if parsed.path == "/_reset":
+            self.state.reset()
+            self._send_json(200, {"status": "reset"})
+            return
+
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        outcome = self.state.roll()
+        self.state.count(f"{params.get('action')}:{outcome}")
+        if outcome == "error":
+            self._send_json(500, {"status": "Error", "message": "injected failure"})
+            return
+
+        push_id = params.get("pushId", "")
+        action = params.get("action")
+        if action == "chunk" and PUSH_ID_RE.match(push_id) and params.get("index", "").isdigit():
+            result = self.state.chunk(push_id, int(params["index"]), body)
+        elif action == "commit" and PUSH_ID_RE.match(push_id) and params.get("total", "").isdigit():
+            result = self.state.commit(push_id, int(params["total"]))
+        elif action in ("chunk", "commit"):
+            result = {"status": "Error", "message": "pushId and index/total are required"}
+        else:
+            result = {"status": "Error", "message": "only the chunked push protocol is implemented"}
+
+        if outcome == "lost":
+            self._send_json(500, {"status": "Error", "message": "injected lost response"})
+            return
+        self._redirect_to_echo(result)
+
+
+def make_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, state: Optional[FakeSheetsState] = None,
+                verbose: bool = False) -> ThreadingHTTPServer:
+    """
+    Build (but do not start) a server; port 0 picks a free port.
+
+        server = make_server(port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/exec"
+    """
+    server = ThreadingHTTPServer((host, port), FakeSheetsHandler)
+    server.daemon_threads = True
+    server.state = state or FakeSheetsState()
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Code.gs web app (chunked push)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every POST")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500s before processing")
+    parser.add_argument("--lost-rate", type=float, default=0.0, help="fraction processed but answered with 500")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="log every HTTP request")
+    args = parser.parse_args()
+
+    state = FakeSheetsState(args.latency, args.error_rate, args.lost_rate, args.seed)
+    server = make_server(args.host, args.port, state, verbose=args.verbose)
+    host, port = server.server_address[:2]
+    print(f"Fake Sheets web app listening on http://{host}:{port}/exec", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
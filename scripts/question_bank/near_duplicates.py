@@ -0,0 +1,498 @@
+"""
+near_duplicates.py
+
+MinHash/LSH near-duplicate detection for the question bank.
+
+removeDuplicateQuestions / filterDuplicateQuestions (src/utils/questionHelpers.js)
+compare every question with every other one using textSimilarity, which
+does not scale to a bank of tens of thousands of questions. This tool finds
+the same duplicates in a fraction of the time:
+
+  1. normalize each question like textSimilarity and cut it into character
+     shingles, dropping shingles that occur in a large share of the bank
+     (boilerplate such as "which of the following ... in unreal engine 5"),
+     which would otherwise make most questions look alike
+  2. build a MinHash signature (one-permutation hashing with densification,
+     so each signature costs one hash per shingle)
+  3. bucket signatures with LSH banding, so only questions that share a
+     bucket become candidate pairs
+  4. verify candidates with the exact JS rule: textSimilarity >= 0.85,
+     after an exact q-gram filter (d edits can remove at most d * q of a
+     text's q-grams) that rejects most non-duplicates without running
+     Levenshtein
+
+Step 4 uses the real similarity, so every reported duplicate is one the JS
+code would also report. LSH can in principle miss a pair that the JS code
+would catch. The default bands are tuned so that pairs at the 0.85 boundary
+are found with very high probability, and --exhaustive runs the full JS
+comparison to check recall on your own data.
+
+The "first kept question wins" order of removeDuplicateQuestions is kept
+too: a question is a duplicate only if it matches a question that was kept
+before it.
+
+Usage:
+    python near_duplicates.py questions.csv
+    python near_duplicates.py questions.csv --report duplicates.json
+    python near_duplicates.py new_batch.json --against question_bank.csv
+    python near_duplicates.py --self-test
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from collections import Counter
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from question_io import load_questions
+from text_similarity import (
+    DUPLICATE_THRESHOLD,
+    LONG_TEXT_LENGTH,
+    SimilarityQuery,
+    normalize,
+    text_similarity,
+    utf16_units,
+)
+
+# =========================
+# CONFIG
+# =========================
+SHINGLE_SIZE = 4             # characters per shingle
+NUM_BINS = 128               # MinHash signature length (power of two)
+LSH_BANDS = 42               # bands * rows <= NUM_BINS; threshold ~ (1/bands)^(1/rows)
+LSH_ROWS = 3
+STOP_SHINGLE_DF = 0.05       # shingles in more than this share of questions are ignored
+STOP_SHINGLE_MIN_DOCS = 200  # ...but only once the bank is big enough to tell
+
+_BIN_BITS = NUM_BINS.bit_length() - 1
+_VALUE_BITS = 64 - _BIN_BITS
+_EMPTY = 1 << _VALUE_BITS
+
+
+def _probe_sequences(num_bins: int, length: int) -> List[Tuple[int, ...]]:
+    # Fixed seeds: signatures must be reproducible across runs and machines
+    sequences = []
+    for i in range(num_bins):
+        rng = random.Random(f"probe-{i}")
+        sequences.append(tuple(rng.randrange(num_bins) for _ in range(length)))
+    return sequences
+
+
+_PROBES = _probe_sequences(NUM_BINS, 4 * NUM_BINS)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """
+    Character shingles of an already-normalized text.
+    """
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def common_shingles(texts: Iterable[Optional[str]], max_df: float = STOP_SHINGLE_DF) -> FrozenSet[str]:
+    """
+    Shingles that appear in more than max_df of the texts (document frequency).
+    """
+    df = Counter()
+    n = 0
+    for text in texts:
+        n += 1
+        if text:
+            df.update(shingles(normalize(str(text))))
+    if n < STOP_SHINGLE_MIN_DOCS:
+        return frozenset()
+    cutoff = max_df * n
+    return frozenset(s for s, count in df.items() if count > cutoff)
+
+
+class MinHasher:
+    """
+    One-permutation MinHash: every shingle is hashed once, the hash picks a
+    bin and the minimum value per bin forms the signature. Empty bins copy
+    the value of a donor bin chosen by a fixed pseudo-random probe sequence
+    ("optimal densification"), so P[sig_a[i] == sig_b[i]] ~= Jaccard(a, b)
+    independently per bin, even for short texts with many empty bins.
+
+    Shingle hashes are cached, because char shingles repeat heavily across
+    a question bank.
+    """
+
+    def __init__(self):
+        self._cache: Dict[str, int] = {}
+
+    def _hash(self, shingle: str) -> int:
+        h = self._cache.get(shingle)
+        if h is None:
+            digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+            h = self._cache[shingle] = int.from_bytes(digest, "little")
+        return h
+
+    def signature(self, shingle_set: Iterable[str]) -> Optional[Tuple[int, ...]]:
+        bins = [_EMPTY] * NUM_BINS
+        mask = NUM_BINS - 1
+        for s in shingle_set:
+            h = self._hash(s)
+            b = h & mask
+            v = h >> _BIN_BITS
+            if v < bins[b]:
+                bins[b] = v
+        if all(v == _EMPTY for v in bins):
+            return None
+
+        signature = list(bins)
+        for i in range(NUM_BINS):
+            if bins[i] != _EMPTY:
+                continue
+            for donor in _PROBES[i]:
+                if bins[donor] != _EMPTY:
+                    signature[i] = bins[donor]
+                    break
+            else:  # probe sequence exhausted (nearly empty signature): scan
+                signature[i] = next(v for v in bins if v != _EMPTY)
+        return tuple(signature)
+
+
+def prepare_text(text: Optional[str], hasher: MinHasher, stop_shingles: FrozenSet[str] = frozenset()):
+    """
+    Returns:
+        (normalized, shingle_set, signature); signature is None for an empty text
+    """
+    normalized = normalize(str(text)) if text else ""
+    if not normalized:
+        return normalized, frozenset(), None
+    shingle_set = frozenset(shingles(normalized))
+    # A text made only of boilerplate keeps all its shingles
+    signature = hasher.signature((shingle_set - stop_shingles) or shingle_set)
+    return normalized, shingle_set, signature
+
+
+def band_keys(signature: Sequence[int], bands: int = LSH_BANDS, rows: int = LSH_ROWS) -> List[Tuple]:
+    """
+    LSH bucket keys of a signature: (band, values...) per band.
+    """
+    return [(band,) + tuple(signature[band * rows:(band + 1) * rows]) for band in range(bands)]
+
+
+def qgram_filter_passes(query: SimilarityQuery, query_shingles, other: str, other_units,
+                        other_shingles, threshold: float) -> bool:
+    """
+    False when the shingle sets alone prove textSimilarity(query, other) < threshold.
+    """
+    units = query.units
+    if (len(units) > LONG_TEXT_LENGTH or len(other_units) > LONG_TEXT_LENGTH
+            or len(query.normalized) <= SHINGLE_SIZE or len(other) <= SHINGLE_SIZE):
+        return True
+    # Every q-gram of one text that is missing from the other must have
+    # been touched by an edit, and one edit touches at most q of them
+    max_len = max(len(units), len(other_units))
+    budget = (int((1 - threshold) * max_len) + 1) * SHINGLE_SIZE
+    return (len(query_shingles - other_shingles) <= budget
+            and len(other_shingles - query_shingles) <= budget)
+
+
+class NearDuplicateIndex:
+    """
+    LSH index over question texts with exact textSimilarity verification.
+
+    Keys are whatever the caller uses to identify a question (row index, id).
+    """
+
+    def __init__(self, threshold: float = DUPLICATE_THRESHOLD,
+                 bands: int = LSH_BANDS, rows: int = LSH_ROWS,
+                 stop_shingles: FrozenSet[str] = frozenset()):
+        if bands * rows > NUM_BINS:
+            raise ValueError(f"bands * rows must be <= {NUM_BINS}")
+        self.threshold = threshold
+        self.stop_shingles = frozenset(stop_shingles)
+        self.bands = bands
+        self.rows = rows
+        self.hasher = MinHasher()
+        self._buckets: Dict[Tuple, List[int]] = {}
+        self._keys: List[Hashable] = []
+        self._texts: List[str] = []
+        self._units: List = []
+        self._shingles: List[FrozenSet[str]] = []
+        self.candidates_checked = 0
+        self.candidates_filtered = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _band_keys(self, signature: Sequence[int]) -> List[Tuple]:
+        return band_keys(signature, self.bands, self.rows)
+
+    def _prepare(self, text: Optional[str]):
+        return prepare_text(text, self.hasher, self.stop_shingles)
+
+    def add(self, key: Hashable, text: Optional[str]) -> None:
+        self._insert(key, *self._prepare(text))
+
+    def _insert(self, key: Hashable, normalized: str, shingle_set, signature) -> None:
+        slot = len(self._keys)
+        self._keys.append(key)
+        self._texts.append(normalized)
+        self._units.append(utf16_units(normalized))
+        self._shingles.append(shingle_set)
+        if signature is None:
+            return
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, []).append(slot)
+
+    def _verify(self, slot: int, query: SimilarityQuery, shingle_set) -> Optional[float]:
+        """
+        Exact textSimilarity check of one candidate, behind the q-gram filter.
+        """
+        other = self._texts[slot]
+        other_units = self._units[slot]
+        if not qgram_filter_passes(query, shingle_set, other, other_units,
+                                   self._shingles[slot], self.threshold):
+            self.candidates_filtered += 1
+            return None
+        self.candidates_checked += 1
+        return query.score_if_at_least(other, self.threshold, other_units)
+
+    def _candidates(self, signature) -> Iterable[int]:
+        slots = set()
+        for band_key in self._band_keys(signature):
+            slots.update(self._buckets.get(band_key, ()))
+        # Insertion order, so the reported match is the one .some() would hit first
+        return sorted(slots)
+
+    def _match(self, normalized: str, shingle_set, signature) -> Optional[Tuple[Hashable, float]]:
+        if signature is None:
+            return None  # empty text: textSimilarity returns 0
+        # One bit-parallel pattern for the query, shared by all its candidates
+        query = SimilarityQuery.from_normalized(normalized)
+        for slot in self._candidates(signature):
+            score = self._verify(slot, query, shingle_set)
+            if score is not None:
+                return self._keys[slot], score
+        return None
+
+    def find_duplicate(self, text: Optional[str]) -> Optional[Tuple[Hashable, float]]:
+        """
+        First indexed question that `text` duplicates, as (key, similarity).
+        """
+        return self._match(*self._prepare(text))
+
+    def add_if_unique(self, key: Hashable, text: Optional[str]) -> Optional[Tuple[Hashable, float]]:
+        """
+        Index `text` unless it duplicates an indexed question; returns the match if it does.
+        """
+        prepared = self._prepare(text)
+        match = self._match(*prepared)
+        if match is None:
+            self._insert(key, *prepared)
+        return match
+
+
+class ExhaustiveIndex(NearDuplicateIndex):
+    """
+    Same interface, but every indexed question is a candidate, like the JS
+    code. Used by --exhaustive to measure LSH recall.
+    """
+
+    def _candidates(self, signature) -> Iterable[int]:
+        return range(len(self._keys))
+
+
+def remove_duplicate_questions(questions: Sequence[Dict], threshold: float = DUPLICATE_THRESHOLD,
+                               index: Optional[NearDuplicateIndex] = None):
+    """
+    removeDuplicateQuestions: keep a question unless it matches one kept before it.
+
+    Returns:
+        (unique, removed): kept questions, and (row, kept_row, similarity) per removal
+    """
+    if index is None:
+        index = NearDuplicateIndex(
+            threshold, stop_shingles=common_shingles(q.get("question") for q in questions))
+    unique, removed = [], []
+    for row, q in enumerate(questions):
+        match = index.add_if_unique(row, q.get("question"))
+        if match is None:
+            unique.append(q)
+        else:
+            removed.append((row, match[0], match[1]))
+    return unique, removed
+
+
+def filter_duplicate_questions(new_items: Sequence[Dict], current_list: Sequence[Dict],
+                               other_list: Sequence[Dict] = (),
+                               threshold: float = DUPLICATE_THRESHOLD,
+                               index: Optional[NearDuplicateIndex] = None):
+    """
+    filterDuplicateQuestions: drop new items whose id already exists or whose
+    text matches any existing question. As in JS, new items are not compared
+    with each other.
+
+    Returns:
+        (unique_new, removed): kept items, and (new_row, existing_row or None, similarity) per removal;
+        existing rows index current_list + other_list
+    """
+    existing = list(current_list) + list(other_list)
+    existing_ids = {q.get("id") for q in existing}
+    if index is None:
+        index = NearDuplicateIndex(
+            threshold, stop_shingles=common_shingles(q.get("question") for q in existing))
+    for row, q in enumerate(existing):
+        index.add(row, q.get("question"))
+
+    unique_new, removed = [], []
+    for row, item in enumerate(new_items):
+        if item.get("id") in existing_ids:
+            removed.append((row, None, None))
+            continue
+        match = index.find_duplicate(item.get("question"))
+        if match is None:
+            unique_new.append(item)
+        else:
+            removed.append((row, match[0], match[1]))
+    return unique_new, removed
+
+
+def _describe(questions: Sequence[Dict], row: int) -> Dict:
+    q = questions[row]
+    return {"row": row, "id": q.get("id"), "question": q.get("question")}
+
+
+def build_report(removed, new_questions: Sequence[Dict], existing: Sequence[Dict],
+                 threshold: float, stats: Dict) -> Dict:
+    """
+    Group removals into clusters keyed by the question they duplicate.
+    """
+    clusters: Dict[int, Dict] = {}
+    id_collisions = []
+    for row, kept_row, score in removed:
+        if kept_row is None:
+            id_collisions.append(_describe(new_questions, row))
+            continue
+        cluster = clusters.get(kept_row)
+        if cluster is None:
+            cluster = clusters[kept_row] = {"keep": _describe(existing, kept_row), "duplicates": []}
+        cluster["duplicates"].append({**_describe(new_questions, row), "similarity": round(score, 4)})
+
+    return {
+        "threshold": threshold,
+        "questions": len(new_questions),
+        "duplicates": len(removed),
+        "clusters": sorted(clusters.values(), key=lambda c: -len(c["duplicates"])),
+        "id_collisions": id_collisions,
+        "stats": stats,
+    }
+
+
+# (original, variant) pairs the JS code treats as duplicates
+_SELF_TEST_PAIRS = [
+    ("What is Nanite used for in UE5?", "What is Nanite used for in UE5? \U0001F600"),
+    ("Which node samples a texture in a material?", "\U0001F3AE Which node samples a texture in a material?"),
+    ("Lumen supports Software ray tracing on most hardware",
+     "Lumen supports \U0001D4AEoftware ray tracing on most hardware"),
+    ("Which console command shows the frame rate?", "Which console command shows the frame rate? \U0001F600\U0001F3AE"),
+]
+
+
+def self_test() -> int:
+    """
+    Check that both index kinds flag the pairs above (text differing by astral
+    characters on one side only) and agree with text_similarity.
+
+    Returns:
+        failures
+    """
+    failures = 0
+    bank = [{"id": f"base-{n}", "question": a} for n, (a, _) in enumerate(_SELF_TEST_PAIRS)]
+    bank.append({"id": "control", "question": "How do you enable World Partition for an existing level?"})
+    for n, (a, b) in enumerate(_SELF_TEST_PAIRS):
+        expected = text_similarity(a, b)
+        if expected < DUPLICATE_THRESHOLD:
+            failures += 1
+            print(f"[dedup] pair {n}: text_similarity {expected!r} is below the threshold", file=sys.stderr)
+            continue
+        for index in (NearDuplicateIndex(), ExhaustiveIndex()):
+            index.add(n, a)
+            match = index.find_duplicate(b)
+            if match != (n, expected):
+                failures += 1
+                print(f"[dedup] pair {n} {type(index).__name__}: got {match!r}, expected {(n, expected)!r}",
+                      file=sys.stderr)
+
+    questions = bank + [{"id": f"copy-{n}", "question": b} for n, (_, b) in enumerate(_SELF_TEST_PAIRS)]
+    for index in (None, ExhaustiveIndex()):
+        kept, removed = remove_duplicate_questions(questions, index=index)
+        if [q["id"] for q in kept] != [q["id"] for q in bank]:
+            failures += 1
+            print(f"[dedup] remove_duplicate_questions kept {[q['id'] for q in kept]}", file=sys.stderr)
+    print(f"[dedup] self-test: {len(_SELF_TEST_PAIRS)} pairs, {failures} failures", file=sys.stderr)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate questions (MinHash/LSH)")
+    parser.add_argument("questions", type=Path, nargs="?",
+                        help="question bank (.csv export, .json or .jsonl)")
+    parser.add_argument("--against", type=Path, action="append", default=[],
+                        help="existing bank(s): only report questions that duplicate these "
+                             "(filterDuplicateQuestions semantics)")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD)
+    parser.add_argument("--report", type=Path, default=None, help="write the cluster report as JSON")
+    parser.add_argument("--exhaustive", action="store_true",
+                        help="compare against every question like the JS code (slow; checks LSH recall)")
+    parser.add_argument("--self-test", action="store_true",
+                        help="check that copies differing by an emoji are flagged, then exit")
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(1 if self_test() else 0)
+    if args.questions is None:
+        parser.error("the questions file is required")
+
+    questions = load_questions(args.questions)
+    existing = [q for path in args.against for q in load_questions(path)]
+
+    started = time.monotonic()
+    if args.exhaustive:
+        index = ExhaustiveIndex(args.threshold)
+    else:
+        bank = existing if args.against else questions
+        index = NearDuplicateIndex(
+            args.threshold, stop_shingles=common_shingles(q.get("question") for q in bank))
+
+    if args.against:
+        kept, removed = filter_duplicate_questions(
+            questions, existing, threshold=args.threshold, index=index)
+    else:
+        existing = questions
+        kept, removed = remove_duplicate_questions(questions, args.threshold, index=index)
+    elapsed = time.monotonic() - started
+
+    stats = {
+        "seconds": round(elapsed, 3),
+        "pairs_filtered": index.candidates_filtered,
+        "pairs_verified": index.candidates_checked,
+        "mode": "exhaustive" if args.exhaustive else f"lsh {index.bands}x{index.rows}",
+    }
+    report = build_report(removed, questions, existing, args.threshold, stats)
+    print(
+        f"[dedup] {len(questions):,} questions -> {len(kept):,} kept, {len(removed):,} duplicates "
+        f"in {len(report['clusters']):,} clusters ({index.candidates_checked:,} pairs verified, "
+        f"{elapsed:.2f}s)",
+        file=sys.stderr,
+    )
+
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"[dedup] report written to {args.report}", file=sys.stderr)
+    else:
+        for cluster in report["clusters"][:20]:
+            print(f"KEEP #{cluster['keep']['row']}: {cluster['keep']['question']}")
+            for dup in cluster["duplicates"]:
+                print(f"   {dup['similarity']:.3f} #{dup['row']}: {dup['question']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+question_io.py
+
+Load question banks for the offline question-bank tools.
+
+Accepted inputs:
+  - .csv    the app's CSV export (getCSVContent in src/utils/exportUtils.js)
+  - .json   a list of questions, or {"questions": [...]} (backup / Apps Script payload),
+            or a Firestore collection export ({"questions": {docId: {...}}})
+  - .jsonl  one question object (or Firestore {"id", "data"} document) per line
+
+Questions come back as dicts with the app's field names (id, uniqueId,
+discipline, question, options {A..D}, correct, ...), so JS and Python code
+talk about the same fields. Note that the CSV export strips quotes and tags
+from every cell, so similarity scores on a CSV can differ slightly from
+scores on the app's raw text.
+"""
+import csv
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+# CSV header (exportUtils.js) -> question field
+CSV_FIELDS = {
+    "ID": "row",
+    "Question ID": "uniqueId",
+    "Discipline": "discipline",
+    "Type": "type",
+    "Difficulty": "difficulty",
+    "Question": "question",
+    "Correct Answer": "correct",
+    "Generation Date": "generationDate",
+    "Source URL": "sourceUrl",
+    "Source Excerpt": "sourceExcerpt",
+    "Source Verified": "sourceVerified",
+    "Human Verified": "humanVerified",
+    "Human Verified At": "humanVerifiedAt",
+    "Human Verified By": "humanVerifiedBy",
+    "Creator": "creatorName",
+    "Reviewer": "reviewerName",
+    "Language": "language",
+    "Quality Score": "critiqueScore",
+    "AI Critique": "critique",
+    "Token Cost": "tokenCost",
+    "Status": "status",
+    "Rejection Reason": "rejectionReason",
+    "Rejected At": "rejectedAt",
+    "Explanation": "explanation",   # not in getCSVContent, but present in some sheet exports
+}
+CSV_OPTION_COLUMNS = {"Option A": "A", "Option B": "B", "Option C": "C", "Option D": "D"}
+
+# JavaScript's \s and String.prototype.trim() set: WhiteSpace + LineTerminator
+# (Python's \s and str.strip() differ on U+FEFF and U+001C-U+001F)
+JS_WHITESPACE = (
+    "\t\n\v\f\r \u00a0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006"
+    "\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+)
+
+
+def _from_csv_row(row: Dict[str, str]) -> Dict:
+    question = {"options": {}}
+    for header, value in row.items():
+        if header is None:
+            continue
+        header = header.strip()
+        if header in CSV_OPTION_COLUMNS:
+            question["options"][CSV_OPTION_COLUMNS[header]] = value
+        elif header in CSV_FIELDS:
+            question[CSV_FIELDS[header]] = value
+    question["id"] = question.get("uniqueId") or question.get("row")
+    return question
+
+
+def _unwrap_document(doc, doc_id=None) -> Dict:
+    """
+    A Firestore export document -> question. Accepts {"id", "data": {...}}
+    wrappers and bare field maps keyed by document id; subcollections
+    ("__collections__") are dropped.
+    """
+    if isinstance(doc, dict) and isinstance(doc.get("data"), dict) and set(doc) <= {"id", "data", "path", "name"}:
+        doc_id = doc.get("id", doc_id)
+        doc = doc["data"]
+    if not isinstance(doc, dict):
+        return doc
+    question = {k: v for k, v in doc.items() if k != "__collections__"}
+    if doc_id is not None:
+        question.setdefault("id", doc_id)
+    return question
+
+
+_NUMBER_CONTINUATION = frozenset("0123456789.eE+-")
+_SEPARATORS_RE = re.compile(r"[\s,]*")
+
+
+class _JsonStream:
+    """
+    Incremental JSON reader over a text stream: values are decoded one at a
+    time from a sliding buffer, so only the current value is held in memory.
+    """
+
+    def __init__(self, f, chunk_size: int = 1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _read(self) -> None:
+        more = self.f.read(self.chunk_size)
+        self.eof = not more
+        self.buffer = self.buffer[self.pos:] + more
+        self.pos = 0
+
+    def peek(self) -> str:
+        """
+        Skip whitespace (and stray commas); the next character, or "" at the end.
+        """
+        while True:
+            self.pos = _SEPARATORS_RE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self._read()
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} in JSON input")
+        self.pos += 1
+
+    def value(self):
+        if not self.peek():
+            raise ValueError("unexpected end of JSON input")
+        return self._decode()
+
+    def _decode(self):
+        # the next value starts at self.pos (after peek)
+        while True:
+            try:
+                item, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                # Value split across chunks: read more and retry
+                self._read()
+                continue
+            if not self.eof and (end == len(self.buffer) or self.buffer[end] in _NUMBER_CONTINUATION):
+                # A number (or literal) may continue in the next chunk ("2" + ".5e3")
+                self._read()
+                continue
+            self.pos = end
+            return item
+
+    def items(self) -> Iterator:
+        """
+        The rest of an array whose "[" has been consumed, through its "]".
+        """
+        while True:
+            char = self.peek()
+            if char == "]":
+                self.pos += 1
+                return
+            if not char:
+                raise ValueError("unterminated JSON array")
+            yield self._decode()
+
+
+def _iter_json_array(f, chunk_size: int = 1 << 16) -> Iterator:
+    """
+    Items of a top-level JSON array, decoded one at a time from a text stream.
+    """
+    stream = _JsonStream(f, chunk_size)
+    if stream.peek() != "[":
+        raise ValueError("not a JSON array")
+    stream.expect("[")
+    yield from stream.items()
+
+
+def _iter_json_member(f, key: str, chunk_size: int = 1 << 16) -> Iterator:
+    """
+    Items of the array stored under `key` in a top-level JSON object, decoded
+    one at a time. Other members are skipped (arrays item by item), so the
+    whole object is never in memory.
+    """
+    stream = _JsonStream(f, chunk_size)
+    stream.expect("{")
+    while stream.peek() != "}":
+        name = stream.value()
+        stream.expect(":")
+        is_array = stream.peek() == "["
+        if name == key and not is_array:
+            raise ValueError(f"{key!r} is not a JSON array")
+        if not is_array:
+            stream.value()
+            continue
+        stream.expect("[")
+        if name == key:
+            yield from stream.items()
+            return
+        for _ in stream.items():
+            pass
+
+
+def iter_questions(path: Path) -> Iterator[Dict]:
+    """
+    Stream questions one at a time. CSV, JSONL and .json files holding a
+    top-level array are read incrementally; other JSON documents
+    ({"questions": [...]}, Firestore collection exports) are loaded whole.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix == ".csv":
+        with path.open("r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                yield _from_csv_row(row)
+        return
+
+    if suffix == ".jsonl":
+        with path.open("r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield _unwrap_document(json.loads(line))
+                except json.JSONDecodeError as e:
+                    print(f"[questions] skipping line {line_no}: {e}", file=sys.stderr)
+        return
+
+    with path.open("r", encoding="utf-8") as f:
+        if f.read(1 << 10).lstrip().startswith("["):
+            f.seek(0)
+            for item in _iter_json_array(f):
+                yield _unwrap_document(item)
+            return
+        f.seek(0)
+        data = json.load(f)
+    if isinstance(data, dict):
+        # {"questions": [...]}, {"questions": {docId: {...}}} or
+        # {"__collections__": {"questions": {docId: {...}}}}
+        data = data.get("__collections__", data).get("questions", [])
+    if isinstance(data, dict):
+        for doc_id, doc in data.items():
+            yield _unwrap_document(doc, doc_id)
+    else:
+        for doc in data:
+            yield _unwrap_document(doc)
+
+
+def load_questions(path: Path) -> List[Dict]:
+    """
+    Read a question bank from CSV, JSON or JSONL (chosen by extension).
+    """
+    return list(iter_questions(path))
@@ -0,0 +1,388 @@
+"""
+scorm_builder.py
+
+Build SCORM 1.2 packages from question banks without the browser, one
+package for the whole bank or one per discipline.
+
+Packages have the layout generateScormPackageFiles() in
+src/services/scormExporter.js produces: the templates from
+public/scorm-template/ (manifest and index.html titled for the package) plus
+a generated questions.js holding window.QUIZ_CONFIG and window.QUESTIONS in
+convertQuestionToScormFormat's shape, printed like JSON.stringify(.., null, 2).
+Differences from the browser export:
+
+  - questions are read one at a time and spooled to disk per package, then
+    written into the questions.js zip entry as they are serialized, so the
+    payload is never held in memory as one string
+  - entries are DEFLATE-compressed (JSZip stores them uncompressed)
+  - packages are built in parallel worker processes; only spool paths and
+    the package config cross the process boundary
+  - titles are escaped for the manifest XML and index.html
+
+Questions may be in the app's shape (question, options {A..D}, correct,
+uniqueId) or the SCORM exporter's (questionText, choices, correctAnswer,
+guid). Questions that fail validateQuestionsForExport's checks are skipped
+and counted.
+
+Usage:
+    python scorm_builder.py question_bank.jsonl --output-dir scorm/
+    python scorm_builder.py bank.json --per-discipline --output-dir scorm/ --passing-score 70
+    python scorm_builder.py bank.csv --title "Lighting Check" --time-limit 20 --workers 4
+"""
+import argparse
+import html
+import json
+import os
+import random
+import re
+import string
+import sys
+import tempfile
+import time
+import zipfile
+from collections import Counter
+from datetime import datetime, timezone
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+from xml.sax.saxutils import escape as xml_escape
+
+from question_io import iter_questions
+
+# =========================
+# CONFIG
+# =========================
+REPO_ROOT = Path(__file__).resolve().parents[2]
+TEMPLATE_DIR = REPO_ROOT / "public" / "scorm-template"
+TEMPLATE_FILES = ("scorm.js", "index.html", "style.css", "game.js", "imsmanifest.xml")
+TEMPLATE_TITLE = "UE5 Scenario Tracker"
+TEMPLATE_IDENTIFIER = "com.example.ue5scenario.scorm12"
+DEFAULT_TITLE = "UE5 Knowledge Assessment"
+DEFAULT_DESCRIPTION = "Test your Unreal Engine 5 knowledge"
+DEFAULT_PASSING_SCORE = 80
+DEFAULT_TIME_LIMIT = 30        # minutes
+DEFAULT_DIFFICULTY = "Medium"
+WRITE_BATCH = 500              # questions serialized per write to the zip entry
+COMPRESS_LEVEL = 6
+
+
+class PackageConfig(NamedTuple):
+    title: str = DEFAULT_TITLE
+    description: str = DEFAULT_DESCRIPTION
+    passing_score: int = DEFAULT_PASSING_SCORE
+    time_limit: int = DEFAULT_TIME_LIMIT
+
+
+class PackageJob(NamedTuple):
+    """
+    One package for a worker: its questions are in `spool` (one compact
+    SCORM question per line).
+    """
+    path: Path
+    spool: Path
+    count: int
+    config: PackageConfig
+    identifier: str
+    generated: str
+
+
+def _random_id() -> str:
+    """
+    `q-${Date.now()}-${Math.random().toString(36).substr(2, 9)}`
+    """
+    suffix = "".join(random.choices(string.ascii_lowercase + string.digits, k=9))
+    return f"q-{int(time.time() * 1000)}-{suffix}"
+
+
+def firestore_fields(q: Dict) -> Dict:
+    """
+    The exporter's input fields (questionText, type, choices, correctAnswer,
+    guid, difficulty) for a question in either shape.
+    """
+    if "questionText" in q or "choices" in q:
+        return q
+    options = q.get("options") or {}
+    if isinstance(options, dict):
+        letters = [k for k in "ABCD" if options.get(k)]
+        choices = [options[k] for k in letters]
+        correct = q.get("correct")
+        correct_answer = options.get(correct) if isinstance(correct, str) and correct in letters else None
+    else:
+        choices, correct_answer = [], None
+    fields = {
+        "questionText": q.get("question"),
+        "choices": choices,
+        "correctAnswer": correct_answer,
+        "guid": q.get("uniqueId") or q.get("id"),
+        "difficulty": q.get("difficulty"),
+    }
+    if "type" in q:
+        fields["type"] = q["type"]
+    return fields
+
+
+def validation_errors(fields: Dict) -> List[str]:
+    """
+    validateQuestionsForExport's per-question checks.
+    """
+    errors = []
+    text = fields.get("questionText")
+    if not text or not str(text).strip():
+        errors.append("Missing question text")
+    choices = fields.get("choices")
+    if not choices or len(choices) < 2:
+        errors.append("Must have at least 2 choices")
+    if not fields.get("correctAnswer"):
+        errors.append("Missing correct answer")
+    if choices and fields.get("correctAnswer") not in choices:
+        errors.append("Correct answer not found in choices")
+    return errors
+
+
+def scorm_question(fields: Dict) -> Dict:
+    """
+    convertQuestionToScormFormat(). Keys JSON.stringify would drop
+    (undefined values) are left out.
+    """
+    correct_answer = fields.get("correctAnswer")
+    question = {"id": fields.get("guid") or _random_id()}
+    if "questionText" in fields:
+        question["text"] = fields["questionText"]
+    if "type" in fields:
+        question["type"] = fields["type"]
+    question["difficulty"] = fields.get("difficulty") or DEFAULT_DIFFICULTY
+    question["choices"] = [{"text": c, "correct": c == correct_answer} for c in fields.get("choices") or []]
+    return question
+
+
+def _sanitize(text: str) -> str:
+    return re.sub(r"[^a-z0-9]", "_", text, flags=re.I).lower()
+
+
+def package_filename(title: str, generated: str, counter: int = 1) -> str:
+    """
+    `${sanitizedTitle}_${timestamp}_scorm12.zip`, as exportToScorm names it.
+    A counter > 1 is appended to the title when another package in the same
+    run sanitizes to the same name.
+    """
+    suffix = f"_{counter}" if counter > 1 else ""
+    return f"{_sanitize(title)}{suffix}_{generated[:10]}_scorm12.zip"
+
+
+def load_templates(template_dir: Path = TEMPLATE_DIR) -> Dict[str, str]:
+    """
+    The SCORM template files, by name.
+    """
+    templates = {}
+    for name in TEMPLATE_FILES:
+        path = Path(template_dir) / name
+        if not path.exists():
+            raise FileNotFoundError(f"SCORM template missing: {path}")
+        templates[name] = path.read_text(encoding="utf-8")
+    return templates
+
+
+def quiz_config_js(config: PackageConfig, count: int, generated: str) -> str:
+    """
+    The questions.js header up to `window.QUESTIONS = `.
+    """
+    return (
+        "// Generated questions for SCORM package\n"
+        f"// Generated: {generated}\n"
+        "\n"
+        "window.QUIZ_CONFIG = {\n"
+        f"  title: {json.dumps(config.title, ensure_ascii=False)},\n"
+        f"  description: {json.dumps(config.description, ensure_ascii=False)},\n"
+        f"  passingScore: {config.passing_score},\n"
+        f"  timeLimit: {config.time_limit * 60}, // Convert minutes to seconds\n"
+        f"  totalQuestions: {count}\n"
+        "};\n"
+        "\n"
+        "window.QUESTIONS = "
+    )
+
+
+def _pretty_element(question: Dict) -> str:
+    # JSON.stringify(.., null, 2) of an array element: one level deeper
+    return "  " + json.dumps(question, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+
+
+def _spooled_questions(spool: Path) -> Iterator[Dict]:
+    with spool.open("r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def write_questions_js(out, questions: Iterable[Dict], count: int, config: PackageConfig, generated: str) -> None:
+    """
+    Stream questions.js to a binary stream, WRITE_BATCH questions at a time.
+    """
+    out.write(quiz_config_js(config, count, generated).encode("utf-8"))
+    if count == 0:
+        out.write(b"[];\n")
+        return
+    out.write(b"[\n")
+    batch = []
+    written = 0
+    for question in questions:
+        batch.append(_pretty_element(question))
+        written += 1
+        if len(batch) >= WRITE_BATCH:
+            out.write((",\n".join(batch) + (",\n" if written < count else "")).encode("utf-8"))
+            batch.clear()
+    if batch:
+        out.write(",\n".join(batch).encode("utf-8"))
+    out.write(b"\n];\n")
+
+
+def build_package(job: PackageJob, templates: Optional[Dict[str, str]] = None) -> Tuple[Path, int]:
+    """
+    Write one SCORM zip.
+
+    Returns:
+        (zip path, questions)
+    """
+    templates = templates or load_templates()
+    manifest = (templates["imsmanifest.xml"]
+                .replace(TEMPLATE_TITLE, xml_escape(job.config.title))
+                .replace(TEMPLATE_IDENTIFIER, job.identifier))
+    index_html = templates["index.html"].replace(TEMPLATE_TITLE, html.escape(job.config.title, quote=False))
+    files = {
+        "scorm.js": templates["scorm.js"],
+        "index.html": index_html,
+        "style.css": templates["style.css"],
+        "game.js": templates["game.js"],
+    }
+    with zipfile.ZipFile(job.path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as zf:
+        for name, content in files.items():
+            zf.writestr(name, content)
+        info = zipfile.ZipInfo("questions.js", date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with zf.open(info, "w", force_zip64=True) as entry:
+            write_questions_js(entry, _spooled_questions(job.spool), job.count, job.config, job.generated)
+        zf.writestr("imsmanifest.xml", manifest)
+    return job.path, job.count
+
+
+_TEMPLATES: Optional[Dict[str, str]] = None
+
+
+def _worker_templates() -> Dict[str, str]:
+    global _TEMPLATES
+    if _TEMPLATES is None:
+        _TEMPLATES = load_templates()
+    return _TEMPLATES
+
+
+def _build_in_worker(job: PackageJob) -> Tuple[Path, int]:
+    return build_package(job, _worker_templates())
+
+
+def build_packages(questions: Iterable[Dict], output_dir: Path, config: PackageConfig = PackageConfig(),
+                   per_discipline: bool = False, workers: Optional[int] = None,
+                   spool_dir: Optional[Path] = None) -> Dict:
+    """
+    Spool valid questions per package, then build the packages.
+
+    Args:
+        per_discipline: one package per discipline, titled
+            "<title> - <discipline>"
+        workers: processes; default is all cores when there is more than
+            one package
+
+    Returns:
+        {"packages": [{"path", "questions"}], "skipped": {error: count}}
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    load_templates()   # fail before reading the bank if a template is missing
+    generated_at = datetime.now(timezone.utc)
+    generated = generated_at.strftime("%Y-%m-%dT%H:%M:%S.") + f"{generated_at.microsecond // 1000:03d}Z"
+    stamp = int(generated_at.timestamp() * 1000)
+
+    skipped: Counter = Counter()
+    with tempfile.TemporaryDirectory(prefix="scorm-", dir=spool_dir) as tmp:
+        spools: Dict[str, Tuple[Path, object]] = {}
+        counts: Counter = Counter()
+        try:
+            for q in questions:
+                fields = firestore_fields(q)
+                errors = validation_errors(fields)
+                if errors:
+                    skipped[errors[0]] += 1
+                    continue
+                key = (q.get("discipline") or "Unknown") if per_discipline else ""
+                if key not in spools:
+                    path = Path(tmp) / f"{len(spools)}.jsonl"
+                    spools[key] = (path, path.open("w", encoding="utf-8"))
+                spools[key][1].write(json.dumps(scorm_question(fields), ensure_ascii=False) + "\n")
+                counts[key] += 1
+        finally:
+            for _, f in spools.values():
+                f.close()
+
+        jobs = []
+        slugs: Set[str] = set()
+        for key, (spool, _) in spools.items():
+            title = f"{config.title} - {key}" if key else config.title
+            # "Lighting & Rendering" and "Lighting / Rendering" sanitize alike;
+            # number the later one so neither zip nor manifest id is shared
+            base = slug = _sanitize(key)
+            counter = 1
+            while slug in slugs:
+                counter += 1
+                slug = f"{base}_{counter}"
+            slugs.add(slug)
+            jobs.append(PackageJob(
+                path=output_dir / package_filename(title, generated, counter),
+                spool=spool,
+                count=counts[key],
+                config=config._replace(title=title),
+                identifier=f"com.ue5questiongen.{stamp}" + (f".{slug}" if key else ""),
+                generated=generated,
+            ))
+
+        if workers is None:
+            workers = min(len(jobs), os.cpu_count() or 1)
+        if workers <= 1 or len(jobs) <= 1:
+            templates = load_templates()
+            built = [build_package(job, templates) for job in jobs]
+        else:
+            with Pool(workers) as pool:
+                built = list(pool.imap_unordered(_build_in_worker, jobs))
+
+    built.sort()
+    return {
+        "packages": [{"path": str(path), "questions": count} for path, count in built],
+        "skipped": dict(skipped),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build SCORM 1.2 packages from question banks (scormExporter.js layout)")
+    parser.add_argument("banks", type=Path, nargs="+", help="question bank(s): .jsonl, .json or .csv")
+    parser.add_argument("--output-dir", type=Path, default=Path("scorm_packages"))
+    parser.add_argument("--per-discipline", action="store_true", help="one package per discipline")
+    parser.add_argument("--title", default=DEFAULT_TITLE)
+    parser.add_argument("--description", default=DEFAULT_DESCRIPTION)
+    parser.add_argument("--passing-score", type=int, default=DEFAULT_PASSING_SCORE)
+    parser.add_argument("--time-limit", type=int, default=DEFAULT_TIME_LIMIT, help="minutes")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    args = parser.parse_args()
+
+    config = PackageConfig(args.title, args.description, args.passing_score, args.time_limit)
+    started = time.monotonic()
+    questions = (q for path in args.banks for q in iter_questions(path))
+    result = build_packages(questions, args.output_dir, config, args.per_discipline, args.workers)
+    elapsed = time.monotonic() - started
+
+    total = sum(p["questions"] for p in result["packages"])
+    print(f"[scorm] {len(result['packages'])} packages, {total:,} questions ({elapsed:.2f}s)", file=sys.stderr)
+    for package in result["packages"]:
+        print(f"  {package['questions']:>8,}  {package['path']}")
+    for error, count in sorted(result["skipped"].items(), key=lambda kv: -kv[1]):
+        print(f"[scorm] skipped {count:,} questions: {error}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+"""
+sheets_push.py
+
+Push a whole question bank to the Google Sheets Apps Script web app
+(scripts/google-apps/Code.gs) in chunks.
+
+The app's "Export to Sheets" button (saveQuestionsToSheets in
+src/services/googleSheets.js) posts every question in one form field, which
+large banks push past Apps Script's request size and execution time limits.
+This tool sends the same payload rows through Code.gs's chunked protocol:
+
+  - rows are grouped into chunks of at most --chunk-bytes of JSON, each
+    gzip-compressed and base64-encoded (POST ?action=chunk&pushId=P&index=N)
+  - up to --workers chunks are in flight at once; 429/5xx, "Busy" and
+    network errors are retried with exponential backoff and full jitter
+  - pushId + chunk index is the idempotency key: Code.gs stages each index
+    once, so retried or repeated chunks are never written twice
+  - once every chunk is acknowledged, POST ?action=commit&pushId=P&total=T
+    saves the staged rows in chunk order (Master_ sheets + export file)
+
+Rows are read and sent as a stream; memory is bounded by the chunks in
+flight. If a push fails part-way, run it again with the printed --push-id:
+chunks the web app already holds are acknowledged as duplicates and only the
+rest are sent (chunking is deterministic for the same input and options).
+
+fake_sheets_server.py is a local stand-in for the web app;
+`python sheets_push.py --self-test` pushes through it with injected
+failures and checks that the Master rows come out exactly once, in order.
+
+Usage:
+    python sheets_push.py question_bank.jsonl --url https://script.google.com/macros/s/ID/exec
+    python sheets_push.py bank.json --url URL --workers 8 --chunk-bytes 262144
+    python sheets_push.py bank.json --url URL --push-id 3f9c...   # resume a failed push
+    python sheets_push.py --self-test
+"""
+import argparse
+import base64
+import gzip
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from csv_export import js_string, js_truthy
+from question_io import iter_questions
+
+# =========================
+# CONFIG
+# =========================
+DEFAULT_CHUNK_BYTES = 512 * 1024   # JSON bytes per chunk, before compression
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+REQUEST_TIMEOUT_SECONDS = 300      # Apps Script runs for up to 6 minutes per request
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+SELF_TEST_ROWS = 10_000
+
+_MISSING = object()
+_HTML_TAG_RE = re.compile(r"<[^>]*>")
+
+# (question, payload the app builds for it at position 0), from running
+# saveQuestionsToSheets' mapping in node
+_PAYLOAD_CASES = [
+    ({"question": "Use <b>Nanite</b>", "options": {"A": "<i>On</i>", "B": "Off"}, "correct": "A",
+      "explanation": 'See <a href="x">docs</a>', "sourceExcerpt": "<p>Nanite</p> mesh", "critique": "<br/>ok"},
+     {"ID": "1", "Status": "accepted", "Question": "Use Nanite", "OptionA": "On", "OptionB": "Off",
+      "OptionC": "", "OptionD": "", "Answer": "A", "Explanation": "See docs", "Language": "English",
+      "SourceFile": "", "sourceExcerpt": "Nanite mesh", "QualityScore": "", "AICritique": "ok",
+      "TokenCost": "", "RejectionReason": "", "HumanVerifiedBy": "", "RejectedAt": ""}),
+    ({"options": {"D": "<em>All</em>"}},
+     {"ID": "1", "Status": "accepted", "Question": "", "OptionA": "", "OptionB": "", "OptionC": "",
+      "OptionD": "All", "Explanation": "", "Language": "English", "SourceFile": "", "sourceExcerpt": "",
+      "QualityScore": "", "AICritique": "", "TokenCost": "", "RejectionReason": "", "HumanVerifiedBy": "",
+      "RejectedAt": ""}),
+]
+
+
+class PushError(Exception):
+    pass
+
+
+class Chunk(NamedTuple):
+    index: int
+    rows: int
+    raw_bytes: int
+    body: bytes
+
+
+def strip_html_tags(value: Any) -> str:
+    """
+    stripHtmlTags() in googleSheets.js: '' for empty values, tags removed otherwise.
+    """
+    if not js_truthy(value):
+        return ""
+    return _HTML_TAG_RE.sub("", js_string(value))
+
+
+def sheet_row(row: Dict, i: int) -> Dict:
+    """
+    The payload object saveQuestionsToSheets builds for the question at
+    position `i`. Keys whose JS value would be undefined are left out, as
+    JSON.stringify does; text fields go through strip_html_tags, so they are
+    always present.
+    """
+    source_url = row.get("sourceUrl")
+    cleaned_source_url = source_url if js_truthy(source_url) and "grounding-api" not in js_string(source_url) else ""
+    options = row.get("options") if js_truthy(row.get("options")) else {}
+    if not isinstance(options, dict):
+        options = {}
+
+    def first(*values):
+        for value in values[:-1]:
+            if js_truthy(value):
+                return value
+        return values[-1]
+
+    fields = {
+        "ID": str(i + 1),
+        "uniqueId": row.get("uniqueId", _MISSING),
+        "Status": first(row.get("status"), "accepted"),
+        "Discipline": row.get("discipline", _MISSING),
+        "Type": row.get("type", _MISSING),
+        "Difficulty": row.get("difficulty", _MISSING),
+        "Question": strip_html_tags(row.get("question")),
+        "OptionA": strip_html_tags(options.get("A")),
+        "OptionB": strip_html_tags(options.get("B")),
+        "OptionC": strip_html_tags(options.get("C")),
+        "OptionD": strip_html_tags(first(options.get("D"), "")),
+        "Answer": row.get("correct", _MISSING),
+        "Explanation": strip_html_tags(first(row.get("explanation"), "")),
+        "Language": first(row.get("language"), "English"),
+        "SourceFile": cleaned_source_url,
+        "sourceExcerpt": strip_html_tags(row.get("sourceExcerpt")),
+        "creator": row.get("creatorName", _MISSING),
+        "reviewer": row.get("reviewerName", _MISSING),
+        "QualityScore": first(row.get("critiqueScore"), row.get("initialQuality"), ""),
+        "AICritique": strip_html_tags(first(row.get("critique"), "")),
+        "TokenCost": first(row.get("tokenCost"), ""),
+        "RejectionReason": first(row.get("rejectionReason"), ""),
+        "HumanVerifiedBy": first(row.get("humanVerifiedBy"), ""),
+        "RejectedAt": first(row.get("rejectedAt"), ""),
+    }
+    return {k: v for k, v in fields.items() if v is not _MISSING}
+
+
+def encode_chunk(rows: List[Dict]) -> Tuple[bytes, int]:
+    """
+    base64(gzip(JSON {"questions": rows})), as Code.gs decodeChunk() reads it.
+
+    Returns:
+        (body, JSON bytes before compression)
+    """
+    raw = json.dumps({"questions": rows}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.b64encode(gzip.compress(raw, mtime=0)), len(raw)
+
+
+def iter_chunks(questions: Iterable[Dict], chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                include_rejected: bool = False) -> Iterator[Chunk]:
+    """
+    Payload rows grouped into chunks of at most `chunk_bytes` JSON bytes (a
+    single larger row gets a chunk of its own). Rejected questions are left
+    out unless `include_rejected`, as in handleExportToSheets.
+    """
+    index = 0
+    position = 0
+    batch: List[Dict] = []
+    size = 0
+    for q in questions:
+        if not include_rejected and q.get("status") == "rejected":
+            continue
+        row = sheet_row(q, position)
+        position += 1
+        row_size = len(json.dumps(row, ensure_ascii=False, separators=(",", ":")).encode("utf-8")) + 1
+        if batch and size + row_size > chunk_bytes:
+            body, raw = encode_chunk(batch)
+            yield Chunk(index, len(batch), raw, body)
+            index += 1
+            batch, size = [], 0
+        batch.append(row)
+        size += row_size
+    if batch:
+        body, raw = encode_chunk(batch)
+        yield Chunk(index, len(batch), raw, body)
+
+
+def _backoff_delay(retry: int) -> float:
+    """
+    Exponential backoff with full jitter: uniform(0, min(max, base * 2^retry)).
+    """
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** retry)))
+
+
+def post(url: str, params: Dict[str, Any], body: bytes = b"", timeout: float = REQUEST_TIMEOUT_SECONDS) -> Dict:
+    """
+    POST to the web app and parse its JSON answer. Apps Script answers
+    with a 302 to an echo URL, which urlopen follows with a GET.
+    """
+    separator = "&" if "?" in url else "?"
+    request = Request(f"{url}{separator}{urlencode(params)}", data=body, method="POST",
+                      headers={"Content-Type": "text/plain; charset=utf-8"})
+    with urlopen(request, timeout=timeout) as response:
+        raw = response.read()
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        raise PushError(f"web app did not answer with JSON: {raw[:200]!r}")
+
+
+def post_with_retry(url: str, params: Dict[str, Any], body: bytes = b"",
+                    max_retries: int = DEFAULT_MAX_RETRIES, stats: Optional[Dict] = None) -> Dict:
+    """
+    post() with retries on 429/5xx, network errors and "Busy" answers.
+    """
+    for retry in range(max_retries + 1):
+        try:
+            result = post(url, params, body)
+            if result.get("status") != "Busy":
+                return result
+            error = PushError(result.get("message", "web app busy"))
+        except HTTPError as e:
+            if e.code not in RETRYABLE_STATUS_CODES:
+                raise PushError(f"HTTP {e.code} for {params}") from e
+            error = e
+        except (URLError, TimeoutError, ConnectionError) as e:
+            error = e
+        if retry == max_retries:
+            raise PushError(f"giving up on {params} after {max_retries + 1} attempts: {error}")
+        if stats is not None:
+            with stats["_lock"]:
+                stats["retries"] += 1
+        time.sleep(_backoff_delay(retry))
+    raise AssertionError("unreachable")
+
+
+def push_bank(url: str, questions: Iterable[Dict], push_id: Optional[str] = None,
+              chunk_bytes: int = DEFAULT_CHUNK_BYTES, workers: int = DEFAULT_WORKERS,
+              max_retries: int = DEFAULT_MAX_RETRIES, include_rejected: bool = False) -> Dict:
+    """
+    Send all chunks (at most 2 x `workers` encoded chunks held at once),
+    then commit.
+
+    Returns:
+        {"pushId", "chunks", "rows", "raw_bytes", "sent_bytes", "duplicates",
+         "retries", "commit": Code.gs commit result}
+    """
+    push_id = push_id or uuid.uuid4().hex
+    stats = {"pushId": push_id, "chunks": 0, "rows": 0, "raw_bytes": 0, "sent_bytes": 0,
+             "duplicates": 0, "retries": 0, "_lock": threading.Lock()}
+
+    def send(chunk: Chunk) -> Dict:
+        result = post_with_retry(url, {"action": "chunk", "pushId": push_id, "index": chunk.index},
+                                 chunk.body, max_retries, stats)
+        if result.get("status") != "Success":
+            raise PushError(f"chunk {chunk.index}: {result.get('message', result)}")
+        with stats["_lock"]:
+            stats["chunks"] += 1
+            stats["rows"] += chunk.rows
+            stats["raw_bytes"] += chunk.raw_bytes
+            stats["sent_bytes"] += len(chunk.body)
+            stats["duplicates"] += bool(result.get("duplicate"))
+        return result
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        pending = set()
+        try:
+            for chunk in iter_chunks(questions, chunk_bytes, include_rejected):
+                total += 1
+                pending.add(pool.submit(send, chunk))
+                if len(pending) >= 2 * max(workers, 1):
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+            for future in pending:
+                future.result()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    result = post_with_retry(url, {"action": "commit", "pushId": push_id, "total": total},
+                             max_retries=max_retries, stats=stats)
+    if result.get("status") == "Incomplete":
+        raise PushError(f"web app is missing chunks {result.get('missing')}; "
+                        f"run again with --push-id {push_id}")
+    if result.get("status") != "Success":
+        raise PushError(f"commit failed: {result.get('message', result)}")
+    stats.pop("_lock")
+    stats["commit"] = result
+    return stats
+
+
+def _synthetic_questions(count: int, seed: int = 48) -> List[Dict]:
+    rng = random.Random(seed)
+    questions = []
+    for n in range(count):
+        questions.append({
+            "uniqueId": f"q-{n:06d}",
+            "discipline": rng.choice(["Technical Art", "Lighting", "Animation", "Blueprints"]),
+            "type": rng.choice(["Multiple Choice", "True/False"]),
+            "difficulty": rng.choice(["Easy", "Medium", "Hard"]),
+            "question": f"Question {n}: what does setting {rng.randint(1, 999)} change in <b>Lumen</b>? ü 🚀",
+            "options": {"A": "One", "B": "Two", "C": "Three", "D": "Four"},
+            "correct": rng.choice("ABCD"),
+            "language": rng.choice(["English", "English", "Japanese"]),
+            "status": rng.choice(["accepted", "accepted", "pending", "rejected"]),
+            "critique": "x" * rng.randint(0, 400),
+            "critiqueScore": rng.randint(0, 100),
+        })
+    return questions
+
+
+def self_test(rows: int = SELF_TEST_ROWS, workers: int = DEFAULT_WORKERS) -> int:
+    """
+    Check sheet_row against payloads the app builds, then push synthetic
+    questions through fake_sheets_server with injected 500s and lost
+    responses and resume the same push; check that every row lands exactly
+    once, in order.
+
+    Returns:
+        failures
+    """
+    from fake_sheets_server import FakeSheetsState, build_row, make_server
+
+    failures = 0
+    for n, (question, expected_row) in enumerate(_PAYLOAD_CASES):
+        got_row = sheet_row(question, 0)
+        if got_row != expected_row:
+            failures += 1
+            print(f"[sheets] self-test: payload case {n}: got {got_row!r}", file=sys.stderr)
+
+    global BACKOFF_BASE_SECONDS
+    backoff_base, BACKOFF_BASE_SECONDS = BACKOFF_BASE_SECONDS, 0.01
+    server = make_server(port=0, state=FakeSheetsState(latency=0.05, error_rate=0.05, lost_rate=0.05, seed=48))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/exec"
+    try:
+        questions = _synthetic_questions(rows)
+        expected_rows = [sheet_row(q, i) for i, q in enumerate(q for q in questions if q["status"] != "rejected")]
+        expected: Dict[str, List[List]] = {}
+        for row in expected_rows:
+            expected.setdefault(row.get("Language") or "English", []).append(build_row(row, "")[:-1])
+
+        started = time.monotonic()
+        stats = push_bank(url, questions, chunk_bytes=64 * 1024, workers=workers)
+        elapsed = time.monotonic() - started
+        got = {lang: [r[:-1] for r in rs] for lang, rs in server.state.masters.items()}
+        if got != expected:
+            failures += 1
+            print("[sheets] self-test: Master rows differ from the payload", file=sys.stderr)
+        print(f"[sheets] self-test: {stats['rows']:,} rows in {stats['chunks']} chunks, "
+              f"{stats['raw_bytes']:,} -> {stats['sent_bytes']:,} bytes, {stats['retries']} retries, "
+              f"{stats['duplicates']} duplicate acks ({elapsed:.2f}s)", file=sys.stderr)
+
+        again = push_bank(url, questions, push_id=stats["pushId"], chunk_bytes=64 * 1024, workers=workers)
+        if not again["commit"].get("duplicate") or sum(map(len, server.state.masters.values())) != len(expected_rows):
+            failures += 1
+            print("[sheets] self-test: repeating a committed push wrote rows again", file=sys.stderr)
+    finally:
+        BACKOFF_BASE_SECONDS = backoff_base
+        server.shutdown()
+        server.server_close()
+    print(f"[sheets] self-test: {failures} failures", file=sys.stderr)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Push a question bank to the Sheets web app in chunks (Code.gs)")
+    parser.add_argument("banks", type=Path, nargs="*", help="question bank(s): .jsonl, .json or .csv")
+    parser.add_argument("--url", help="Apps Script web app URL (.../exec)")
+    parser.add_argument("--push-id", default=None, help="resume an earlier push (default: new id)")
+    parser.add_argument("--chunk-bytes", type=int, default=DEFAULT_CHUNK_BYTES)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="chunks in flight")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES)
+    parser.add_argument("--include-rejected", action="store_true", help="also push rejected questions")
+    parser.add_argument("--self-test", action="store_true", help="push through fake_sheets_server.py and exit")
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(1 if self_test(workers=args.workers) else 0)
+    if not args.banks or not args.url:
+        parser.error("give question bank(s) and --url (or --self-test)")
+    if args.chunk_bytes < 1024:
+        parser.error("--chunk-bytes must be at least 1024")
+
+    push_id = args.push_id or uuid.uuid4().hex
+    print(f"[sheets] push id {push_id}", file=sys.stderr)
+    started = time.monotonic()
+    questions = (q for path in args.banks for q in iter_questions(path))
+    try:
+        stats = push_bank(args.url, questions, push_id, args.chunk_bytes, args.workers,
+                          args.max_retries, args.include_rejected)
+    except PushError as e:
+        print(f"[sheets] {e}", file=sys.stderr)
+        print(f"[sheets] resume with --push-id {push_id}", file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.monotonic() - started
+
+    commit = stats["commit"]
+    print(f"[sheets] {stats['rows']:,} rows in {stats['chunks']} chunks "
+          f"({stats['raw_bytes']:,} -> {stats['sent_bytes']:,} bytes), {stats['retries']} retries, "
+          f"{stats['duplicates']} already on the server ({elapsed:.2f}s)", file=sys.stderr)
+    if commit.get("duplicate"):
+        print("[sheets] this push was already committed; nothing was written again", file=sys.stderr)
+    if commit.get("fileId"):
+        print(f"[sheets] export file: https://docs.google.com/spreadsheets/d/{commit['fileId']}")
+
+
+if __name__ == "__main__":
+    main()
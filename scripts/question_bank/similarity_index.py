@@ -0,0 +1,472 @@
+"""
+similarity_index.py
+
+Persistent, incremental near-duplicate index for filterDuplicateQuestions
+(src/utils/questionHelpers.js).
+
+Every generation batch is checked against currentList + otherList. The JS
+code rescans the whole bank with textSimilarity each time. This index keeps
+the bank on disk (SQLite, stdlib) and updates it as questions change state:
+
+  questions  one row per accepted/pending question: id, status, normalized
+             text and its MinHash signature
+  postings   inverted index from LSH band key -> question, so a lookup
+             touches only the questions sharing a band with the new text
+
+A check costs one indexed lookup per band plus exact verification of the few
+candidates (q-gram filter, then textSimilarity >= threshold, the same rule
+as near_duplicates.py). A 10-question batch takes milliseconds however large
+the bank grows. Accepting a question inserts it, and rejecting one deletes
+it. Re-adding an id replaces the old text.
+
+The stop shingles (boilerplate that most questions share) are fixed when
+the index is built. Run `build` again after the bank's wording has changed
+a lot.
+
+Ids are compared as strings. Unlike the JS Set, the number 5 and the string
+"5" therefore collide.
+
+Usage:
+    python similarity_index.py build question_bank.csv --index bank.sqlite3
+    python similarity_index.py check new_batch.json --index bank.sqlite3
+    python similarity_index.py add accepted.json --index bank.sqlite3
+    python similarity_index.py remove q_123 q_456 --index bank.sqlite3
+    python similarity_index.py serve --index bank.sqlite3   # JSON lines on stdin/stdout
+    python similarity_index.py self-test
+
+serve protocol: one JSON request per line, one JSON response per line.
+    {"id": 1, "op": "check", "questions": [...], "threshold": 0.85}
+      -> {"id": 1, "ok": true, "unique": [0, 2], "removed": [{"index": 1,
+          "reason": "similar", "match": "q_9", "similarity": 0.91}], "ms": 1.7}
+    {"op": "add", "questions": [...]}   -> {"ok": true, "added": 3, "removed": 1}
+    {"op": "remove", "ids": ["q_9"]}    -> {"ok": true, "removed": 1}
+    {"op": "stats"}                     -> {"ok": true, "questions": ..., ...}
+Errors come back as {"ok": false, "error": "..."} and the helper keeps running.
+"""
+import argparse
+import hashlib
+import io
+import json
+import sqlite3
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from near_duplicates import (
+    LSH_BANDS,
+    LSH_ROWS,
+    NUM_BINS,
+    SHINGLE_SIZE,
+    MinHasher,
+    band_keys,
+    common_shingles,
+    prepare_text,
+    qgram_filter_passes,
+    shingles,
+)
+from question_io import load_questions
+from text_similarity import DUPLICATE_THRESHOLD, SimilarityQuery, utf16_units
+
+# =========================
+# CONFIG
+# =========================
+DEFAULT_INDEX_PATH = Path("question_bank_index.sqlite3")
+INDEX_FORMAT_VERSION = 1
+REJECTED_STATUS = "rejected"     # status that keeps a question out of the index
+
+_SIGNATURE = struct.Struct(f"<{NUM_BINS}Q")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS questions (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    id         TEXT NOT NULL UNIQUE,
+    status     TEXT,
+    normalized TEXT NOT NULL,
+    signature  BLOB
+);
+CREATE TABLE IF NOT EXISTS postings (
+    band_key INTEGER NOT NULL,
+    seq      INTEGER NOT NULL,
+    PRIMARY KEY (band_key, seq)
+) WITHOUT ROWID;
+"""
+
+
+def _band_hash(key: Tuple) -> int:
+    # Band tuples -> signed 64-bit ints, so postings stay a compact integer B-tree
+    digest = hashlib.blake2b(struct.pack(f"<{len(key)}Q", *key), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+class SimilarityIndex:
+    """
+    On-disk LSH index of the question bank with filterDuplicateQuestions checks.
+    """
+
+    def __init__(self, path: Path = DEFAULT_INDEX_PATH):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"{self.path} does not exist; run `build` first")
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        meta = dict(self._db.execute("SELECT key, value FROM meta"))
+
+        expected = {"version": INDEX_FORMAT_VERSION, "num_bins": NUM_BINS, "shingle_size": SHINGLE_SIZE}
+        for key, value in expected.items():
+            if int(meta.get(key, -1)) != value:
+                self._db.close()
+                raise ValueError(f"{self.path} was built with different {key}; rebuild it")
+        self.threshold = float(meta["threshold"])
+        self.bands = int(meta["bands"])
+        self.rows = int(meta["rows"])
+        self.stop_shingles: FrozenSet[str] = frozenset(json.loads(meta["stop_shingles"]))
+        self.hasher = MinHasher()
+        self.candidates_checked = 0
+        self.candidates_filtered = 0
+
+    @classmethod
+    def build(cls, path: Path, questions: Iterable[Dict], threshold: float = DUPLICATE_THRESHOLD,
+              bands: int = LSH_BANDS, rows: int = LSH_ROWS) -> "SimilarityIndex":
+        """
+        Create a new index at `path` (which must not exist) from a question bank.
+        """
+        path = Path(path)
+        if path.exists():
+            raise FileExistsError(f"{path} already exists")
+        if bands * rows > NUM_BINS:
+            raise ValueError(f"bands * rows must be <= {NUM_BINS}")
+        questions = [q for q in questions if q.get("status") != REJECTED_STATUS]
+
+        db = sqlite3.connect(str(path))
+        with db:
+            db.executescript(_SCHEMA)
+            db.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+                ("version", str(INDEX_FORMAT_VERSION)),
+                ("num_bins", str(NUM_BINS)),
+                ("shingle_size", str(SHINGLE_SIZE)),
+                ("threshold", repr(threshold)),
+                ("bands", str(bands)),
+                ("rows", str(rows)),
+                ("stop_shingles", json.dumps(sorted(common_shingles(q.get("question") for q in questions)))),
+            ])
+        db.close()
+
+        index = cls(path)
+        index.add(questions)
+        return index
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+
+    def _band_hashes(self, signature: Sequence[int]) -> List[int]:
+        return [_band_hash(key) for key in band_keys(signature, self.bands, self.rows)]
+
+    def _delete(self, question_id: str) -> bool:
+        row = self._db.execute(
+            "SELECT seq, signature FROM questions WHERE id = ?", (question_id,)).fetchone()
+        if row is None:
+            return False
+        seq, blob = row
+        if blob is not None:
+            self._db.executemany(
+                "DELETE FROM postings WHERE band_key = ? AND seq = ?",
+                [(h, seq) for h in self._band_hashes(_SIGNATURE.unpack(blob))])
+        self._db.execute("DELETE FROM questions WHERE seq = ?", (seq,))
+        return True
+
+    def add(self, questions: Iterable[Dict]) -> Tuple[int, int]:
+        """
+        Apply accepted/pending questions to the index in one transaction:
+        insert (or replace) each one by id, and delete those whose status is
+        "rejected".
+
+        Returns:
+            (added, removed)
+        """
+        added = removed = 0
+        with self._db:
+            for q in questions:
+                if q.get("id") is None:
+                    print(f"[index] skipping question without id: {str(q.get('question'))[:50]!r}",
+                          file=sys.stderr)
+                    continue
+                question_id = str(q["id"])
+                existed = self._delete(question_id)
+                if q.get("status") == REJECTED_STATUS:
+                    removed += existed
+                    continue
+                normalized, _, signature = prepare_text(q.get("question"), self.hasher, self.stop_shingles)
+                cursor = self._db.execute(
+                    "INSERT INTO questions (id, status, normalized, signature) VALUES (?, ?, ?, ?)",
+                    (question_id, q.get("status"), normalized,
+                     None if signature is None else _SIGNATURE.pack(*signature)))
+                if signature is not None:
+                    self._db.executemany(
+                        "INSERT OR IGNORE INTO postings (band_key, seq) VALUES (?, ?)",
+                        [(h, cursor.lastrowid) for h in self._band_hashes(signature)])
+                added += 1
+        return added, removed
+
+    def remove(self, ids: Iterable) -> int:
+        """
+        Delete questions by id (e.g. on reject); returns how many were indexed.
+        """
+        with self._db:
+            return sum(self._delete(str(question_id)) for question_id in ids)
+
+    def _find_duplicate(self, text: Optional[str], threshold: float) -> Optional[Tuple[str, float]]:
+        normalized, shingle_set, signature = prepare_text(text, self.hasher, self.stop_shingles)
+        if signature is None:
+            return None  # empty text: textSimilarity returns 0
+        hashes = self._band_hashes(signature)
+        rows = self._db.execute(
+            "SELECT q.id, q.normalized FROM questions q WHERE q.seq IN "
+            f"(SELECT seq FROM postings WHERE band_key IN ({','.join('?' * len(hashes))})) "
+            "ORDER BY q.seq", hashes)
+        query = SimilarityQuery.from_normalized(normalized)
+        for question_id, other in rows:
+            other_units = utf16_units(other)
+            if not qgram_filter_passes(query, shingle_set, other, other_units,
+                                       frozenset(shingles(other)), threshold):
+                self.candidates_filtered += 1
+                continue
+            self.candidates_checked += 1
+            score = query.score_if_at_least(other, threshold, other_units)
+            if score is not None:
+                return question_id, score
+        return None
+
+    def check(self, new_items: Sequence[Dict], threshold: Optional[float] = None):
+        """
+        filterDuplicateQuestions against the indexed bank: drop new items whose
+        id is already indexed or whose text matches an indexed question. New
+        items are not compared with each other, and nothing is written.
+
+        Returns:
+            (unique_new, removed): kept items, and (new_row, existing_id or None, similarity) per removal
+        """
+        threshold = self.threshold if threshold is None else threshold
+        unique_new, removed = [], []
+        for row, item in enumerate(new_items):
+            if item.get("id") is not None and self._db.execute(
+                    "SELECT 1 FROM questions WHERE id = ?", (str(item["id"]),)).fetchone():
+                removed.append((row, None, None))
+                continue
+            match = self._find_duplicate(item.get("question"), threshold)
+            if match is None:
+                unique_new.append(item)
+            else:
+                removed.append((row, match[0], match[1]))
+        return unique_new, removed
+
+    def stats(self) -> Dict:
+        return {
+            "questions": len(self),
+            "postings": self._db.execute("SELECT COUNT(*) FROM postings").fetchone()[0],
+            "stop_shingles": len(self.stop_shingles),
+            "threshold": self.threshold,
+            "lsh": f"{self.bands}x{self.rows}",
+        }
+
+
+def _removals_json(removed) -> List[Dict]:
+    return [
+        {"index": row, "reason": "id"} if match is None
+        else {"index": row, "reason": "similar", "match": match, "similarity": round(score, 4)}
+        for row, match, score in removed
+    ]
+
+
+def _request_list(request: Dict, key: str, item_type=None) -> List:
+    value = request.get(key) or []
+    if not isinstance(value, list):
+        raise ValueError(f"{key} must be a JSON array")
+    if item_type is not None:
+        for n, item in enumerate(value):
+            if not isinstance(item, item_type):
+                raise ValueError(f"{key}[{n}] must be a JSON object")
+    return value
+
+
+def handle_request(index: SimilarityIndex, request: Dict) -> Dict:
+    """
+    One JSON-over-stdio request -> response (see the module docstring).
+    """
+    op = request.get("op")
+    if op == "check":
+        questions = _request_list(request, "questions", dict)
+        started = time.perf_counter()
+        _, removed = index.check(questions, request.get("threshold"))
+        dropped = {row for row, _, _ in removed}
+        return {
+            "unique": [row for row in range(len(questions)) if row not in dropped],
+            "removed": _removals_json(removed),
+            "ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+    if op == "add":
+        added, removed = index.add(_request_list(request, "questions", dict))
+        return {"added": added, "removed": removed}
+    if op == "remove":
+        return {"removed": index.remove(_request_list(request, "ids"))}
+    if op == "stats":
+        return index.stats()
+    raise ValueError(f"unknown op {op!r}")
+
+
+def serve(index: SimilarityIndex, stdin=sys.stdin, stdout=sys.stdout) -> None:
+    """
+    Answer JSON requests line by line until stdin closes.
+    """
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            request_id = request.get("id")
+            response = {"ok": True, **handle_request(index, request)}
+        except Exception as e:  # one bad request must not take the helper down
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        if request_id is not None:
+            response["id"] = request_id
+        stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+        stdout.flush()
+
+
+_SELF_TEST_BANK = [
+    {"id": "q_1", "status": "accepted", "question": "What is Nanite used for in UE5?"},
+    {"id": "q_2", "status": "accepted", "question": "Which node samples a texture in a material?"},
+    {"id": "q_3", "status": "pending", "question": "How do you enable World Partition for an existing level?"},
+]
+
+# (request, what the response must contain); the bad requests come first so
+# the later ones prove the helper is still answering
+_SELF_TEST_REQUESTS = [
+    ({"id": 1, "op": "check", "questions": ["x"]}, {"id": 1, "ok": False}),
+    ({"id": 2, "op": "add", "questions": {"id": "q_9"}}, {"id": 2, "ok": False}),
+    ({"id": 3, "op": "remove", "ids": "q_1"}, {"id": 3, "ok": False}),
+    ({"id": 4, "op": "check", "questions": [
+        {"id": "n_1", "question": "What is Nanite used for in UE5? \U0001F600"},
+        {"id": "n_2", "question": "\U0001F3AE Which node samples a texture in a material?"},
+        {"id": "n_3", "question": "What does the Sequencer track for a camera cut do?"},
+    ]}, {"id": 4, "ok": True, "unique": [2]}),
+    ({"id": 5, "op": "stats"}, {"id": 5, "ok": True, "questions": 3}),
+]
+
+
+def self_test() -> int:
+    """
+    Run the serve protocol against a throwaway index: malformed requests get
+    an error response, and emoji-suffixed copies are caught as duplicates.
+
+    Returns:
+        failures
+    """
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        with SimilarityIndex.build(Path(tmp) / "index.sqlite3", _SELF_TEST_BANK) as index:
+            stdin = io.StringIO("".join(json.dumps(r) + "\n" for r, _ in _SELF_TEST_REQUESTS))
+            stdout = io.StringIO()
+            serve(index, stdin, stdout)
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    if len(responses) != len(_SELF_TEST_REQUESTS):
+        print(f"[index] {len(responses)} responses to {len(_SELF_TEST_REQUESTS)} requests", file=sys.stderr)
+        return 1
+    for (request, expected), response in zip(_SELF_TEST_REQUESTS, responses):
+        if any(response.get(key) != value for key, value in expected.items()):
+            failures += 1
+            print(f"[index] request {request['id']}: got {response!r}", file=sys.stderr)
+    print(f"[index] self-test: {len(responses)} requests, {failures} failures", file=sys.stderr)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent near-duplicate index of the question bank")
+    parser.add_argument("--index", type=Path, default=DEFAULT_INDEX_PATH, help="index file (SQLite)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="create the index from accepted/pending questions")
+    build.add_argument("banks", type=Path, nargs="+", help="question bank(s): .csv export, .json or .jsonl")
+    build.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD)
+    build.add_argument("--force", action="store_true", help="replace an existing index")
+
+    check = sub.add_parser("check", help="filterDuplicateQuestions for a new batch (read-only)")
+    check.add_argument("batch", type=Path)
+    check.add_argument("--threshold", type=float, default=None)
+
+    add = sub.add_parser("add", help="insert accepted/pending questions; rejected ones are removed")
+    add.add_argument("batch", type=Path)
+
+    remove = sub.add_parser("remove", help="delete questions by id")
+    remove.add_argument("ids", nargs="+")
+
+    sub.add_parser("stats", help="print index size")
+    sub.add_parser("serve", help="JSON requests on stdin, responses on stdout")
+    sub.add_parser("self-test", help="check the serve protocol on a throwaway index")
+
+    args = parser.parse_args()
+
+    if args.command == "self-test":
+        sys.exit(1 if self_test() else 0)
+
+    if args.command == "build":
+        if args.index.exists():
+            if not args.force:
+                parser.error(f"{args.index} already exists (use --force to rebuild)")
+            for suffix in ("", "-wal", "-shm"):
+                Path(str(args.index) + suffix).unlink(missing_ok=True)
+        started = time.monotonic()
+        questions = [q for path in args.banks for q in load_questions(path)]
+        with SimilarityIndex.build(args.index, questions, args.threshold) as index:
+            print(f"[index] {len(index):,} questions indexed in {time.monotonic() - started:.2f}s "
+                  f"-> {args.index}", file=sys.stderr)
+        return
+
+    try:
+        index = SimilarityIndex(args.index)
+    except (FileNotFoundError, ValueError) as e:
+        parser.error(str(e))
+    with index:
+        if args.command == "check":
+            batch = load_questions(args.batch)
+            started = time.perf_counter()
+            kept, removed = index.check(batch, args.threshold)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"[index] {len(batch):,} new -> {len(kept):,} unique, {len(removed):,} duplicates "
+                  f"({index.candidates_checked:,} pairs verified, {elapsed_ms:.1f} ms)", file=sys.stderr)
+            for row, match, score in removed:
+                reason = "id already indexed" if match is None else f"{score:.3f} similar to {match}"
+                print(f"  #{row} {batch[row].get('id')}: {reason}")
+        elif args.command == "add":
+            added, removed = index.add(load_questions(args.batch))
+            print(f"[index] {added:,} added, {removed:,} removed ({len(index):,} indexed)", file=sys.stderr)
+        elif args.command == "remove":
+            print(f"[index] {index.remove(args.ids):,} removed ({len(index):,} indexed)", file=sys.stderr)
+        elif args.command == "stats":
+            print(json.dumps(index.stats(), indent=2))
+        else:
+            serve(index)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+slug_index.py
+
+Offline index of Epic documentation slugs, built from the URL crawler output
+(.url-crawler/collected-urls.txt) and the KNOWN_VALID_SLUGS set in
+src/utils/urlValidator.js.
+
+The index is a sorted slug list with two lookups:
+  - prefix   bisect on the sorted list ("nanite" -> every nanite-* page)
+  - fuzzy    a trigram inverted index (without the trigrams of shared
+             boilerplate such as "-in-unreal-engine") narrows the list to
+             slugs sharing trigrams with the query; these are ranked by
+             trigram Dice overlap, with edit distance breaking ties
+
+suggest() maps a bad SourceURL slug to the nearest indexed one. It tries
+the cheap fixes first (case, spaces, a missing "-in-unreal-engine"), then
+falls back to the fuzzy lookup. url_validator.py --suggest uses it to
+propose corrected URLs in bulk.
+
+`known-slugs` regenerates the KNOWN_VALID_SLUGS list. Crawled slugs that
+validateURL would accept and that are not yet in the set are appended
+under a marked section, and the curated part of the list is left as it is.
+
+Usage:
+    python slug_index.py build                        # writes .url-crawler/slug-index.txt
+    python slug_index.py suggest "https://dev.epicgames.com/documentation/en-us/unreal-engine/nanite"
+    python slug_index.py prefix lumen
+    python slug_index.py known-slugs --write          # update urlValidator.js
+"""
+import argparse
+import heapq
+import re
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from text_similarity import BitParallelPattern
+from url_validator import (
+    BASE_URL,
+    INVALID_SLUG_RE,
+    REPO_ROOT,
+    SUFFIX,
+    URL_VALIDATOR_JS,
+    known_valid_slugs,
+)
+
+# =========================
+# CONFIG
+# =========================
+CRAWLER_OUTPUT = REPO_ROOT / ".url-crawler" / "collected-urls.txt"
+DEFAULT_INDEX_PATH = REPO_ROOT / ".url-crawler" / "slug-index.txt"
+FUZZY_CANDIDATES = 24          # best trigram matches considered for edit-distance tie-breaks
+STOP_TRIGRAM_DF = 0.1          # trigrams in more than this share of slugs are not indexed
+MIN_SUGGESTION_SCORE = 0.35    # trigram Dice below this is not worth suggesting
+CRAWLED_SECTION = "// Crawled (scripts/question_bank/slug_index.py known-slugs)"
+
+_SEPARATORS_RE = re.compile(r"[\s_]+")
+_HYPHEN_RUN_RE = re.compile(r"-{2,}")
+
+
+class Suggestion(NamedTuple):
+    slug: str
+    score: float      # 1.0 for an exact or normalized match, else trigram Dice
+    distance: int     # edit distance from the cleaned-up query
+
+    @property
+    def url(self) -> str:
+        return BASE_URL + self.slug
+
+
+def slug_from_url(url: str) -> Optional[str]:
+    """
+    The page path after BASE_URL, without query, anchor or trailing slash.
+    """
+    url = url.strip()
+    if not url.startswith(BASE_URL):
+        return None
+    slug = url[len(BASE_URL):].split("#")[0].split("?")[0].strip("/")
+    return slug or None
+
+
+def read_crawler_output(path: Path = CRAWLER_OUTPUT) -> List[str]:
+    """
+    Slugs from crawler output: one URL per line, "#" comment lines ignored.
+    """
+    slugs = []
+    with Path(path).open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                slug = slug_from_url(line)
+                if slug:
+                    slugs.append(slug)
+    return slugs
+
+
+def _trigrams(text: str) -> set:
+    padded = f"^{text}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def clean_slug(slug: str) -> str:
+    """
+    The fixes that need no lookup: lowercase, spaces/underscores to hyphens,
+    no doubled or dangling hyphens.
+    """
+    slug = _SEPARATORS_RE.sub("-", slug.strip().lower())
+    return _HYPHEN_RUN_RE.sub("-", slug).strip("-/")
+
+
+class SlugIndex:
+    """
+    Sorted slug list with prefix and trigram lookups.
+    """
+
+    def __init__(self, slugs: Iterable[str]):
+        self.slugs: List[str] = sorted(set(slugs))
+        self._set = frozenset(self.slugs)
+        self._lower = {}
+        for slug in self.slugs:
+            self._lower.setdefault(slug.lower(), slug)
+        grams_per_slug = [_trigrams(slug.lower()) for slug in self.slugs]
+        df = Counter(g for grams in grams_per_slug for g in grams)
+        # Trigrams of the boilerplate every slug shares ("-in-unreal-engine")
+        # say nothing about which page is meant and would flood the postings
+        self._stop = frozenset(g for g, n in df.items() if n > STOP_TRIGRAM_DF * len(self.slugs))
+        postings: Dict[str, array] = {}
+        self._gram_counts = array("H")
+        for i, grams in enumerate(grams_per_slug):
+            grams -= self._stop
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, array("I")).append(i)
+        self._postings = postings
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_INDEX_PATH) -> "SlugIndex":
+        with Path(path).open("r", encoding="utf-8") as f:
+            return cls(line.strip() for line in f if line.strip())
+
+    @classmethod
+    def from_sources(cls, crawler_files: Sequence[Path] = (CRAWLER_OUTPUT,),
+                     validator_js: Path = URL_VALIDATOR_JS) -> "SlugIndex":
+        slugs = set(known_valid_slugs(validator_js))
+        for path in crawler_files:
+            if Path(path).exists():
+                slugs.update(read_crawler_output(path))
+        return cls(slugs)
+
+    @classmethod
+    def default(cls) -> "SlugIndex":
+        """
+        The saved index if `build` has been run, otherwise built from the sources.
+        """
+        if DEFAULT_INDEX_PATH.exists():
+            return cls.load(DEFAULT_INDEX_PATH)
+        return cls.from_sources()
+
+    def save(self, path: Path = DEFAULT_INDEX_PATH) -> None:
+        Path(path).write_text("".join(s + "\n" for s in self.slugs), encoding="utf-8")
+
+    def __len__(self) -> int:
+        return len(self.slugs)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self._set
+
+    def with_prefix(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Indexed slugs starting with `prefix`, in sorted order.
+        """
+        found = []
+        for i in range(bisect_left(self.slugs, prefix), len(self.slugs)):
+            if not self.slugs[i].startswith(prefix) or (limit is not None and len(found) >= limit):
+                break
+            found.append(self.slugs[i])
+        return found
+
+    def _dice(self, grams: set, i: int, common: int) -> float:
+        return round(2 * common / (len(grams) + self._gram_counts[i]), 4)
+
+    def fuzzy(self, query: str, limit: int = 5) -> List[Suggestion]:
+        """
+        Nearest slugs by trigram Dice overlap, ties broken by edit distance.
+        """
+        grams = _trigrams(query.lower()) - self._stop
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        if not shared:
+            return []
+        scored = heapq.nlargest(FUZZY_CANDIDATES, ((self._dice(grams, i, common), i) for i, common in shared.items()))
+        # Edit distance only for the top `limit` and anything tied with the last of them
+        cutoff = scored[min(limit, len(scored)) - 1][0]
+        pattern = BitParallelPattern(query.lower())
+        ranked = [
+            Suggestion(self.slugs[i], dice, pattern.distance(self.slugs[i].lower()))
+            for dice, i in scored if dice >= cutoff
+        ]
+        ranked.sort(key=lambda s: (-s.score, s.distance, s.slug))
+        return ranked[:limit]
+
+    def suggest(self, slug_or_url: str) -> Optional[Suggestion]:
+        """
+        Nearest valid slug for a bad SourceURL (or slug), or None if nothing is close.
+
+        Tried in order: exact; cleaned up (case, spaces, hyphens) with or
+        without the "-in-unreal-engine" suffix; the shortest slug that
+        extends the query by whole words ("nanite" -> "nanite-virtualized-...");
+        the best fuzzy match above MIN_SUGGESTION_SCORE.
+        """
+        slug = slug_from_url(slug_or_url) if slug_or_url.startswith(BASE_URL) else slug_or_url
+        if not slug:
+            return None
+        if slug in self._set:
+            return Suggestion(slug, 1.0, 0)
+        cleaned = clean_slug(slug)
+        if not cleaned:
+            return None
+        for candidate in (cleaned, cleaned + SUFFIX):
+            exact = self._lower.get(candidate)
+            if exact is not None:
+                return Suggestion(exact, 1.0, BitParallelPattern(slug).distance(exact))
+
+        extensions = self.with_prefix(cleaned + "-")
+        if extensions:
+            best = min(extensions, key=lambda s: (len(s), s))
+            i = bisect_left(self.slugs, best)
+            grams = _trigrams(cleaned) - self._stop
+            common = len(grams & _trigrams(best.lower()))
+            return Suggestion(best, self._dice(grams, i, common), BitParallelPattern(slug).distance(best))
+
+        best = self.fuzzy(cleaned, limit=1)
+        if best and best[0].score >= MIN_SUGGESTION_SCORE:
+            return best[0]
+        return None
+
+
+def regenerate_known_slugs(index: SlugIndex, validator_js: Path = URL_VALIDATOR_JS) -> str:
+    """
+    urlValidator.js source with indexed slugs that validateURL would accept
+    appended to KNOWN_VALID_SLUGS under the crawled section.
+    """
+    source = Path(validator_js).read_text(encoding="utf-8")
+    start = source.index("const KNOWN_VALID_SLUGS = new Set([")
+    end = source.index("]);", start)
+    block = source[start:end]
+
+    known = known_valid_slugs(validator_js)
+    crawled_start = block.find(CRAWLED_SECTION)
+    if crawled_start >= 0:
+        # Regenerate the crawled section from scratch; keep the curated part
+        curated = block[:crawled_start].rstrip() + "\n"
+        known = frozenset(re.findall(r"'([^'\\]*)'", re.sub(r"//[^\n]*", "", curated)))
+    else:
+        curated = block.rstrip() + "\n"
+
+    new = [s for s in index.slugs if s not in known and not INVALID_SLUG_RE.search(s)]
+    if not new:
+        return source[:start] + curated + source[end:]
+    lines = [f"\n    {CRAWLED_SECTION}\n"] + [f"    '{s}',\n" for s in new]
+    return source[:start] + curated + "".join(lines) + source[end:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Documentation slug index (crawler output + KNOWN_VALID_SLUGS)")
+    parser.add_argument("--crawler", type=Path, action="append", default=None,
+                        help=f"crawler output file(s) (default: {CRAWLER_OUTPUT.relative_to(REPO_ROOT)})")
+    parser.add_argument("--index", type=Path, default=None, help="saved index (default: build from sources)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("build", help="write the sorted slug index")
+    suggest = sub.add_parser("suggest", help="nearest valid slug for each URL or slug")
+    suggest.add_argument("queries", nargs="+")
+    prefix = sub.add_parser("prefix", help="slugs starting with a prefix")
+    prefix.add_argument("prefix")
+    known = sub.add_parser("known-slugs", help="regenerate KNOWN_VALID_SLUGS in urlValidator.js")
+    known.add_argument("--write", action="store_true", help="update the file instead of printing a diff summary")
+
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.index:
+        index = SlugIndex.load(args.index)
+    else:
+        index = SlugIndex.from_sources(args.crawler or (CRAWLER_OUTPUT,))
+    load_ms = (time.perf_counter() - started) * 1000
+
+    if args.command == "build":
+        index.save(DEFAULT_INDEX_PATH)
+        print(f"[slugs] {len(index):,} slugs -> {DEFAULT_INDEX_PATH} ({load_ms:.1f} ms)", file=sys.stderr)
+    elif args.command == "suggest":
+        for query in args.queries:
+            t = time.perf_counter()
+            suggestion = index.suggest(query)
+            elapsed_us = (time.perf_counter() - t) * 1e6
+            if suggestion is None:
+                print(f"{query}\t-\t(no close slug, {elapsed_us:.0f} us)")
+            else:
+                print(f"{query}\t{suggestion.url}\t(score {suggestion.score:.2f}, "
+                      f"{suggestion.distance} edits, {elapsed_us:.0f} us)")
+    elif args.command == "prefix":
+        for slug in index.with_prefix(args.prefix):
+            print(slug)
+    else:
+        updated = regenerate_known_slugs(index)
+        if args.write:
+            URL_VALIDATOR_JS.write_text(updated, encoding="utf-8")
+            known_valid_slugs.cache_clear()
+            print(f"[slugs] {len(known_valid_slugs()):,} known slugs written to {URL_VALIDATOR_JS}",
+                  file=sys.stderr)
+        else:
+            added = len(re.findall(r"^    '", updated, re.M)) - len(re.findall(
+                r"^    '", URL_VALIDATOR_JS.read_text(encoding="utf-8"), re.M))
+            print(f"[slugs] {added:+,} slug lines (run with --write to apply)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+text_similarity.py
+
+Python port of textSimilarity() from src/utils/stringHelpers.js.
+
+The scores must match the JS function exactly, because the 0.85 duplicate
+threshold in questionHelpers.js is applied to them. The port reproduces the
+JS details that affect the result:
+
+  - normalization: lowercase, strip <tags>, collapse whitespace, trim, where
+    "whitespace" is the JavaScript \\s set (which includes U+FEFF)
+  - lengths and edit distance are counted in UTF-16 code units, like JS
+    string indexing, so text with emoji/astral characters scores the same
+  - strings longer than 500 units use word-set Jaccard instead of Levenshtein
+
+Edit distance uses the Myers/Hyyrö bit-parallel algorithm
+(BitParallelPattern), and SimilarityQuery scores one text against many
+candidates while reusing the query's bit masks. levenshtein() is kept as
+the plain reference port. bench_similarity.py checks both against the
+shared fixture src/utils/textSimilarity.fixture.json and times them.
+"""
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from question_io import JS_WHITESPACE
+
+# =========================
+# CONFIG
+# =========================
+DUPLICATE_THRESHOLD = 0.85      # questionHelpers.js default
+LONG_TEXT_LENGTH = 500          # above this, textSimilarity switches to word Jaccard
+
+_TAG_RE = re.compile(r"<[^>]*>")
+_ASTRAL_RE = re.compile("[\U00010000-\U0010ffff]")
+_WS_RUN_RE = re.compile("[" + re.escape(JS_WHITESPACE) + "]+")
+
+Units = str   # UTF-16 code units, see utf16_units()
+
+
+def normalize(text: str) -> str:
+    """
+    Same as the normalize() closure inside textSimilarity.
+    """
+    text = _TAG_RE.sub("", text.lower())
+    return _WS_RUN_RE.sub(" ", text).strip(JS_WHITESPACE)
+
+
+def _surrogate_pair(match: "re.Match") -> str:
+    offset = ord(match.group()) - 0x10000
+    return chr(0xD800 + (offset >> 10)) + chr(0xDC00 + (offset & 0x3FF))
+
+
+def utf16_units(text: str) -> Units:
+    """
+    `text` indexed like a JS string: a str of UTF-16 code units, with each
+    astral character as its surrogate pair (all-BMP text comes back as is).
+    Both sides of a comparison must use this form, so a pair where only one
+    text has an emoji still compares unit by unit.
+    """
+    if text.isascii() or max(text) <= "\uffff":
+        return text
+    return _ASTRAL_RE.sub(_surrogate_pair, text)
+
+
+def levenshtein(a: Units, b: Units) -> int:
+    """
+    Edit distance with unit costs, the same recurrence as the JS matrix
+    (kept to two rows).
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        previous = current
+    return previous[-1]
+
+
+class BitParallelPattern:
+    """
+    Myers/Hyyrö bit-parallel edit distance with a fixed pattern.
+
+    The pattern's match masks are built once, after which each distance
+    costs one pass over the other text with a handful of integer ops per
+    character (Python ints act as arbitrarily wide bit vectors, so no
+    blocking is needed up to the 500-unit cutoff). Results are identical
+    to levenshtein().
+    """
+
+    def __init__(self, pattern: Units):
+        self.length = len(pattern)
+        self._full = (1 << self.length) - 1
+        self._last = 1 << (self.length - 1) if self.length else 0
+        peq = {}
+        for i, unit in enumerate(pattern):
+            peq[unit] = peq.get(unit, 0) | (1 << i)
+        self._peq = peq
+
+    def distance(self, text: Units, max_dist: Optional[int] = None) -> int:
+        """
+        Edit distance to `text`. With max_dist, returns max_dist + 1 as soon
+        as the distance is known to exceed it.
+        """
+        m, n = self.length, len(text)
+        if max_dist is not None and abs(m - n) > max_dist:
+            return max_dist + 1
+        if m == 0:
+            return n
+
+        full, last, peq = self._full, self._last, self._peq
+        pv, mv, score = full, 0, m
+        for j, unit in enumerate(text, start=1):
+            eq = peq.get(unit, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | (~(xh | pv) & full)
+            mh = pv & xh
+            if ph & last:
+                score += 1
+            elif mh & last:
+                score -= 1
+            # Each remaining column moves the score by at most one
+            if max_dist is not None and score - (n - j) > max_dist:
+                return max_dist + 1
+            ph = ((ph << 1) | 1) & full
+            mh = (mh << 1) & full
+            pv = mh | (~(xv | ph) & full)
+            mv = ph & xv
+        if max_dist is not None and score > max_dist:
+            return max_dist + 1
+        return score
+
+
+def levenshtein_within(a: Units, b: Units, max_dist: int) -> int:
+    """
+    Edit distance if it is <= max_dist, otherwise max_dist + 1.
+    """
+    return BitParallelPattern(a).distance(b, max_dist)
+
+
+def _max_distance(max_len: int, threshold: float) -> int:
+    """
+    Largest d with 1 - d / max_len >= threshold, in float arithmetic like JS (-1 if none).
+    """
+    max_dist = min(int((1 - threshold) * max_len) + 1, max_len)
+    while max_dist >= 0 and 1 - (max_dist / max_len) < threshold:
+        max_dist -= 1
+    return max_dist
+
+
+def word_jaccard(a: str, b: str) -> float:
+    words_a = set(a.split(" "))
+    words_b = set(b.split(" "))
+    union = len(words_a | words_b)
+    return len(words_a & words_b) / union if union > 0 else 0
+
+
+class SimilarityQuery:
+    """
+    One text scored against many: textSimilarity(query, candidate) for each
+    candidate, sharing the query's normalization and bit-parallel masks.
+
+    Scores are identical to text_similarity(); the argument order does not
+    matter because the JS score is symmetric.
+    """
+
+    def __init__(self, text: Optional[str]):
+        self.empty = not text
+        normalized = normalize(str(text)) if text else ""
+        self._init(normalized, utf16_units(normalized))
+
+    @classmethod
+    def from_normalized(cls, normalized: str, units: Optional[Units] = None) -> "SimilarityQuery":
+        query = cls.__new__(cls)
+        query.empty = False
+        query._init(normalized, utf16_units(normalized) if units is None else units)
+        return query
+
+    def _init(self, normalized: str, units: Units) -> None:
+        self.normalized = normalized
+        self.units = units
+        self._pattern = None
+
+    @property
+    def pattern(self) -> BitParallelPattern:
+        if self._pattern is None:
+            self._pattern = BitParallelPattern(self.units)
+        return self._pattern
+
+    def score_normalized(self, other: str, other_units: Optional[Units] = None) -> float:
+        """
+        Similarity to an already-normalized text.
+        """
+        a, a_units = self.normalized, self.units
+        if a == other:
+            return 1
+        b_units = utf16_units(other) if other_units is None else other_units
+        if len(a_units) == 0 or len(b_units) == 0:
+            return 0
+        if len(a_units) > LONG_TEXT_LENGTH or len(b_units) > LONG_TEXT_LENGTH:
+            return word_jaccard(a, other)
+        max_len = max(len(a_units), len(b_units))
+        return 1 - (self.pattern.distance(b_units) / max_len)
+
+    def score_if_at_least(self, other: str, threshold: float,
+                          other_units: Optional[Units] = None) -> Optional[float]:
+        """
+        score_normalized(other) when it is >= threshold, else None. Rejects
+        early on length and stops the distance scan once the threshold is
+        out of reach.
+        """
+        a, a_units = self.normalized, self.units
+        if a == other:
+            return 1 if 1 >= threshold else None
+        b_units = utf16_units(other) if other_units is None else other_units
+        if len(a_units) == 0 or len(b_units) == 0:
+            return 0 if 0 >= threshold else None
+        if len(a_units) > LONG_TEXT_LENGTH or len(b_units) > LONG_TEXT_LENGTH:
+            score = word_jaccard(a, other)
+            return score if score >= threshold else None
+
+        max_len = max(len(a_units), len(b_units))
+        max_dist = _max_distance(max_len, threshold)
+        if max_dist < 0 or abs(len(a_units) - len(b_units)) > max_dist:
+            return None
+        dist = self.pattern.distance(b_units, max_dist)
+        if dist > max_dist:
+            return None
+        return 1 - (dist / max_len)
+
+    def similarity(self, other: Optional[str]) -> float:
+        if self.empty or not other:
+            return 0
+        return self.score_normalized(normalize(str(other)))
+
+    def similarities(self, candidates: Iterable[Optional[str]]) -> List[float]:
+        """
+        Batch API: textSimilarity(query, c) for every candidate, in order.
+        """
+        return [self.similarity(c) for c in candidates]
+
+    def matches(self, candidates: Iterable[Optional[str]],
+                threshold: float = DUPLICATE_THRESHOLD) -> List[Tuple[int, float]]:
+        """
+        (index, score) of every candidate with textSimilarity >= threshold.
+        """
+        if self.empty:
+            return [] if threshold > 0 else [(i, 0) for i, _ in enumerate(candidates)]
+        found = []
+        for i, candidate in enumerate(candidates):
+            if not candidate:
+                score = 0 if 0 >= threshold else None
+            else:
+                score = self.score_if_at_least(normalize(str(candidate)), threshold)
+            if score is not None:
+                found.append((i, score))
+        return found
+
+
+def similarity_normalized(a: str, b: str, a_units: Optional[Units] = None,
+                          b_units: Optional[Units] = None) -> float:
+    """
+    textSimilarity() for strings that are already normalize()d.
+    """
+    return SimilarityQuery.from_normalized(a, a_units).score_normalized(b, b_units)
+
+
+def similarity_if_at_least(a: str, b: str, threshold: float,
+                           a_units: Optional[Units] = None,
+                           b_units: Optional[Units] = None) -> Optional[float]:
+    """
+    similarity_normalized(a, b) when it is >= threshold, else None.
+    """
+    return SimilarityQuery.from_normalized(a, a_units).score_if_at_least(b, threshold, b_units)
+
+
+def text_similarity(str1: Optional[str], str2: Optional[str]) -> float:
+    """
+    Similarity between 0 (different) and 1 (identical), identical to
+    textSimilarity(str1, str2) in stringHelpers.js.
+    """
+    if not str1 or not str2:
+        return 0
+    return similarity_normalized(normalize(str(str1)), normalize(str(str2)))
+
+
+def text_similarity_batch(query: Optional[str], candidates: Iterable[Optional[str]]) -> List[float]:
+    """
+    [text_similarity(query, c) for c in candidates], with the query prepared once.
+    """
+    return SimilarityQuery(query).similarities(candidates)
+
+
+def is_duplicate(str1: Optional[str], str2: Optional[str],
+                 threshold: float = DUPLICATE_THRESHOLD) -> bool:
+    """
+    The questionHelpers.js rule: similarity >= threshold.
+    """
+    return text_similarity(str1, str2) >= threshold
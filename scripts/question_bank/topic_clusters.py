@@ -0,0 +1,403 @@
+"""
+topic_clusters.py
+
+Topic clusters of the question bank, reported per discipline.
+
+quotaEnforcement.js only counts questions by discipline and difficulty, so
+it cannot show that, say, half of "Lighting" is about Lumen GI. This tool
+builds a TF-IDF matrix over each question's text (question, options and
+explanation when the export has one), groups the questions with mini-batch
+spherical k-means, and prints cluster sizes per discipline with each
+cluster's top terms.
+
+The tool is built to handle 100k+ questions on a laptop with only the
+stdlib:
+  - input is streamed: pass 1 counts document frequencies, pass 2 builds the
+    matrix, and a final pass only fetches the example questions
+  - the matrix is stored CSR-style in typed arrays (4-byte term ids and
+    weights), about 8 bytes per non-zero entry
+  - centroids are sparse, pruned to their CENTROID_TERMS heaviest terms and
+    kept in an inverted index (term -> clusters). Scoring a question
+    therefore touches only the clusters that share its terms, not k dense
+    vectors
+  - k-means runs on small random batches (Sculley's mini-batch update), and
+    a single full pass then assigns every question
+
+Rejected questions are skipped by default, like the quota counts.
+
+Usage:
+    python topic_clusters.py question_bank.csv
+    python topic_clusters.py export1.csv export2.csv --clusters 40 --report topics.json
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import time
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from question_io import iter_questions
+
+# =========================
+# CONFIG
+# =========================
+DEFAULT_CLUSTERS = 30
+BATCH_SIZE = 1024
+DEFAULT_BATCHES = 150
+CENTROID_TERMS = 300       # non-zero terms kept per centroid
+MAX_FEATURES = 20_000      # vocabulary size (most frequent terms)
+MIN_DF = 3                 # terms in fewer questions are dropped
+MAX_DF = 0.5               # terms in more than this share of questions are dropped
+DF_PRUNE_AT = 500_000      # distinct terms tracked in pass 1 before singletons are pruned
+INIT_SAMPLE = 4_000        # rows sampled for k-means++ seeding
+TOP_TERMS = 8
+EXAMPLES_PER_CLUSTER = 3
+REJECTED_STATUS = "rejected"
+
+_TAG_RE = re.compile(r"<[^>]*>")
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+_STOP_WORDS = frozenset("""
+a an and are as at be by can do does for from has have how if in into is it its
+of on or that the this to was what when which who why will with you your
+following true false none all above below not use used using should would
+""".split())
+
+
+def question_text(q: Dict) -> str:
+    """
+    Question, options and explanation as one string.
+    """
+    options = q.get("options") or {}
+    parts = [q.get("question")]
+    parts.extend(options.values() if isinstance(options, dict) else options)
+    parts.append(q.get("explanation"))
+    return " ".join(str(p) for p in parts if p)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(_TAG_RE.sub(" ", text.lower()))
+            if len(t) > 1 and t not in _STOP_WORDS]
+
+
+def iter_bank(paths: Sequence[Path], include_rejected: bool = False) -> Iterator[Dict]:
+    """
+    Questions from every input in order, streamed.
+    """
+    for path in paths:
+        for q in iter_questions(path):
+            if include_rejected or q.get("status") != REJECTED_STATUS:
+                yield q
+
+
+class Vocabulary:
+    """
+    Term -> column id and IDF weights, from one streaming pass over the bank.
+    """
+
+    def __init__(self, terms: List[str], df: Sequence[int], documents: int):
+        self.terms = terms
+        self.ids = {t: i for i, t in enumerate(terms)}
+        # Smoothed IDF, as in scikit-learn's TfidfVectorizer
+        self.idf = array("f", (math.log((1 + documents) / (1 + d)) + 1 for d in df))
+
+    @classmethod
+    def fit(cls, texts: Iterable[str], max_features: int = MAX_FEATURES,
+            min_df: int = MIN_DF, max_df: float = MAX_DF) -> "Vocabulary":
+        df = Counter()
+        documents = 0
+        for text in texts:
+            documents += 1
+            df.update(set(tokenize(text)))
+            if len(df) > DF_PRUNE_AT:
+                # Bounded memory: forget terms seen once so far (they cannot
+                # reach a useful min_df unless they are very late bloomers)
+                for term in [t for t, c in df.items() if c == 1]:
+                    del df[term]
+        cutoff = max_df * documents
+        kept = [(t, c) for t, c in df.items() if min_df <= c <= cutoff]
+        kept.sort(key=lambda tc: (-tc[1], tc[0]))
+        kept = kept[:max_features]
+        return cls([t for t, _ in kept], [c for _, c in kept], documents)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def vector(self, text: str) -> List[Tuple[int, float]]:
+        """
+        L2-normalized sublinear TF-IDF vector as sorted (term id, weight) pairs.
+        """
+        counts = Counter(t for t in tokenize(text) if t in self.ids)
+        weights = [(self.ids[t], (1 + math.log(c)) * self.idf[self.ids[t]]) for t, c in counts.items()]
+        norm = math.sqrt(sum(w * w for _, w in weights))
+        return sorted((i, w / norm) for i, w in weights) if norm else []
+
+
+class SparseMatrix:
+    """
+    Append-only CSR matrix in typed arrays.
+    """
+
+    def __init__(self):
+        self.indptr = array("Q", [0])
+        self.indices = array("I")
+        self.data = array("f")
+
+    def append(self, vector: List[Tuple[int, float]]) -> None:
+        for i, w in vector:
+            self.indices.append(i)
+            self.data.append(w)
+        self.indptr.append(len(self.indices))
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def row(self, r: int) -> Tuple[Sequence[int], Sequence[float]]:
+        start, end = self.indptr[r], self.indptr[r + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self.indptr, self.indices, self.data))
+
+
+def _prune(vector: Dict[int, float], terms: int = CENTROID_TERMS) -> Dict[int, float]:
+    """
+    Keep the heaviest `terms` entries and L2-normalize (spherical k-means).
+    """
+    if len(vector) > terms:
+        vector = dict(sorted(vector.items(), key=lambda tw: -tw[1])[:terms])
+    norm = math.sqrt(sum(w * w for w in vector.values()))
+    return {t: w / norm for t, w in vector.items()} if norm else {}
+
+
+class MiniBatchKMeans:
+    """
+    Mini-batch spherical k-means over a SparseMatrix with sparse, pruned
+    centroids indexed by term.
+    """
+
+    def __init__(self, clusters: int = DEFAULT_CLUSTERS, batch_size: int = BATCH_SIZE,
+                 batches: int = DEFAULT_BATCHES, seed: int = 0):
+        self.k = clusters
+        self.batch_size = batch_size
+        self.batches = batches
+        self.rng = random.Random(seed)
+        self.centroids: List[Dict[int, float]] = []
+        self._inverted: Dict[int, List[Tuple[int, float]]] = {}
+
+    def _reindex(self) -> None:
+        inverted = defaultdict(list)
+        for c, centroid in enumerate(self.centroids):
+            for t, w in centroid.items():
+                inverted[t].append((c, w))
+        self._inverted = dict(inverted)
+
+    def score(self, indices: Sequence[int], data: Sequence[float]) -> Tuple[int, float]:
+        """
+        (closest cluster, cosine similarity); cluster -1 if no centroid shares a term.
+        """
+        scores = [0.0] * len(self.centroids)
+        inverted = self._inverted
+        for t, w in zip(indices, data):
+            for c, cw in inverted.get(t, ()):
+                scores[c] += w * cw
+        best = max(range(len(scores)), key=scores.__getitem__)
+        return (best, scores[best]) if scores[best] > 0 else (-1, 0.0)
+
+    def _seed(self, matrix: SparseMatrix) -> None:
+        """
+        k-means++ seeding on a random sample of non-empty rows.
+        """
+        rows = [r for r in range(len(matrix)) if matrix.indptr[r + 1] > matrix.indptr[r]]
+        sample = self.rng.sample(rows, min(len(rows), INIT_SAMPLE))
+        vectors = [dict(zip(*matrix.row(r))) for r in sample]
+        if len(vectors) < self.k:
+            raise ValueError(f"only {len(vectors)} non-empty questions for {self.k} clusters")
+
+        def similarity(a: Dict[int, float], b: Dict[int, float]) -> float:
+            if len(a) > len(b):
+                a, b = b, a
+            return sum(w * b.get(t, 0.0) for t, w in a.items())
+
+        first = self.rng.randrange(len(vectors))
+        self.centroids = [_prune(vectors[first])]
+        distance = [1 - similarity(v, self.centroids[0]) for v in vectors]
+        while len(self.centroids) < self.k:
+            weights = [d * d for d in distance]
+            if sum(weights) <= 0:
+                pick = self.rng.randrange(len(vectors))
+            else:
+                pick = self.rng.choices(range(len(vectors)), weights=weights)[0]
+            centroid = _prune(vectors[pick])
+            self.centroids.append(centroid)
+            distance = [min(d, 1 - similarity(v, centroid)) for d, v in zip(distance, vectors)]
+        self._reindex()
+
+    def fit(self, matrix: SparseMatrix) -> "MiniBatchKMeans":
+        self._seed(matrix)
+        seen = [0] * self.k
+        n = len(matrix)
+        for _ in range(self.batches):
+            sums: Dict[int, Dict[int, float]] = defaultdict(dict)
+            sizes = Counter()
+            for r in self.rng.sample(range(n), min(n, self.batch_size)):
+                indices, data = matrix.row(r)
+                c, _ = self.score(indices, data)
+                if c < 0:
+                    continue
+                sizes[c] += 1
+                acc = sums[c]
+                for t, w in zip(indices, data):
+                    acc[t] = acc.get(t, 0.0) + w
+            for c, size in sizes.items():
+                # Per-center learning rate 1/count, applied to the batch mean
+                seen[c] += size
+                eta = size / seen[c]
+                updated = {t: (1 - eta) * w for t, w in self.centroids[c].items()}
+                for t, w in sums[c].items():
+                    updated[t] = updated.get(t, 0.0) + eta * w / size
+                self.centroids[c] = _prune(updated)
+            self._reindex()
+        return self
+
+    def predict(self, matrix: SparseMatrix) -> Tuple[array, array]:
+        """
+        Cluster and similarity for every row.
+        """
+        labels, scores = array("i"), array("f")
+        for r in range(len(matrix)):
+            c, s = self.score(*matrix.row(r))
+            labels.append(c)
+            scores.append(s)
+        return labels, scores
+
+
+def build_report(labels: Sequence[int], scores: Sequence[float], disciplines: Sequence[int],
+                 discipline_names: List[str], model: MiniBatchKMeans, vocabulary: Vocabulary,
+                 examples: Dict[int, List[str]]) -> Dict:
+    """
+    Cluster sizes overall and per discipline, top terms and example questions.
+
+    "lift" is a cluster's share within a discipline divided by its share of
+    the whole bank, so values well above 1 flag topics a discipline
+    over-represents.
+    """
+    total = len(labels)
+    sizes = Counter(labels)
+    per_discipline: Dict[int, Counter] = defaultdict(Counter)
+    for label, d in zip(labels, disciplines):
+        per_discipline[d][label] += 1
+
+    clusters = []
+    for c in sorted(sizes, key=lambda c: -sizes[c]):
+        overall_share = sizes[c] / total
+        if c < 0:
+            top_terms = []
+        else:
+            top = sorted(model.centroids[c].items(), key=lambda tw: -tw[1])[:TOP_TERMS]
+            top_terms = [vocabulary.terms[t] for t, _ in top]
+        by_discipline = {}
+        for d, counts in sorted(per_discipline.items(), key=lambda dc: discipline_names[dc[0]]):
+            if counts[c]:
+                share = counts[c] / sum(counts.values())
+                by_discipline[discipline_names[d]] = {
+                    "questions": counts[c],
+                    "share": round(share, 4),
+                    "lift": round(share / overall_share, 2),
+                }
+        clusters.append({
+            "cluster": c,
+            "questions": sizes[c],
+            "share": round(overall_share, 4),
+            "top_terms": top_terms,
+            "by_discipline": by_discipline,
+            "examples": examples.get(c, []),
+        })
+    return {
+        "questions": total,
+        "clusters": clusters,
+        "disciplines": {
+            discipline_names[d]: sum(counts.values()) for d, counts in sorted(per_discipline.items())
+        },
+    }
+
+
+def _examples(paths: Sequence[Path], include_rejected: bool, labels: Sequence[int],
+              scores: Sequence[float]) -> Dict[int, List[str]]:
+    """
+    Texts of the questions closest to each centroid, fetched with one more streaming pass.
+    """
+    best: Dict[int, List[Tuple[float, int]]] = defaultdict(list)
+    for r, (c, s) in enumerate(zip(labels, scores)):
+        if c >= 0:
+            best[c].append((s, r))
+    wanted = {}
+    for c, candidates in best.items():
+        for _, r in sorted(candidates, reverse=True)[:EXAMPLES_PER_CLUSTER]:
+            wanted[r] = c
+    examples: Dict[int, List[str]] = defaultdict(list)
+    for r, q in enumerate(iter_bank(paths, include_rejected)):
+        if r in wanted:
+            examples[wanted[r]].append(str(q.get("question") or "")[:160])
+    return examples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TF-IDF topic clusters of the question bank per discipline")
+    parser.add_argument("inputs", type=Path, nargs="+", help="exported CSV(s), or .json/.jsonl banks")
+    parser.add_argument("--clusters", type=int, default=DEFAULT_CLUSTERS)
+    parser.add_argument("--batches", type=int, default=DEFAULT_BATCHES, help="mini-batch iterations")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-features", type=int, default=MAX_FEATURES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--include-rejected", action="store_true")
+    parser.add_argument("--report", type=Path, default=None, help="write the full report as JSON")
+    args = parser.parse_args()
+
+    if args.clusters < 1:
+        parser.error("--clusters must be at least 1")
+
+    started = time.monotonic()
+    texts = (question_text(q) for q in iter_bank(args.inputs, args.include_rejected))
+    vocabulary = Vocabulary.fit(texts, args.max_features)
+
+    matrix = SparseMatrix()
+    disciplines = array("H")
+    discipline_ids: Dict[str, int] = {}
+    for q in iter_bank(args.inputs, args.include_rejected):
+        matrix.append(vocabulary.vector(question_text(q)))
+        name = q.get("discipline") or "Unknown"
+        disciplines.append(discipline_ids.setdefault(name, len(discipline_ids)))
+    print(f"[topics] {len(matrix):,} questions x {len(vocabulary):,} terms, {len(matrix.data):,} non-zeros "
+          f"({matrix.nbytes / 1e6:.1f} MB) in {time.monotonic() - started:.1f}s", file=sys.stderr)
+
+    try:
+        model = MiniBatchKMeans(args.clusters, args.batch_size, args.batches, args.seed).fit(matrix)
+    except ValueError as e:
+        parser.error(str(e))
+    labels, scores = model.predict(matrix)
+    examples = _examples(args.inputs, args.include_rejected, labels, scores)
+    names = sorted(discipline_ids, key=discipline_ids.get)
+    report = build_report(labels, scores, disciplines, names, model, vocabulary, examples)
+    print(f"[topics] {args.clusters} clusters in {time.monotonic() - started:.1f}s total", file=sys.stderr)
+
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"[topics] report written to {args.report}", file=sys.stderr)
+
+    for cluster in report["clusters"]:
+        label = "unassigned" if cluster["cluster"] < 0 else f"#{cluster['cluster']}"
+        print(f"{label:>10}  {cluster['questions']:>7,}  {cluster['share']:6.1%}  {' '.join(cluster['top_terms'])}")
+        for discipline, stats in cluster["by_discipline"].items():
+            flag = "  <- over-represented" if stats["lift"] >= 2 and stats["questions"] >= 10 else ""
+            print(f"{'':>20}{discipline:<28} {stats['questions']:>7,}  {stats['share']:6.1%}  "
+                  f"lift {stats['lift']:.2f}{flag}")
+
+
+if __name__ == "__main__":
+    main()
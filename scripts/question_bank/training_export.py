@@ -0,0 +1,552 @@
+"""
+training_export.py
+
+Export fine-tuning data from the analytics store as sharded JSONL, in
+constant memory.
+
+exportTrainingData / exportGoodTrainingData in src/utils/analyticsStore.js
+filter every question into arrays and return one JSONL blob. This exporter
+streams the same records instead: question events are decoded one at a
+time (from the ue5_analytics JSON the `questions` array is read item by item
+and everything else is skipped), each qualifying record is written to the
+current shard of its split, and a shard is closed once it reaches
+--max-shard-bytes (uncompressed) or --max-shard-records. Memory does not
+grow with the history.
+
+Records are the JS ones:
+  negative_example   status "rejected", critiqueScore < --min-critique-score (70)
+                     or qualityScore < 60
+  positive_example   status "accepted" and qualityScore or critiqueScore
+                     >= --min-quality-score (75)
+--kind all writes both (like downloadTrainingData('all')), so a question can
+yield one record of each label.
+
+With --validation F, each question goes to the validation split when the
+hash of its id (BLAKE2b, optionally salted with --split-salt) falls in the
+first F of the hash range, otherwise to train. The split of a question
+therefore never changes between runs, shard sizes or history lengths.
+
+Output (--output-dir):
+  <prefix>-train-00000.jsonl[.gz], <prefix>-validation-00000.jsonl[.gz], ...
+  (<prefix>-00000.jsonl[.gz] without --validation)
+  manifest.json   shard list with record and byte counts, and the options used
+
+Shards are written under a .tmp name and renamed when complete. Questions
+are not de-duplicated by id (the app's logQuestion already keeps one event
+per id).
+
+Usage:
+    python training_export.py ue5_analytics.json --output-dir training/
+    python training_export.py ue5_analytics.json --kind bad --validation 0.1 --gzip
+    python training_export.py events.jsonl --max-shard-records 50000 --max-shard-bytes 256M
+    python training_export.py --self-test
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from columnar_export import load_analytics
+from csv_export import js_truthy
+from question_io import _iter_json_array, _iter_json_member
+
+try:
+    import resource
+except ImportError:  # not on Windows: the self-test just skips the memory figures
+    resource = None
+
+# =========================
+# CONFIG
+# =========================
+MIN_CRITIQUE_SCORE = 70     # exportTrainingData default
+MIN_QUALITY_SCORE = 75      # exportGoodTrainingData default
+LOW_QUALITY_SCORE = 60      # exportTrainingData: qualityScore < 60 is always negative
+MAX_SHARD_BYTES = 64 << 20
+DEFAULT_PREFIX = "ue5_training"
+KINDS = ("bad", "good", "all")
+GZIP_LEVEL = 6
+WRITE_BUFFER_BYTES = 1 << 20
+MANIFEST_NAME = "manifest.json"
+SIZE_SUFFIXES = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+_MISSING = object()
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+# (record key, question event key), in the order the JS objects list them
+NEGATIVE_FIELDS = (
+    ("id", "id"), ("created", "created"), ("discipline", "discipline"), ("difficulty", "difficulty"),
+    ("type", "type"), ("question", "questionText"), ("qualityScore", "qualityScore"),
+    ("critiqueScore", "critiqueScore"), ("critiqueText", "critiqueText"), ("status", "status"),
+    ("wasRewritten", "wasRewritten"),
+)
+POSITIVE_FIELDS = (
+    ("id", "id"), ("created", "created"), ("discipline", "discipline"), ("difficulty", "difficulty"),
+    ("type", "type"), ("question", "questionText"), ("qualityScore", "qualityScore"),
+    ("critiqueScore", "critiqueScore"),
+)
+
+
+def _js_number(value: Any) -> float:
+    """
+    Number(value) for JSON values, as the JS comparisons coerce them
+    (null -> 0, undefined -> NaN).
+    """
+    if value is _MISSING:
+        return math.nan
+    if value is None:
+        return 0.0
+    if isinstance(value, (bool, int, float)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return 0.0
+        try:
+            return float(text)
+        except ValueError:
+            return math.nan
+    return math.nan
+
+
+def _record(q: Dict, fields) -> Dict:
+    # JSON.stringify leaves out undefined properties
+    record = {}
+    for key, source in fields:
+        value = q.get(source, _MISSING)
+        if value is not _MISSING:
+            record[key] = value
+    return record
+
+
+def negative_example(q: Dict, min_critique_score: float = MIN_CRITIQUE_SCORE) -> Optional[Dict]:
+    """
+    The exportTrainingData record for a question event, or None if it does not qualify.
+    """
+    critique = q.get("critiqueScore")
+    quality = q.get("qualityScore")
+    if not (q.get("status") == "rejected"
+            or (critique is not None and _js_number(critique) < min_critique_score)
+            or (quality is not None and _js_number(quality) < LOW_QUALITY_SCORE)):
+        return None
+    record = _record(q, NEGATIVE_FIELDS)
+    record["label"] = "negative_example"
+    critique_text = q.get("critiqueText")
+    record["reason"] = critique_text if js_truthy(critique_text) else "Rejected by user"
+    return record
+
+
+def positive_example(q: Dict, min_quality_score: float = MIN_QUALITY_SCORE) -> Optional[Dict]:
+    """
+    The exportGoodTrainingData record for a question event, or None if it does not qualify.
+    """
+    if q.get("status") != "accepted" or not (
+            _js_number(q.get("qualityScore", _MISSING)) >= min_quality_score
+            or _js_number(q.get("critiqueScore", _MISSING)) >= min_quality_score):
+        return None
+    record = _record(q, POSITIVE_FIELDS)
+    record["label"] = "positive_example"
+    return record
+
+
+def to_jsonl(record: Dict) -> str:
+    """
+    JSON.stringify(record) plus a newline.
+    """
+    return _ENCODER.encode(record) + "\n"
+
+
+class HashSplitter:
+    """
+    Deterministic train/validation assignment from the hash of a question id.
+    """
+
+    def __init__(self, validation_fraction: float, salt: str = ""):
+        if not 0.0 <= validation_fraction <= 1.0:
+            raise ValueError("validation fraction must be between 0 and 1")
+        self.validation_fraction = validation_fraction
+        self.salt = salt.encode("utf-8")
+        self._threshold = int(validation_fraction * (1 << 64))
+
+    def split(self, question_id: Any) -> str:
+        if not self.validation_fraction:
+            return "all"
+        digest = hashlib.blake2b(self.salt + str(question_id).encode("utf-8"), digest_size=8).digest()
+        return "validation" if int.from_bytes(digest, "big") < self._threshold else "train"
+
+
+def shard_name(prefix: str, split: str, index: int, compress: bool) -> str:
+    stem = prefix if split == "all" else f"{prefix}-{split}"
+    return f"{stem}-{index:05d}.jsonl" + (".gz" if compress else "")
+
+
+class ShardWriter:
+    """
+    JSONL shards for one split. A shard is closed before a record that
+    would take it past max_bytes (uncompressed) or max_records; a single
+    record larger than max_bytes gets a shard of its own.
+    """
+
+    def __init__(self, output_dir: Path, prefix: str, split: str, max_bytes: int = MAX_SHARD_BYTES,
+                 max_records: Optional[int] = None, compress: bool = False):
+        self.output_dir = Path(output_dir)
+        self.prefix = prefix
+        self.split = split
+        self.max_bytes = max_bytes
+        self.max_records = max_records
+        self.compress = compress
+        self.shards: List[Dict] = []
+        self._file = None
+        self._raw = None
+        self._tmp: Optional[Path] = None
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+        self._records = 0
+        self._bytes = 0
+
+    def _open(self) -> None:
+        name = shard_name(self.prefix, self.split, len(self.shards), self.compress)
+        self._tmp = self.output_dir / (name + ".tmp")
+        self._raw = self._tmp.open("wb")
+        self._file = (gzip.GzipFile(filename="", mode="wb", fileobj=self._raw, mtime=0, compresslevel=GZIP_LEVEL)
+                      if self.compress else self._raw)
+        self.shards.append({"path": name, "split": self.split, "records": 0, "bytes": 0})
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._file.write(b"".join(self._pending))
+            self._pending = []
+            self._pending_bytes = 0
+
+    def _finish(self) -> None:
+        self._flush()
+        if self._file is not self._raw:
+            self._file.close()
+        self._raw.close()
+        os.replace(self._tmp, self.output_dir / self.shards[-1]["path"])
+        self.shards[-1].update(records=self._records, bytes=self._bytes)
+        self._file = self._raw = self._tmp = None
+        self._records = self._bytes = 0
+
+    def write(self, line: str) -> None:
+        data = line.encode("utf-8")
+        if self._file is not None and (
+                self._bytes + len(data) > self.max_bytes
+                or (self.max_records is not None and self._records >= self.max_records)):
+            self._finish()
+        if self._file is None:
+            self._open()
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+        self._records += 1
+        self._bytes += len(data)
+        if self._pending_bytes >= WRITE_BUFFER_BYTES:
+            self._flush()
+
+    def close(self) -> List[Dict]:
+        if self._file is not None:
+            self._finish()
+        return self.shards
+
+    def abort(self) -> None:
+        """
+        Drop the shard being written (after an error).
+        """
+        if self._file is not None:
+            if self._file is not self._raw:
+                self._file.close()
+            self._raw.close()
+            self._tmp.unlink(missing_ok=True)
+            self._file = self._raw = self._tmp = None
+
+
+def iter_analytics_questions(path: Path) -> Iterator[Dict]:
+    """
+    Question events, streamed from a ue5_analytics JSON object (its
+    `questions` array), a JSON array of events, or JSONL. A store saved as a
+    JSON string (the raw localStorage value) has to be loaded whole.
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".jsonl":
+        with path.open("r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    q = json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"[training] skipping line {line_no}: {e}", file=sys.stderr)
+                    continue
+                if isinstance(q, dict):
+                    yield q
+        return
+
+    with path.open("r", encoding="utf-8") as f:
+        first = f.read(1 << 10).lstrip()[:1]
+        f.seek(0)
+        if first == "{":
+            items = _iter_json_member(f, "questions")
+        elif first == "[":
+            items = _iter_json_array(f)
+        else:
+            items = iter(load_analytics(path).get("questions") or [])
+        for q in items:
+            if isinstance(q, dict):
+                yield q
+
+
+def export_training_data(source: Path, output_dir: Path, kind: str = "all", validation_fraction: float = 0.0,
+                         split_salt: str = "", max_bytes: int = MAX_SHARD_BYTES, max_records: Optional[int] = None,
+                         compress: bool = False, min_critique_score: float = MIN_CRITIQUE_SCORE,
+                         min_quality_score: float = MIN_QUALITY_SCORE, prefix: str = DEFAULT_PREFIX) -> Dict:
+    """
+    Stream qualifying records from `source` into shards under `output_dir`
+    and write manifest.json.
+
+    Returns:
+        the manifest
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown kind {kind!r}")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stale = sorted(p.name for p in output_dir.glob(f"{prefix}-*.jsonl*"))
+    if stale:
+        raise FileExistsError(f"{output_dir} already has {prefix} shards ({stale[0]}, ...); use an empty directory")
+
+    splitter = HashSplitter(validation_fraction, split_salt)
+    writers: Dict[str, ShardWriter] = {}
+    counts = {"questions": 0, "negative_example": 0, "positive_example": 0}
+    try:
+        for q in iter_analytics_questions(source):
+            counts["questions"] += 1
+            records = []
+            if kind in ("bad", "all"):
+                records.append(negative_example(q, min_critique_score))
+            if kind in ("good", "all"):
+                records.append(positive_example(q, min_quality_score))
+            records = [r for r in records if r is not None]
+            if not records:
+                continue
+            split = splitter.split(q.get("id"))
+            writer = writers.get(split)
+            if writer is None:
+                writer = writers[split] = ShardWriter(output_dir, prefix, split, max_bytes, max_records, compress)
+            for record in records:
+                counts[record["label"]] += 1
+                writer.write(to_jsonl(record))
+        shards = [shard for split in sorted(writers) for shard in writers[split].close()]
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+
+    manifest = {
+        "source": str(source),
+        "kind": kind,
+        "validation_fraction": validation_fraction,
+        "split_salt": split_salt,
+        "min_critique_score": min_critique_score,
+        "min_quality_score": min_quality_score,
+        "counts": counts,
+        "splits": {split: sum(s["records"] for s in shards if s["split"] == split) for split in sorted(writers)},
+        "shards": shards,
+    }
+    tmp = output_dir / (MANIFEST_NAME + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp, output_dir / MANIFEST_NAME)
+    return manifest
+
+
+# ----- self-test -----
+
+def _write_synthetic_store(path: Path, questions: int, generations: int, seed: int = 11) -> None:
+    """
+    A ue5_analytics JSON (generations first, then questions), written as it is generated.
+    """
+    rng = random.Random(seed)
+    words = "actor blueprint lumen nanite material niagara widget level sequence physics".split()
+    with path.open("w", encoding="utf-8") as f:
+        f.write('{"generations": [')
+        for i in range(generations):
+            f.write(("," if i else "") + json.dumps({
+                "id": f"g{i}", "timestamp": "2025-01-01T00:00:00.000Z", "discipline": "Lighting",
+                "tokensUsed": {"input": rng.randint(1, 5000), "output": rng.randint(1, 9000)},
+                "estimatedCost": rng.random() / 100,
+            }))
+        f.write('], "questions": [')
+        for i in range(questions):
+            q = {
+                "id": f"q{i}-{rng.getrandbits(32):08x}", "generationId": f"g{i % max(generations, 1)}",
+                "created": "2025-01-01T00:00:00.000Z",
+                "status": rng.choice(["accepted", "accepted", "rejected", "pending"]),
+                "qualityScore": rng.choice([None, rng.randint(1, 100)]),
+                "discipline": rng.choice(["Lighting", "Materials", "Blueprints"]),
+                "difficulty": rng.choice(["Easy", "Medium", "Hard"]),
+                "critiqueScore": rng.choice([None, rng.randint(1, 100), str(rng.randint(1, 100))]),
+                "critiqueText": rng.choice([None, "", "Ambiguous – two answers fit"]),
+                "questionText": " ".join(rng.choice(words) for _ in range(rng.randint(8, 40))) + " ✓?",
+                "wasRewritten": rng.random() < 0.1,
+            }
+            if rng.random() < 0.1:
+                del q["difficulty"]    # undefined fields are left out of the JSON
+            f.write(("," if i else "") + json.dumps(q, ensure_ascii=False))
+        f.write('], "critiqueActions": [], "summary": {"totalQuestions": %d}}' % questions)
+
+
+def _read_shards(output_dir: Path, manifest: Dict) -> Dict[str, List[str]]:
+    lines: Dict[str, List[str]] = {}
+    for shard in manifest["shards"]:
+        path = output_dir / shard["path"]
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8", newline="") as f:
+            lines.setdefault(shard["split"], []).extend(f)
+    return lines
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KiB on Linux
+
+
+def self_test(questions: int = 150_000, generations: int = 50_000) -> int:
+    """
+    Export a synthetic store with small shards, then check the shards against
+    the whole-array filters, the split rule and the shard limits.
+
+    Returns:
+        failures
+    """
+    failures = 0
+
+    def fail(message: str) -> None:
+        nonlocal failures
+        failures += 1
+        print(f"[training] FAIL {message}", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        source = tmp / "ue5_analytics.json"
+        _write_synthetic_store(source, questions, generations)
+        size_mb = source.stat().st_size / 1e6
+        rss_before = _peak_rss_mb()
+
+        started = time.monotonic()
+        plain = export_training_data(source, tmp / "plain", "all", 0.1, "", max_bytes=2 << 20, max_records=9_000)
+        elapsed = time.monotonic() - started
+        rss_export = _peak_rss_mb()
+        packed = export_training_data(source, tmp / "packed", "all", 0.1, "", max_bytes=5 << 20, compress=True)
+
+        # the JS way: everything in memory, negatives then positives
+        data = load_analytics(source)
+        expected = sorted(
+            [to_jsonl(r) for r in (negative_example(q) for q in data["questions"]) if r is not None]
+            + [to_jsonl(r) for r in (positive_example(q) for q in data["questions"]) if r is not None])
+        rss_reference = _peak_rss_mb()
+
+        splitter = HashSplitter(0.1)
+        plain_lines = _read_shards(tmp / "plain", plain)
+        packed_lines = _read_shards(tmp / "packed", packed)
+        if sorted(line for lines in plain_lines.values() for line in lines) != expected:
+            fail("records differ from the exportTrainingData / exportGoodTrainingData filters")
+        for split, lines in plain_lines.items():
+            if sorted(lines) != sorted(packed_lines.get(split, [])):
+                fail(f"{split}: gzip shards differ from plain shards")
+            if any(splitter.split(json.loads(line)["id"]) != split for line in lines):
+                fail(f"{split}: record in the wrong split")
+        for shard in plain["shards"]:
+            if shard["records"] > 9_000 or shard["bytes"] > 2 << 20:
+                fail(f"{shard['path']} exceeds the shard limits")
+        share = plain["splits"].get("validation", 0) / max(sum(plain["splits"].values()), 1)
+        if abs(share - 0.1) > 0.01:
+            fail(f"validation share {share:.3f}, expected about 0.1")
+        if plain["counts"]["questions"] != questions:
+            fail(f"read {plain['counts']['questions']} questions, expected {questions}")
+        try:
+            export_training_data(source, tmp / "plain")
+            fail("exporting into a directory with shards should fail")
+        except FileExistsError:
+            pass
+
+        records = sum(plain["splits"].values())
+        memory = ""
+        if rss_before is not None:
+            memory = (f"; peak RSS +{rss_export - rss_before:.0f} MB "
+                      f"(in-memory reference +{rss_reference - rss_export:.0f} MB)")
+        print(f"[training] self-test: {records:,} records from {questions:,} questions "
+              f"({size_mb:.0f} MB) in {len(plain['shards'])} shards, {elapsed:.2f}s "
+              f"({size_mb / elapsed:.0f} MB/s){memory}", file=sys.stderr)
+    print(f"[training] self-test: {failures} failures", file=sys.stderr)
+    return failures
+
+
+def _parse_size(value: str) -> int:
+    """
+    A byte count with an optional K / M / G suffix.
+    """
+    text = value.strip().upper().removesuffix("B")
+    multiplier = SIZE_SUFFIXES.get(text[-1:], 1)
+    try:
+        size = int(float(text[:-1] if text[-1:] in SIZE_SUFFIXES else text) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a size: {value!r}")
+    if size < 1:
+        raise argparse.ArgumentTypeError("size must be positive")
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export training data from the analytics store as sharded JSONL")
+    parser.add_argument("store", type=Path, nargs="?", help="ue5_analytics .json, or question events .jsonl")
+    parser.add_argument("--output-dir", type=Path, default=Path("training"))
+    parser.add_argument("--kind", choices=KINDS, default="all", help="bad, good or both (default)")
+    parser.add_argument("--validation", type=float, default=0.0, help="fraction of question ids for validation")
+    parser.add_argument("--split-salt", default="", help="changes which ids land in validation")
+    parser.add_argument("--max-shard-bytes", type=_parse_size, default=MAX_SHARD_BYTES, help="e.g. 64M (uncompressed)")
+    parser.add_argument("--max-shard-records", type=int, default=None)
+    parser.add_argument("--gzip", action="store_true", help="write .jsonl.gz shards")
+    parser.add_argument("--min-critique-score", type=float, default=MIN_CRITIQUE_SCORE)
+    parser.add_argument("--min-quality-score", type=float, default=MIN_QUALITY_SCORE)
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX)
+    parser.add_argument("--self-test", action="store_true", help="export a synthetic store and check the shards")
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(1 if self_test() else 0)
+    if args.store is None:
+        parser.error("give an analytics file or --self-test")
+    if not 0.0 <= args.validation <= 1.0:
+        parser.error("--validation must be between 0 and 1")
+    if args.max_shard_records is not None and args.max_shard_records < 1:
+        parser.error("--max-shard-records must be positive")
+
+    started = time.monotonic()
+    try:
+        manifest = export_training_data(
+            args.store, args.output_dir, args.kind, args.validation, args.split_salt, args.max_shard_bytes,
+            args.max_shard_records, args.gzip, args.min_critique_score, args.min_quality_score, args.prefix)
+    except FileExistsError as e:
+        print(f"[training] {e}", file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.monotonic() - started
+
+    for shard in manifest["shards"]:
+        print(f"  {shard['records']:>10,}  {shard['path']}")
+    counts = manifest["counts"]
+    splits = ", ".join(f"{split}={n:,}" for split, n in manifest["splits"].items())
+    print(f"[training] {counts['questions']:,} questions -> {counts['negative_example']:,} negative, "
+          f"{counts['positive_example']:,} positive ({splits}) in {len(manifest['shards'])} shards "
+          f"({elapsed:.2f}s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
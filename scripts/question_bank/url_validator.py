@@ -0,0 +1,269 @@
+"""
+url_validator.py
+
+Bulk port of validateURL() from src/utils/urlValidator.js for exported
+question banks.
+
+Results are identical to the JS function: same checks in the same order,
+same confidence values (0/10/20/100/60/40/30/70) and the same warning
+strings. The JS checks are restructured for bulk use:
+
+  - KNOWN_VALID_SLUGS is read once from urlValidator.js into a frozenset,
+    so the curated list has a single source of truth
+  - INVALID_PATTERNS and REQUIRES_SUFFIX_PATTERNS each become one compiled
+    alternation (every pattern in a list yields the same result, so
+    "first match wins" and "any match" agree)
+  - a bank's distinct URLs are validated once and fanned out over worker
+    processes (only URL strings cross the process boundary, not question
+    objects)
+
+src/utils/urlValidator.fixture.json holds the JS results for a shared set
+of URLs, and `python url_validator.py --check-fixture` compares against it.
+
+Usage:
+    python url_validator.py question_bank.csv
+    python url_validator.py bank.jsonl --output url_report.jsonl --invalid-only
+    python url_validator.py bank.csv --suggest --output url_report.jsonl
+    python url_validator.py --check-fixture
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from functools import lru_cache
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence
+
+from question_io import JS_WHITESPACE, iter_questions
+
+# =========================
+# CONFIG
+# =========================
+REPO_ROOT = Path(__file__).resolve().parents[2]
+URL_VALIDATOR_JS = REPO_ROOT / "src" / "utils" / "urlValidator.js"
+FIXTURE_PATH = REPO_ROOT / "src" / "utils" / "urlValidator.fixture.json"
+BASE_URL = "https://dev.epicgames.com/documentation/en-us/unreal-engine/"
+SUFFIX = "-in-unreal-engine"
+PARALLEL_MIN_URLS = 20_000     # below this, worker start-up costs more than it saves
+CHUNK_SIZE = 2_000
+
+# INVALID_PATTERNS as one alternation. JS `$` without the m flag only matches
+# at the very end, i.e. Python's \Z; JS \d is ASCII-only.
+INVALID_SLUG_RE = re.compile(
+    r"\Aunreal-engine-[0-9]+\Z"     # unreal-engine-5
+    r"|\Aunreal-engine\Z"           # too generic
+    r"|\Aue[0-9]+\Z"                # ue5
+    r"|\Aoverview\Z"                # too generic
+    r"|\Aintroduction\Z"            # too generic
+    r"|[" + re.escape(JS_WHITESPACE) + r"]"   # contains spaces
+    r"|[A-Z]"                       # contains uppercase
+    r"|\A[a-z]+\Z"                  # single word without hyphens (e.g., "nanite")
+)
+
+# REQUIRES_SUFFIX_PATTERNS: terms that usually come with "-in-unreal-engine"
+REQUIRES_SUFFIX_TERMS = (
+    "nanite", "lumen", "niagara", "chaos", "blueprint", "landscape",
+    "material", "animation", "skeletal", "world-partition", "virtual-shadow",
+    "sequencer", "umg", "gameplay",
+)
+REQUIRES_SUFFIX_RE = re.compile("|".join(re.escape(t) for t in REQUIRES_SUFFIX_TERMS))
+
+_SLUG_SET_RE = re.compile(r"const KNOWN_VALID_SLUGS = new Set\(\[(.*?)\]\);", re.S)
+_JS_STRING_RE = re.compile(r"'([^'\\]*)'")
+_JS_COMMENT_RE = re.compile(r"//[^\n]*")
+
+
+class URLValidation(NamedTuple):
+    is_valid: bool
+    confidence: int
+    warning: Optional[str]
+
+    def as_dict(self) -> Dict:
+        """
+        The JS return value: {isValid, confidence, warning}.
+        """
+        return {"isValid": self.is_valid, "confidence": self.confidence, "warning": self.warning}
+
+
+@lru_cache(maxsize=1)
+def known_valid_slugs(source: Path = URL_VALIDATOR_JS) -> FrozenSet[str]:
+    """
+    KNOWN_VALID_SLUGS from urlValidator.js, parsed once per process.
+    """
+    text = Path(source).read_text(encoding="utf-8")
+    match = _SLUG_SET_RE.search(text)
+    if match is None:
+        raise ValueError(f"KNOWN_VALID_SLUGS not found in {source}")
+    return frozenset(_JS_STRING_RE.findall(_JS_COMMENT_RE.sub("", match.group(1))))
+
+
+def _utf16_length(text: str) -> int:
+    return len(text.encode("utf-16-le", "surrogatepass")) // 2
+
+
+def validate_url(url: Optional[str], known_slugs: Optional[FrozenSet[str]] = None) -> URLValidation:
+    """
+    Same checks, confidence and warnings as validateURL() in urlValidator.js.
+    """
+    if not url or url.strip(JS_WHITESPACE) == "":
+        return URLValidation(False, 0, "Missing documentation URL")
+    if not url.startswith(BASE_URL):
+        return URLValidation(False, 0, "Not an Epic Games documentation URL")
+
+    slug = url[len(BASE_URL):].split("#")[0].split("?")[0]
+    if not slug or slug.strip(JS_WHITESPACE) == "":
+        return URLValidation(False, 10, "URL has no specific page path")
+
+    if INVALID_SLUG_RE.search(slug):
+        return URLValidation(False, 20, f'Invalid URL pattern: "{slug}"')
+
+    if slug in (known_valid_slugs() if known_slugs is None else known_slugs):
+        return URLValidation(True, 100, None)
+
+    if not slug.endswith(SUFFIX) and REQUIRES_SUFFIX_RE.search(slug):
+        return URLValidation(True, 60, 'URL may be missing "-in-unreal-engine" suffix')
+
+    if _utf16_length(slug) < 10:
+        return URLValidation(True, 40, "URL slug seems too short")
+
+    if "--" in slug:
+        return URLValidation(False, 30, "URL has double hyphens")
+
+    return URLValidation(True, 70, None)
+
+
+def _validate_chunk(urls: List[str]) -> List[URLValidation]:
+    known = known_valid_slugs()
+    return [validate_url(url, known) for url in urls]
+
+
+def validate_urls(urls: Sequence[Optional[str]], workers: Optional[int] = None) -> Dict[Optional[str], URLValidation]:
+    """
+    Validate each distinct URL once.
+
+    Args:
+        workers: processes to use; default is all cores when there are at
+            least PARALLEL_MIN_URLS distinct URLs, otherwise 1
+
+    Returns:
+        {url: URLValidation}
+    """
+    distinct = list(dict.fromkeys(urls))
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(distinct) >= PARALLEL_MIN_URLS else 1
+    if workers <= 1:
+        return dict(zip(distinct, _validate_chunk(distinct)))
+
+    chunks = [distinct[i:i + CHUNK_SIZE] for i in range(0, len(distinct), CHUNK_SIZE)]
+    results: Dict[Optional[str], URLValidation] = {}
+    with Pool(workers) as pool:
+        for chunk, validations in zip(chunks, pool.imap(_validate_chunk, chunks)):
+            results.update(zip(chunk, validations))
+    return results
+
+
+def question_url(q: Dict) -> Optional[str]:
+    """
+    `q.SourceURL || q.sourceUrl`, as validateURLsBatch reads it.
+    """
+    return q.get("SourceURL") or q.get("sourceUrl")
+
+
+def suggest_urls(results: Dict[Optional[str], URLValidation]) -> Dict[str, Optional[str]]:
+    """
+    Nearest known documentation URL (slug_index.py) for every distinct
+    docs URL that is not a known slug, or None when nothing is close.
+    """
+    from slug_index import SlugIndex  # imports this module
+
+    index = SlugIndex.default()
+    suggestions = {}
+    for url, result in results.items():
+        if url and result.confidence < 100 and url.startswith(BASE_URL):
+            suggestion = index.suggest(url)
+            suggestions[url] = None if suggestion is None or suggestion.url == url else suggestion.url
+    return suggestions
+
+
+def validate_bank(questions: Iterable[Dict], workers: Optional[int] = None,
+                  suggest: bool = False) -> List[Dict]:
+    """
+    validateURLsBatch without copying questions: one row per question with
+    its id, URL and {isValid, confidence, warning}, plus "suggestedUrl" when
+    `suggest` is set.
+    """
+    rows = [(q.get("id"), question_url(q)) for q in questions]
+    results = validate_urls([url for _, url in rows], workers)
+    suggestions = suggest_urls(results) if suggest else {}
+    report = []
+    for row, (question_id, url) in enumerate(rows):
+        entry = {"row": row, "id": question_id, "url": url, **results[url].as_dict()}
+        if suggest:
+            entry["suggestedUrl"] = suggestions.get(url)
+        report.append(entry)
+    return report
+
+
+def check_fixture(path: Path = FIXTURE_PATH) -> int:
+    """
+    Compare validate_url with the JS results stored in the fixture.
+
+    Returns:
+        mismatches
+    """
+    with Path(path).open("r", encoding="utf-8") as f:
+        cases = json.load(f)
+    results = validate_urls([case["url"] for case in cases], workers=1)
+    mismatches = 0
+    for n, case in enumerate(cases):
+        got = results[case["url"]].as_dict()
+        if got != case["expected"]:
+            mismatches += 1
+            print(f"[urls] case {n} {case['url']!r}: got {got}, JS gives {case['expected']}", file=sys.stderr)
+    print(f"[urls] fixture: {len(cases)} cases, {mismatches} mismatches", file=sys.stderr)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate documentation URLs of a question bank (urlValidator.js rules)")
+    parser.add_argument("banks", type=Path, nargs="*", help="question bank(s): .csv export, .json or .jsonl")
+    parser.add_argument("--output", type=Path, default=None, help="write one JSON result per question")
+    parser.add_argument("--invalid-only", action="store_true", help="only write questions with isValid false")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores for large banks)")
+    parser.add_argument("--suggest", action="store_true",
+                        help="add the nearest known documentation URL for unverified ones (slug_index.py)")
+    parser.add_argument("--check-fixture", action="store_true", help="compare with the JS fixture and exit")
+    args = parser.parse_args()
+
+    if args.check_fixture:
+        sys.exit(1 if check_fixture() else 0)
+    if not args.banks:
+        parser.error("give at least one question bank (or --check-fixture)")
+
+    started = time.monotonic()
+    results = validate_bank((q for path in args.banks for q in iter_questions(path)), args.workers, args.suggest)
+    elapsed = time.monotonic() - started
+
+    invalid = sum(not r["isValid"] for r in results)
+    print(f"[urls] {len(results):,} questions, {invalid:,} invalid URLs ({elapsed:.2f}s)", file=sys.stderr)
+    if args.suggest:
+        suggested = sum(r["suggestedUrl"] is not None for r in results)
+        print(f"[urls] {suggested:,} questions have a suggested correction", file=sys.stderr)
+    by_outcome = Counter((r["confidence"], r["warning"] or "ok") for r in results)
+    for (confidence, warning), count in sorted(by_outcome.items(), key=lambda kv: -kv[1])[:15]:
+        print(f"  {count:>8,}  {confidence:>3}  {warning}")
+
+    if args.output:
+        with args.output.open("w", encoding="utf-8") as f:
+            for r in results:
+                if not args.invalid_only or not r["isValid"]:
+                    f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        print(f"[urls] results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
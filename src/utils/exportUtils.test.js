@@ -1,5 +1,7 @@
-import { describe, it, expect } from 'vitest';
+import { describe, it, expect, vi, afterEach } from 'vitest';
 import { getCSVContent, segmentQuestions } from './exportUtils';
+import goldenQuestions from './exportUtils.golden.json';
+import goldenCSV from './exportUtils.golden.csv?raw';
 
 describe('exportUtils', () => {
     describe('getCSVContent', () => {
@@ -54,6 +56,20 @@ describe('exportUtils', () => {
             expect(dataRow).not.toMatch(/undefined/);
             expect(dataRow).not.toMatch(/null/);
         });
+
+        // Shared with scripts/question_bank/csv_export.py (--check-golden),
+        // which must produce the same bytes for the same input.
+        describe('golden file', () => {
+            afterEach(() => {
+                vi.useRealTimers();
+            });
+
+            it('matches the golden CSV byte for byte', () => {
+                vi.useFakeTimers();
+                vi.setSystemTime(new Date(2025, 0, 15, 12, 0, 0));
+                expect(getCSVContent(goldenQuestions, 'Sam', 'Alex')).toBe(goldenCSV);
+            });
+        });
     });
 
     describe('segmentQuestions', () => {
@@ -0,0 +1,25 @@
+import { describe, it, expect } from 'vitest';
+import { textSimilarity } from './stringHelpers';
+import fixture from './textSimilarity.fixture.json';
+
+// Shared with scripts/question_bank/bench_similarity.py, which checks the
+// Python port against the same expected scores.
+describe('textSimilarity', () => {
+    it('matches the shared fixture exactly', () => {
+        fixture.forEach(({ a, b, similarity }) => {
+            expect(textSimilarity(a, b)).toBe(similarity);
+        });
+    });
+
+    it('is symmetric', () => {
+        fixture.forEach(({ a, b }) => {
+            expect(textSimilarity(b, a)).toBe(textSimilarity(a, b));
+        });
+    });
+
+    it('returns 0 for missing input', () => {
+        expect(textSimilarity('', 'What is Nanite?')).toBe(0);
+        expect(textSimilarity(null, 'What is Nanite?')).toBe(0);
+        expect(textSimilarity('What is Nanite?', undefined)).toBe(0);
+    });
+});
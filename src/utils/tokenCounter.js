@@ -6,37 +6,12 @@
  * For more accurate counting, consider using tiktoken or similar libraries
  */
 
-// Pricing per 1M tokens (as of Nov 2024)
-const PRICING = {
-    'gemini-2.0-flash': {
-        input: 0.075,   // $0.075 per 1M input tokens
-        output: 0.30    // $0.30 per 1M output tokens
-    },
-    'gemini-1.5-pro': {
-        input: 1.25,    // $1.25 per 1M input tokens
-        output: 5.00    // $5.00 per 1M output tokens
-    },
-    'gemini-2.0-flash-exp': {
-        input: 0.075,   // Using Flash pricing for value estimation
-        output: 0.30
-    }
-};
+import MODEL_PRICING from './modelPricing.json';
 
-// Token limits per model
-const TOKEN_LIMITS = {
-    'gemini-2.0-flash': {
-        input: 1000000,
-        output: 8192
-    },
-    'gemini-1.5-pro': {
-        input: 2000000,
-        output: 8192
-    },
-    'gemini-2.0-flash-exp': {
-        input: 1000000,
-        output: 8192
-    }
-};
+// Pricing per 1M tokens and token limits per model live in modelPricing.json
+// so the Python tooling (scripts/examples/gemini_pricing.py) uses the same table
+const PRICING = MODEL_PRICING.pricing;
+const TOKEN_LIMITS = MODEL_PRICING.tokenLimits;
 
 /**
  * Estimates token count from text using character-based approximation
@@ -0,0 +1,29 @@
+import { describe, it, expect } from 'vitest';
+import { validateURL, validateURLsBatch } from './urlValidator';
+import fixture from './urlValidator.fixture.json';
+
+// Shared with scripts/question_bank/url_validator.py (--check-fixture),
+// which must produce the same results.
+describe('validateURL', () => {
+    it('matches the shared fixture', () => {
+        fixture.forEach(({ url, expected }) => {
+            expect(validateURL(url)).toEqual(expected);
+        });
+    });
+
+    it('accepts known documentation slugs', () => {
+        const result = validateURL('https://dev.epicgames.com/documentation/en-us/unreal-engine/nanite-virtualized-geometry-in-unreal-engine');
+        expect(result).toEqual({ isValid: true, confidence: 100, warning: null });
+    });
+});
+
+describe('validateURLsBatch', () => {
+    it('reads SourceURL or sourceUrl', () => {
+        const [a, b] = validateURLsBatch([
+            { SourceURL: 'https://dev.epicgames.com/documentation/en-us/unreal-engine/ue5' },
+            { sourceUrl: '' },
+        ]);
+        expect(a.urlValidation.confidence).toBe(20);
+        expect(b.urlValidation.warning).toBe('Missing documentation URL');
+    });
+});